@@ -0,0 +1,74 @@
+"""
+Воркер распределённых рассылок (BROADCAST_MODE=distributed)
+
+Запуск: python -m app.broadcast_worker
+Можно запускать несколько процессов: шарды распределяются через consumer group,
+лимит отправки общий.
+"""
+import asyncio
+import signal
+import sys
+from loguru import logger
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+
+from app.config import settings
+from app.database import db
+from app.health import start_health_server
+from app.services.broadcast_queue import BroadcastShardWorker
+from app.utils import get_redis, close_redis
+
+
+async def main() -> None:
+    """Главная функция воркера"""
+    
+    # Настройка логирования
+    logger.remove()
+    logger.add(
+        sys.stdout,
+        level=settings.log_level,
+        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+               "<level>{level: <8}</level> | "
+               "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+               "<level>{message}</level>",
+        colorize=True
+    )
+    
+    logger.info("🚚 Starting broadcast worker...")
+    
+    bot = Bot(
+        token=settings.bot_token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    db.write_buffer.start()
+    health_server = await start_health_server(bot, probes=("postgres", "redis", "telegram"))
+    
+    # SIGTERM (остановка контейнера) завершает воркер так же, как Ctrl+C:
+    # отмена рассылки шарда пишет его чекпоинт, буфер записи дописывается ниже
+    worker = asyncio.create_task(BroadcastShardWorker(bot, get_redis()).run(), name="broadcast-shard-worker")
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.cancel)
+    
+    try:
+        await worker
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if health_server:
+            await health_server.stop()
+        # Незавершённый шард останется в очереди и будет забран после BROADCAST_SHARD_CLAIM_TIMEOUT
+        await db.write_buffer.close()
+        await bot.session.close()
+        await close_redis()
+        await db.engine.dispose()
+        logger.info("🛑 Broadcast worker stopped")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("👋 Broadcast worker terminated by user")
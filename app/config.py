@@ -13,6 +13,35 @@ class Settings(BaseSettings):
     # Bot settings
     bot_token: str = Field(..., alias="BOT_TOKEN")
     bot_username: str = Field("", alias="BOT_USERNAME")
+    bot_commands_rate: float = Field(5.0, alias="BOT_COMMANDS_RATE")  # запросов set_my_commands в секунду
+    
+    # Runtime mode: polling или webhook
+    bot_mode: str = Field("polling", alias="BOT_MODE")
+    shutdown_timeout: float = Field(20.0, alias="SHUTDOWN_TIMEOUT")  # секунд на завершение работы при остановке
+    
+    # Webhook settings (BOT_MODE=webhook)
+    webhook_url: str = Field("", alias="WEBHOOK_URL")  # внешний адрес, например https://bot.example.com
+    webhook_path: str = Field("/webhook", alias="WEBHOOK_PATH")
+    webhook_secret: str = Field("", alias="WEBHOOK_SECRET")  # X-Telegram-Bot-Api-Secret-Token
+    webhook_max_connections: int = Field(40, alias="WEBHOOK_MAX_CONNECTIONS")
+    webhook_drop_pending_updates: bool = Field(False, alias="WEBHOOK_DROP_PENDING_UPDATES")
+    webapp_host: str = Field("0.0.0.0", alias="WEBAPP_HOST")
+    webapp_port: int = Field(8080, alias="WEBAPP_PORT")
+    
+    # Update processing: inline - в процессе бота, distributed - приём в Redis Streams и обработка воркерами
+    updates_mode: str = Field("inline", alias="UPDATES_MODE")
+    update_partitions: int = Field(32, alias="UPDATE_PARTITIONS")  # потоков updates:<n>, менять только при пустой очереди
+    update_stream_maxlen: int = Field(100000, alias="UPDATE_STREAM_MAXLEN")  # приблизительный предел длины потока
+    update_lease_ttl: float = Field(15.0, alias="UPDATE_LEASE_TTL")  # секунд до перехвата партиции упавшего воркера
+    update_worker_concurrency: int = Field(64, alias="UPDATE_WORKER_CONCURRENCY")  # обновлений в обработке на воркер
+    handler_concurrency: int = Field(100, alias="HANDLER_CONCURRENCY")  # хендлеров одновременно на процесс
+    callback_dedupe_window: float = Field(1.0, alias="CALLBACK_DEDUPE_WINDOW")  # секунд, 0 - отключить
+    
+    # Health server settings (GET /health/live, /health/ready)
+    health_host: str = Field("0.0.0.0", alias="HEALTH_HOST")
+    health_port: int = Field(8081, alias="HEALTH_PORT")  # 0 - не запускать
+    health_probe_timeout: float = Field(3.0, alias="HEALTH_PROBE_TIMEOUT")  # секунд на одну пробу
+    health_cache_ttl: float = Field(5.0, alias="HEALTH_CACHE_TTL")  # секунд хранится результат проб
     
     # Admin settings
     admin_user_ids: str = Field("[]", alias="ADMIN_USER_IDS")
@@ -30,10 +59,44 @@ class Settings(BaseSettings):
     redis_db: int = Field(0, alias="REDIS_DB")
     redis_password: str = Field("", alias="REDIS_PASSWORD")
     
+    # Write-behind buffer settings
+    write_buffer_max_batch: int = Field(500, alias="WRITE_BUFFER_MAX_BATCH")
+    write_buffer_flush_interval: float = Field(1.0, alias="WRITE_BUFFER_FLUSH_INTERVAL")
+    write_buffer_max_pending: int = Field(10000, alias="WRITE_BUFFER_MAX_PENDING")
+    
+    # Activity log settings (таблица user_actions)
+    activity_log_enabled: bool = Field(True, alias="ACTIVITY_LOG_ENABLED")
+    activity_buffer_size: int = Field(10000, alias="ACTIVITY_BUFFER_SIZE")
+    activity_flush_interval: float = Field(5.0, alias="ACTIVITY_FLUSH_INTERVAL")
+    activity_sample_rate: float = Field(1.0, alias="ACTIVITY_SAMPLE_RATE")
+    activity_retention_days: int = Field(90, alias="ACTIVITY_RETENTION_DAYS")
+    
+    # Broadcast settings
+    broadcast_rate_limit: float = Field(30.0, alias="BROADCAST_RATE_LIMIT")  # сообщений в секунду
+    broadcast_max_retries: int = Field(3, alias="BROADCAST_MAX_RETRIES")  # повторов после RetryAfter
+    broadcast_min_concurrency: int = Field(4, alias="BROADCAST_MIN_CONCURRENCY")
+    broadcast_max_concurrency: int = Field(30, alias="BROADCAST_MAX_CONCURRENCY")
+    broadcast_target_latency: float = Field(1.0, alias="BROADCAST_TARGET_LATENCY")  # секунд на запрос
+    broadcast_progress_interval: float = Field(5.0, alias="BROADCAST_PROGRESS_INTERVAL")  # секунд между обновлениями прогресса
+    broadcast_mode: str = Field("inline", alias="BROADCAST_MODE")  # inline - в процессе бота, distributed - воркерами
+    broadcast_shard_size: int = Field(1000, alias="BROADCAST_SHARD_SIZE")  # получателей в шарде
+    broadcast_shard_claim_timeout: float = Field(120.0, alias="BROADCAST_SHARD_CLAIM_TIMEOUT")  # секунд до перехвата шарда
+    broadcast_delivery_retention_days: int = Field(90, alias="BROADCAST_DELIVERY_RETENTION_DAYS")  # хранение журнала доставки
+    
+    # Scheduler settings
+    scheduler_enabled: bool = Field(True, alias="SCHEDULER_ENABLED")
+    scheduler_timezone: str = Field("Europe/Moscow", alias="SCHEDULER_TIMEZONE")  # часовой пояс времени запуска
+    scheduler_tick_interval: float = Field(5.0, alias="SCHEDULER_TICK_INTERVAL")  # секунд между проверками заданий
+    scheduler_lock_ttl: float = Field(30.0, alias="SCHEDULER_LOCK_TTL")  # секунд до перехвата лидерства
+    scheduler_max_jobs: int = Field(4, alias="SCHEDULER_MAX_JOBS")  # одновременно выполняемых заданий
+    scheduler_stats_interval: int = Field(3600, alias="SCHEDULER_STATS_INTERVAL")  # секунд между пересчётами статистики
+    scheduler_cleanup_time: str = Field("04:00", alias="SCHEDULER_CLEANUP_TIME")  # ежедневная очистка (местное время)
+    
     # Mediascout API settings
     mediascout_api_url: str = Field("https://lk.mediascout.ru/webapi", alias="MEDIASCOUT_API_URL")
     mediascout_login: str = Field(..., alias="MEDIASCOUT_LOGIN")
     mediascout_password: str = Field(..., alias="MEDIASCOUT_PASSWORD")
+    mediascout_timeout: float = Field(60.0, alias="MEDIASCOUT_TIMEOUT")  # секунд на запрос к API
     
     # Environment
     env: str = Field("development", alias="ENV")
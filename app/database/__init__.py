@@ -4,5 +4,7 @@
 
 from .database import db
 from .models import User, BotStats, MigrationHistory
+from .records import UserRecord, CreativeRecord
+from .segments import BroadcastSegment
 
-__all__ = ['db', 'User', 'BotStats', 'MigrationHistory']
+__all__ = ['db', 'User', 'BotStats', 'MigrationHistory', 'UserRecord', 'CreativeRecord', 'BroadcastSegment']
@@ -1,20 +1,89 @@
 """
 Класс для работы с базой данных
 """
-from datetime import datetime
-from typing import Optional, List
+import time
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Optional, List, Dict, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import select, func, update
+from sqlalchemy import (
+    select, func, update, delete, or_, exists, literal, true, false, bindparam, text, inspect, BigInteger, String, Table
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection, Row
 from loguru import logger
 
 from app.config import settings
-from .models import Base, User, BotStats, MigrationHistory, Creative, InviteLink
+from .models import Base, User, BotStats, MigrationHistory, Creative, InviteLink, Broadcast, ScheduledJob
+from .records import (
+    UserRecord,
+    CreativeRecord,
+    USER_RECORD_COLUMNS,
+    CREATIVE_RECORD_COLUMNS,
+    users_table,
+    creatives_table,
+    deliveries_table,
+)
+from .segments import BroadcastSegment
 from .migrations import MigrationManager
+from .write_buffer import WriteBehindBuffer, BufferedStatement
+
+
+# Значения, возвращающие пользователя в рассылки
+DELIVERABLE_VALUES = {"delivery_status": "ok", "undeliverable_since": None}
+
+# Колонки, возвращаемые быстрыми UPDATE ... RETURNING вместо ORM-объектов
+USER_ROW_COLUMNS = (
+    users_table.c.id,
+    users_table.c.username,
+    users_table.c.first_name,
+    users_table.c.last_name,
+    users_table.c.full_name,
+    users_table.c.role,
+    users_table.c.is_active,
+    users_table.c.is_blocked,
+    users_table.c.invited_by,
+)
+
+CREATIVE_ROW_COLUMNS = (
+    creatives_table.c.id,
+    creatives_table.c.user_id,
+    creatives_table.c.erid,
+    creatives_table.c.status,
+    creatives_table.c.error_message,
+)
+
+# Отложенные операции для буфера write-behind
+DEFERRED_CREATIVE_STATUS = BufferedStatement(
+    "creative_status",
+    update(creatives_table)
+    .where(creatives_table.c.id == bindparam("creative_id"))
+    .values(
+        status=bindparam("status"),
+        error_message=bindparam("error_message"),
+        updated_at=func.now()
+    ),
+    coalesce_key=itemgetter("creative_id")
+)
+
+DEFERRED_BOT_STATS_REFRESH = BufferedStatement(
+    "bot_stats_refresh",
+    text("""
+        UPDATE bot_stats SET
+            total_users = (SELECT count(*) FROM users),
+            active_users = (SELECT count(*) FROM users WHERE is_active)
+        WHERE id = (SELECT max(id) FROM bot_stats)
+    """),
+    coalesce_key=lambda params: None
+)
 
 
 class Database:
     """Класс для работы с базой данных"""
     
+    # Время жизни кэша количества получателей сегмента (секунды)
+    SEGMENT_COUNT_TTL = 30
+    
     def __init__(self):
         # Преобразуем URL для асинхронной работы
         async_url = settings.database_url.replace("postgresql://", "postgresql+asyncpg://")
@@ -33,6 +102,17 @@ class Database:
         
         # Инициализируем менеджер миграций
         self.migration_manager = MigrationManager(self.engine)
+        
+        # Кэш количества получателей сегментов для превью рассылки: сегмент -> (истекает, количество)
+        self._segment_counts: Dict[BroadcastSegment, Tuple[float, int]] = {}
+        
+        # Буфер отложенной записи для некритичных изменений
+        self.write_buffer = WriteBehindBuffer(
+            self.engine,
+            max_batch=settings.write_buffer_max_batch,
+            flush_interval=settings.write_buffer_flush_interval,
+            max_pending=settings.write_buffer_max_pending
+        )
     
     async def run_migrations(self):
         """Запуск всех неприменённых миграций"""
@@ -48,44 +128,139 @@ class Database:
         # Сначала запускаем миграции
         await self.run_migrations()
         
-        # Затем создаем таблицы через SQLAlchemy (для новых моделей)
+        # Затем создаем таблицы через SQLAlchemy (для новых моделей).
+        # Существующие таблицы читаются одним запросом: при актуальной схеме
+        # create_all не вызывается и не проверяет каждую таблицу отдельно
         async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("✅ Database tables created successfully")
+            missing = await conn.run_sync(self._missing_tables)
+            if not missing:
+                logger.info("✅ Database schema is up to date")
+                return
+            await conn.run_sync(Base.metadata.create_all, tables=missing)
+        logger.info(f"✅ Database tables created: {', '.join(table.name for table in missing)}")
+    
+    @staticmethod
+    def _missing_tables(connection: Connection) -> List[Table]:
+        """Таблицы моделей, которых ещё нет в базе"""
+        existing = set(inspect(connection).get_table_names())
+        return [table for table in Base.metadata.sorted_tables if table.name not in existing]
+    
+    async def ping(self) -> None:
+        """Проверка соединения с базой (SELECT 1) для проб готовности"""
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    def _user_upsert(self, rows: List[Dict[str, Any]], update_columns: List[str]):
+        """
+        Построение INSERT ... ON CONFLICT (id) DO UPDATE ... RETURNING для пользователей
+        
+        Args:
+            rows: Значения колонок для вставки (по одному словарю на пользователя)
+            update_columns: Колонки, которые перезаписываются при конфликте
+        """
+        stmt = pg_insert(User).values(rows)
+        set_ = {column: getattr(stmt.excluded, column) for column in update_columns}
+        if "is_active" in update_columns:
+            # Пользователь снова пишет боту - значит, сообщения ему доставляются
+            set_.update(DELIVERABLE_VALUES)
+        set_["updated_at"] = func.now()
+        return (
+            stmt.on_conflict_do_update(index_elements=[User.id], set_=set_)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
     
     async def add_user(self, user_id: int, username: Optional[str] = None, 
                       first_name: Optional[str] = None, last_name: Optional[str] = None) -> User:
-        """Добавление нового пользователя"""
-        async with self.session_maker() as session:
-            # Проверяем, существует ли пользователь
-            existing_user = await session.get(User, user_id)
-            if existing_user:
-                # Обновляем данные существующего пользователя
-                existing_user.username = username
-                existing_user.first_name = first_name
-                existing_user.last_name = last_name
-                existing_user.is_active = True
-                existing_user.updated_at = datetime.utcnow()
-                await session.commit()
-                return existing_user
-            
-            # Создаем нового пользователя
-            user = User(
-                id=user_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name
-            )
-            session.add(user)
+        """Добавление нового пользователя (upsert за один запрос)"""
+        stmt = self._user_upsert(
+            [{
+                "id": user_id,
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name,
+                "is_active": True
+            }],
+            update_columns=["username", "first_name", "last_name", "is_active"]
+        )
+        async with self.session_maker() as session:
+            user = await session.scalar(stmt)
             await session.commit()
-            await session.refresh(user)
             return user
     
+    async def add_users(
+        self,
+        users: List[Dict[str, Any]],
+        batch_size: int = 1000
+    ) -> List[User]:
+        """
+        Массовое добавление пользователей (импорт) в одной транзакции
+        
+        Один INSERT на пачку: у PostgreSQL не больше 32767 параметров
+        на запрос, а у каждого пользователя их 9.
+        
+        Args:
+            users: Список словарей с ключами id, username, first_name, last_name,
+                full_name, role, invited_by
+            batch_size: Максимум пользователей в одном запросе
+        
+        Returns:
+            Список добавленных/обновлённых пользователей
+        """
+        if not users:
+            return []
+        
+        # Дедуплицируем по id: ON CONFLICT не допускает повтор ключа в одном запросе
+        rows: Dict[int, Dict[str, Any]] = {}
+        for user in users:
+            rows[user["id"]] = {
+                "id": user["id"],
+                "username": user.get("username"),
+                "first_name": user.get("first_name"),
+                "last_name": user.get("last_name"),
+                "full_name": user.get("full_name"),
+                "role": user.get("role", "employee"),
+                "invited_by": user.get("invited_by"),
+                "is_active": True,
+                "is_blocked": False
+            }
+        
+        values = list(rows.values())
+        update_columns = [
+            "username", "first_name", "last_name", "full_name",
+            "role", "invited_by", "is_active", "is_blocked"
+        ]
+        imported: List[User] = []
+        async with self.session_maker() as session:
+            for start in range(0, len(values), batch_size):
+                stmt = self._user_upsert(values[start:start + batch_size], update_columns)
+                result = await session.scalars(stmt)
+                imported.extend(result.all())
+            await session.commit()
+            return imported
+    
     async def get_user(self, user_id: int) -> Optional[User]:
         """Получение пользователя по ID"""
         async with self.session_maker() as session:
             return await session.get(User, user_id)
     
+    async def get_user_record(self, user_id: int) -> Optional[UserRecord]:
+        """Получение пользователя по ID в виде лёгкой модели чтения"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(*USER_RECORD_COLUMNS).where(users_table.c.id == user_id)
+            )
+            row = result.first()
+            return UserRecord(*row) if row else None
+    
+    async def get_all_user_records(self) -> List[UserRecord]:
+        """Получение всех пользователей в виде лёгких моделей чтения"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(*USER_RECORD_COLUMNS).order_by(users_table.c.created_at.desc())
+            )
+            return [UserRecord(*row) for row in result]
+    
     async def get_all_users(self) -> List[User]:
         """Получение всех пользователей"""
         async with self.session_maker() as session:
@@ -138,6 +313,10 @@ class Database:
             await session.refresh(stats)
             return stats
     
+    async def defer_bot_stats_refresh(self) -> None:
+        """Отложенный пересчёт счётчиков статистики (несколько вызовов до сброса буфера схлопываются в один)"""
+        await self.write_buffer.submit(DEFERRED_BOT_STATS_REFRESH, {})
+    
     async def get_bot_stats(self) -> Optional[BotStats]:
         """Получение статистики бота"""
         async with self.session_maker() as session:
@@ -218,6 +397,23 @@ class Database:
             )
             return result.scalars().all()
     
+    async def get_user_creative_records(
+        self,
+        user_id: int,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[CreativeRecord]:
+        """Получение креативов пользователя в виде лёгких моделей чтения"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(*CREATIVE_RECORD_COLUMNS)
+                .where(creatives_table.c.user_id == user_id)
+                .order_by(creatives_table.c.created_at.desc())
+                .limit(limit)
+                .offset(offset)
+            )
+            return [CreativeRecord(*row) for row in result]
+    
     async def get_user_creatives_count(self, user_id: int) -> int:
         """Получение количества креативов пользователя"""
         async with self.session_maker() as session:
@@ -231,17 +427,680 @@ class Database:
         creative_id: int,
         status: str,
         error_message: Optional[str] = None
-    ) -> Optional[Creative]:
-        """Обновление статуса креатива"""
-        async with self.session_maker() as session:
-            creative = await session.get(Creative, creative_id)
-            if creative:
-                creative.status = status
-                creative.error_message = error_message
-                creative.updated_at = datetime.utcnow()
-                await session.commit()
-                await session.refresh(creative)
-            return creative
+    ) -> Optional[Row]:
+        """Обновление статуса креатива (один запрос UPDATE ... RETURNING)"""
+        return await self._update_one(
+            update(creatives_table)
+            .where(creatives_table.c.id == creative_id)
+            .values(status=status, error_message=error_message, updated_at=func.now())
+            .returning(*CREATIVE_ROW_COLUMNS)
+        )
+    
+    async def update_creatives_status(
+        self,
+        creative_ids: List[int],
+        status: str,
+        error_message: Optional[str] = None
+    ) -> List[Row]:
+        """Массовое обновление статуса креативов"""
+        if not creative_ids:
+            return []
+        return await self._update_many(
+            update(creatives_table)
+            .where(creatives_table.c.id.in_(creative_ids))
+            .values(status=status, error_message=error_message, updated_at=func.now())
+            .returning(*CREATIVE_ROW_COLUMNS)
+        )
+    
+    async def defer_creative_status(
+        self,
+        creative_id: int,
+        status: str,
+        error_message: Optional[str] = None
+    ) -> None:
+        """Отложенное обновление статуса креатива через буфер write-behind"""
+        await self.write_buffer.submit(
+            DEFERRED_CREATIVE_STATUS,
+            {"creative_id": creative_id, "status": status, "error_message": error_message}
+        )
+    
+    # Методы для работы с рассылками
+    
+    async def create_broadcast(
+        self,
+        admin_id: int,
+        message_text: Optional[str] = None,
+        media_type: Optional[str] = None,
+        media_file_id: Optional[str] = None,
+        button_text: Optional[str] = None,
+        button_url: Optional[str] = None,
+        target_users: int = 0,
+        status: str = "pending",
+        source_chat_id: Optional[int] = None,
+        source_message_ids: Optional[List[int]] = None,
+        segment: Optional[Dict[str, Any]] = None
+    ) -> Broadcast:
+        """
+        Создание задания рассылки
+        
+        Со статусом running рассылка сразу считается захваченной создавшим
+        её процессом (фоновый воркер не возьмёт её, пока идут чекпоинты).
+        """
+        async with self.session_maker() as session:
+            broadcast = Broadcast(
+                admin_id=admin_id,
+                message_text=message_text,
+                media_type=media_type,
+                media_file_id=media_file_id,
+                source_chat_id=source_chat_id,
+                source_message_ids=source_message_ids,
+                segment=segment,
+                button_text=button_text,
+                button_url=button_url,
+                target_users=target_users,
+                status=status,
+                started_at=func.now() if status == "running" else None,
+                heartbeat_at=func.now()
+            )
+            session.add(broadcast)
+            await session.commit()
+            await session.refresh(broadcast)
+            return broadcast
+    
+    async def update_broadcast_draft(self, broadcast_id: int, admin_id: int, **values) -> bool:
+        """Изменение черновика рассылки (например, кнопки); True, если черновик найден"""
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                update(Broadcast.__table__)
+                .where(
+                    Broadcast.__table__.c.id == broadcast_id,
+                    Broadcast.__table__.c.admin_id == admin_id,
+                    Broadcast.__table__.c.status == "draft"
+                )
+                .values(**values)
+            )
+            return result.rowcount > 0
+    
+    async def start_broadcast_draft(
+        self,
+        broadcast_id: int,
+        admin_id: int,
+        target_users: int,
+        status: str = "running"
+    ) -> Optional[Broadcast]:
+        """
+        Запуск черновика рассылки: draft/scheduled -> running (или queued для шардов) одним UPDATE ... RETURNING
+        
+        Повторное подтверждение (двойное нажатие кнопки или повтор задания
+        планировщика) вернёт None, поэтому одна рассылка не запустится дважды.
+        """
+        stmt = (
+            update(Broadcast)
+            .where(
+                Broadcast.id == broadcast_id,
+                Broadcast.admin_id == admin_id,
+                Broadcast.status.in_(("draft", "scheduled"))
+            )
+            .values(
+                status=status,
+                target_users=target_users,
+                started_at=func.now(),
+                heartbeat_at=func.now()
+            )
+            .returning(Broadcast)
+            .execution_options(populate_existing=True)
+        )
+        async with self.session_maker() as session:
+            broadcast = await session.scalar(stmt)
+            await session.commit()
+            return broadcast
+    
+    async def delete_broadcast_drafts(
+        self,
+        broadcast_id: Optional[int] = None,
+        older_than: Optional[timedelta] = None
+    ) -> int:
+        """
+        Удаление черновиков рассылок
+        
+        Args:
+            broadcast_id: Удалить конкретный черновик
+            older_than: Удалить все черновики старше указанного времени
+        
+        Returns:
+            Количество удалённых черновиков
+        """
+        table = Broadcast.__table__
+        stmt = delete(table).where(table.c.status == "draft")
+        if broadcast_id is not None:
+            stmt = stmt.where(table.c.id == broadcast_id)
+        if older_than is not None:
+            stmt = stmt.where(table.c.created_at < func.now() - older_than)
+        
+        async with self.engine.begin() as conn:
+            result = await conn.execute(stmt)
+            return result.rowcount
+    
+    async def get_broadcast(self, broadcast_id: int) -> Optional[Broadcast]:
+        """Получение рассылки по ID"""
+        async with self.session_maker() as session:
+            return await session.get(Broadcast, broadcast_id)
+    
+    @staticmethod
+    def _resumable_broadcast(stale_after: int):
+        """Условие: рассылка ожидает запуска или зависла (нет чекпоинтов дольше stale_after секунд)"""
+        return or_(
+            Broadcast.status == "pending",
+            (Broadcast.status == "running") & or_(
+                Broadcast.heartbeat_at.is_(None),
+                Broadcast.heartbeat_at < func.now() - timedelta(seconds=stale_after)
+            )
+        )
+    
+    async def claim_broadcast(self, broadcast_id: int, stale_after: int) -> Optional[Broadcast]:
+        """
+        Захват рассылки на выполнение
+        
+        Захватить можно ожидающую рассылку или «зависшую» - в статусе running,
+        но без чекпоинтов дольше stale_after секунд (процесс, который её
+        выполнял, упал). Так одну рассылку не выполняют два процесса сразу.
+        """
+        stmt = (
+            update(Broadcast)
+            .where(
+                Broadcast.id == broadcast_id,
+                self._resumable_broadcast(stale_after)
+            )
+            .values(
+                status="running",
+                started_at=func.coalesce(Broadcast.started_at, func.now()),
+                heartbeat_at=func.now()
+            )
+            .returning(Broadcast)
+            .execution_options(populate_existing=True)
+        )
+        async with self.session_maker() as session:
+            broadcast = await session.scalar(stmt)
+            await session.commit()
+            return broadcast
+    
+    async def get_resumable_broadcast_ids(self, stale_after: int) -> List[int]:
+        """Получение ID рассылок, которые нужно продолжить (ожидающие и зависшие)"""
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(Broadcast.id)
+                .where(self._resumable_broadcast(stale_after))
+                .order_by(Broadcast.id)
+            )
+            return list(result.scalars().all())
+    
+    async def checkpoint_broadcast(
+        self,
+        broadcast_id: int,
+        last_user_id: int,
+        sent_count: int,
+        failed_count: int,
+        blocked_count: int
+    ) -> None:
+        """Сохранение прогресса рассылки"""
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(Broadcast.__table__)
+                .where(Broadcast.__table__.c.id == broadcast_id)
+                .values(
+                    last_user_id=last_user_id,
+                    sent_count=sent_count,
+                    failed_count=failed_count,
+                    blocked_count=blocked_count,
+                    heartbeat_at=func.now()
+                )
+            )
+    
+    async def finish_broadcast(
+        self,
+        broadcast_id: int,
+        status: str = "completed",
+        counts: Optional[Dict[str, int]] = None
+    ) -> None:
+        """
+        Завершение рассылки (completed/failed/cancelled) или возврат в очередь (pending)
+        
+        Args:
+            counts: Итоговые счётчики sent/failed/blocked (для рассылок, выполненных шардами)
+        """
+        values = {"status": status, "heartbeat_at": func.now()}
+        if status != "pending":
+            values["completed_at"] = func.now()
+        if counts:
+            values.update({f"{key}_count": value for key, value in counts.items()})
+        
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(Broadcast.__table__)
+                .where(Broadcast.__table__.c.id == broadcast_id)
+                .values(**values)
+            )
+    
+    async def mark_users_undeliverable(self, user_ids: List[int], delivery_status: str = "blocked") -> int:
+        """
+        Исключение из рассылок пользователей, которым не доставляются сообщения
+        
+        Одним UPDATE снимает is_active и запоминает причину; пользователь
+        вернётся в рассылки, когда снова напишет боту.
+        
+        Returns:
+            Количество обновлённых пользователей
+        """
+        if not user_ids:
+            return 0
+        
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                update(users_table)
+                .where(users_table.c.id.in_(user_ids), users_table.c.is_active == True)
+                .values(
+                    is_active=False,
+                    delivery_status=delivery_status,
+                    undeliverable_since=func.now(),
+                    updated_at=func.now()
+                )
+            )
+            return result.rowcount
+    
+    async def mark_user_deliverable(self, user_id: int) -> None:
+        """Возврат пользователя в рассылки (он снова написал боту)"""
+        await self._update_one(self._update_users([user_id], is_active=True, **DELIVERABLE_VALUES))
+    
+    async def get_broadcast_recipient_ids(
+        self,
+        after_user_id: int,
+        limit: int,
+        segment: Optional[BroadcastSegment] = None,
+        upto_user_id: Optional[int] = None,
+        exclude_delivered: Optional[int] = None
+    ) -> List[int]:
+        """
+        Получение следующей порции получателей рассылки (keyset-пагинация по id, до upto_user_id включительно)
+        
+        Args:
+            exclude_delivered: ID рассылки, получатели которой с записью в журнале
+                доставки пропускаются (обработаны после чекпоинта до остановки)
+        """
+        segment = segment or BroadcastSegment()
+        stmt = (
+            select(users_table.c.id)
+            .where(*segment.conditions(), users_table.c.id > after_user_id)
+            .order_by(users_table.c.id)
+            .limit(limit)
+        )
+        if upto_user_id is not None:
+            stmt = stmt.where(users_table.c.id <= upto_user_id)
+        if exclude_delivered is not None:
+            # Статусы перечислены, чтобы поиск шёл по индексу (broadcast_id, status, user_id)
+            stmt = stmt.where(~exists(
+                select(deliveries_table.c.id).where(
+                    deliveries_table.c.broadcast_id == exclude_delivered,
+                    deliveries_table.c.status.in_(("sent", "failed", "blocked")),
+                    deliveries_table.c.user_id == users_table.c.id
+                )
+            ))
+        
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return list(result.scalars().all())
+    
+    async def get_broadcast_shard_bounds(self, shard_size: int, segment: Optional[BroadcastSegment] = None) -> List[int]:
+        """
+        Границы шардов рассылки: id каждого shard_size-го получателя сегмента
+        
+        Шард i - получатели с id в (bounds[i-1], bounds[i]], последний шард - всё после bounds[-1].
+        """
+        segment = segment or BroadcastSegment()
+        numbered = (
+            select(
+                users_table.c.id,
+                func.row_number().over(order_by=users_table.c.id).label("position")
+            )
+            .where(*segment.conditions())
+            .subquery()
+        )
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(numbered.c.id)
+                .where(numbered.c.position % shard_size == 0)
+                .order_by(numbered.c.id)
+            )
+            return list(result.scalars().all())
+    
+    async def count_segment_users(self, segment: Optional[BroadcastSegment] = None, cached: bool = True) -> int:
+        """
+        Количество получателей сегмента
+        
+        Args:
+            segment: Сегмент (по умолчанию - все активные незаблокированные пользователи)
+            cached: Вернуть значение из кэша (SEGMENT_COUNT_TTL секунд) - для превью в мастере рассылки
+        """
+        segment = segment or BroadcastSegment()
+        now = time.monotonic()
+        
+        if cached:
+            entry = self._segment_counts.get(segment)
+            if entry and entry[0] > now:
+                return entry[1]
+        
+        async with self.engine.connect() as conn:
+            count = await conn.scalar(
+                select(func.count()).select_from(users_table).where(*segment.conditions())
+            ) or 0
+        
+        # Устаревшие записи вычищаем при каждой записи: сегментов в кэше единицы
+        self._segment_counts = {key: entry for key, entry in self._segment_counts.items() if entry[0] > now}
+        self._segment_counts[segment] = (now + self.SEGMENT_COUNT_TTL, count)
+        return count
+    
+    async def copy_broadcast_deliveries(self, records: List[tuple], chunk_size: int = 5000) -> int:
+        """
+        Запись журнала доставки рассылки через COPY (без INSERT на каждое сообщение)
+        
+        Строки копируются во временную таблицу и переносятся INSERT ... SELECT
+        с ON CONFLICT (broadcast_id, user_id) DO NOTHING: повторно записанный
+        чекпоинт (после отмены или сбоя посреди записи) не дублирует журнал.
+        
+        Args:
+            records: Кортежи (broadcast_id, user_id, status, error_code, latency_ms, message_id)
+            chunk_size: Максимум строк в одном COPY
+        
+        Returns:
+            Количество записанных строк
+        """
+        if not records:
+            return 0
+        
+        inserted = 0
+        async with self.engine.connect() as conn:
+            raw_connection = await conn.get_raw_connection()
+            driver = raw_connection.driver_connection
+            
+            async with driver.transaction():
+                await driver.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS broadcast_deliveries_stage (
+                        broadcast_id BIGINT,
+                        user_id BIGINT,
+                        status VARCHAR(20),
+                        error_code INTEGER,
+                        latency_ms INTEGER,
+                        message_id BIGINT
+                    ) ON COMMIT DELETE ROWS
+                """)
+                for start in range(0, len(records), chunk_size):
+                    await driver.copy_records_to_table(
+                        "broadcast_deliveries_stage",
+                        records=records[start:start + chunk_size],
+                        columns=["broadcast_id", "user_id", "status", "error_code", "latency_ms", "message_id"]
+                    )
+                    status = await driver.execute("""
+                        INSERT INTO broadcast_deliveries
+                            (broadcast_id, user_id, status, error_code, latency_ms, message_id)
+                        SELECT DISTINCT ON (broadcast_id, user_id)
+                            broadcast_id, user_id, status, error_code, latency_ms, message_id
+                        FROM broadcast_deliveries_stage
+                        ON CONFLICT (broadcast_id, user_id) DO NOTHING
+                    """)
+                    await driver.execute("TRUNCATE broadcast_deliveries_stage")
+                    
+                    # asyncpg возвращает статус вида "INSERT 0 <count>"
+                    inserted += int(status.rsplit(" ", 1)[-1])
+        
+        return inserted
+    
+    async def delete_old_broadcast_deliveries(self, days: int, batch_size: int = 10000) -> int:
+        """Удаление журнала доставки старше заданного количества дней (порциями)"""
+        stmt = text("""
+            DELETE FROM broadcast_deliveries
+            WHERE id IN (
+                SELECT id FROM broadcast_deliveries
+                WHERE created_at < now() - make_interval(days => :days)
+                LIMIT :batch_size
+            )
+        """)
+        
+        deleted = 0
+        while True:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(stmt, {"days": days, "batch_size": batch_size})
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+    
+    async def get_delivery_stats(self, broadcast_id: int) -> Dict[str, Any]:
+        """Статистика журнала доставки: количество по статусам и задержка отправки (p50/p95, мс)"""
+        table = deliveries_table
+        async with self.engine.connect() as conn:
+            counts = dict((await conn.execute(
+                select(table.c.status, func.count())
+                .where(table.c.broadcast_id == broadcast_id)
+                .group_by(table.c.status)
+            )).all())
+            latency = (await conn.execute(
+                select(
+                    func.percentile_cont(0.5).within_group(table.c.latency_ms),
+                    func.percentile_cont(0.95).within_group(table.c.latency_ms)
+                )
+                .where(table.c.broadcast_id == broadcast_id, table.c.status == "sent")
+            )).one()
+        
+        return {
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "blocked": counts.get("blocked", 0),
+            "latency_p50": latency[0],
+            "latency_p95": latency[1]
+        }
+    
+    # Методы для журнала действий пользователей
+    
+    async def copy_user_actions(self, records: List[tuple]) -> int:
+        """
+        Пакетная запись событий в user_actions через COPY
+        
+        События сначала копируются во временную таблицу, а затем переносятся
+        одним INSERT ... SELECT: так события пользователей, которых нет
+        в users (админы из конфига до регистрации, удалённые сотрудники),
+        отбрасываются, не ломая внешним ключом всю пачку.
+        
+        Args:
+            records: Кортежи (user_id, action_type, action_data_json, created_at)
+        
+        Returns:
+            Количество записанных событий
+        """
+        if not records:
+            return 0
+        
+        async with self.engine.connect() as conn:
+            raw_connection = await conn.get_raw_connection()
+            driver = raw_connection.driver_connection
+            
+            async with driver.transaction():
+                await driver.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS user_actions_stage (
+                        user_id BIGINT,
+                        action_type VARCHAR(50),
+                        action_data JSONB,
+                        created_at TIMESTAMP WITH TIME ZONE
+                    ) ON COMMIT DELETE ROWS
+                """)
+                await driver.copy_records_to_table(
+                    "user_actions_stage",
+                    records=records,
+                    columns=["user_id", "action_type", "action_data", "created_at"]
+                )
+                status = await driver.execute("""
+                    INSERT INTO user_actions (user_id, action_type, action_data, created_at)
+                    SELECT s.user_id, s.action_type, s.action_data, s.created_at
+                    FROM user_actions_stage s
+                    WHERE s.user_id IS NULL
+                       OR EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id)
+                """)
+        
+        # asyncpg возвращает статус вида "INSERT 0 <count>"
+        return int(status.rsplit(" ", 1)[-1])
+    
+    async def delete_old_user_actions(self, days: int, batch_size: int = 10000) -> int:
+        """
+        Удаление событий старше заданного количества дней (порциями, чтобы не держать долгих блокировок)
+        
+        Returns:
+            Количество удалённых событий
+        """
+        stmt = text("""
+            DELETE FROM user_actions
+            WHERE id IN (
+                SELECT id FROM user_actions
+                WHERE created_at < now() - make_interval(days => :days)
+                LIMIT :batch_size
+            )
+        """)
+        
+        deleted = 0
+        while True:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(stmt, {"days": days, "batch_size": batch_size})
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+    
+    # Методы для работы с заданиями планировщика
+    
+    async def create_scheduled_job(
+        self,
+        kind: str,
+        run_at: datetime,
+        payload: Optional[Dict[str, Any]] = None,
+        interval_seconds: Optional[int] = None,
+        timezone: str = "UTC",
+        created_by: Optional[int] = None,
+        name: Optional[str] = None
+    ) -> Optional[ScheduledJob]:
+        """
+        Создание задания планировщика
+        
+        Задание с именем (системное периодическое) создаётся только один раз:
+        если задание с таким именем уже есть, возвращается None.
+        """
+        stmt = (
+            pg_insert(ScheduledJob)
+            .values(
+                name=name,
+                kind=kind,
+                payload=payload,
+                run_at=run_at,
+                interval_seconds=interval_seconds,
+                timezone=timezone,
+                status="pending",
+                attempts=0,
+                created_by=created_by
+            )
+            .on_conflict_do_nothing(index_elements=[ScheduledJob.name])
+            .returning(ScheduledJob)
+        )
+        async with self.session_maker() as session:
+            job = await session.scalar(stmt)
+            await session.commit()
+            return job
+    
+    async def claim_due_jobs(self, limit: int) -> List[ScheduledJob]:
+        """
+        Захват наступивших заданий: pending -> running одним UPDATE ... RETURNING
+        
+        FOR UPDATE SKIP LOCKED не даёт двум процессам захватить одно задание,
+        даже если лидерство планировщика на мгновение разделилось.
+        """
+        due = (
+            select(ScheduledJob.id)
+            .where(ScheduledJob.status == "pending", ScheduledJob.run_at <= func.now())
+            .order_by(ScheduledJob.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(ScheduledJob)
+            .where(ScheduledJob.id.in_(due))
+            .values(
+                status="running",
+                attempts=ScheduledJob.attempts + 1,
+                last_run_at=func.now()
+            )
+            .returning(ScheduledJob)
+            .execution_options(populate_existing=True)
+        )
+        async with self.session_maker() as session:
+            jobs = list((await session.scalars(stmt)).all())
+            await session.commit()
+            return sorted(jobs, key=lambda job: job.run_at)
+    
+    async def finish_scheduled_job(
+        self,
+        job_id: int,
+        status: str,
+        next_run_at: Optional[datetime] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Завершение запуска задания (done/failed) или перенос на следующий запуск (pending)
+        
+        Args:
+            next_run_at: Время следующего запуска периодического задания
+            error: Текст ошибки последнего запуска
+        """
+        values = {"status": status, "last_error": error}
+        if next_run_at is not None:
+            values["run_at"] = next_run_at
+        
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(ScheduledJob.__table__)
+                .where(ScheduledJob.__table__.c.id == job_id)
+                .values(**values)
+            )
+    
+    async def requeue_running_jobs(self, exclude_ids: Optional[List[int]] = None) -> int:
+        """Возврат в очередь заданий, прерванных падением прежнего лидера планировщика"""
+        table = ScheduledJob.__table__
+        stmt = update(table).where(table.c.status == "running").values(status="pending")
+        if exclude_ids:
+            stmt = stmt.where(table.c.id.notin_(exclude_ids))
+        
+        async with self.engine.begin() as conn:
+            result = await conn.execute(stmt)
+            return result.rowcount
+    
+    async def cancel_scheduled_job(self, job_id: int) -> Optional[ScheduledJob]:
+        """Отмена ещё не запущенного задания; None, если оно уже выполняется или завершено"""
+        stmt = (
+            update(ScheduledJob)
+            .where(ScheduledJob.id == job_id, ScheduledJob.status == "pending")
+            .values(status="cancelled")
+            .returning(ScheduledJob)
+            .execution_options(populate_existing=True)
+        )
+        async with self.session_maker() as session:
+            job = await session.scalar(stmt)
+            await session.commit()
+            return job
+    
+    async def delete_finished_jobs(self, older_than: timedelta) -> int:
+        """Удаление завершённых разовых заданий старше указанного времени"""
+        table = ScheduledJob.__table__
+        stmt = delete(table).where(
+            table.c.status.in_(("done", "failed", "cancelled")),
+            table.c.interval_seconds.is_(None),
+            table.c.run_at < func.now() - older_than
+        )
+        async with self.engine.begin() as conn:
+            result = await conn.execute(stmt)
+            return result.rowcount
     
     # Методы для работы с пригласительными ссылками
     
@@ -292,6 +1151,87 @@ class Database:
                 return invite_link
             return None
     
+    async def redeem_invite(
+        self,
+        code: str,
+        user_id: int,
+        username: Optional[str] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None
+    ) -> Optional[User]:
+        """
+        Атомарное использование пригласительной ссылки с регистрацией пользователя
+        
+        Погашение ссылки и upsert пользователя выполняются одним запросом
+        (data-modifying CTE), поэтому из двух одновременных попыток с одним
+        кодом успешной будет только одна.
+        
+        Args:
+            code: Код приглашения
+            user_id: ID пользователя Telegram
+            username: Username пользователя
+            first_name: Имя пользователя
+            last_name: Фамилия пользователя
+        
+        Returns:
+            Зарегистрированный пользователь или None, если ссылка не найдена,
+            уже использована или просрочена
+        """
+        redeemed = (
+            update(InviteLink)
+            .where(
+                InviteLink.code == code,
+                InviteLink.is_used.is_not(True),
+                or_(InviteLink.expires_at.is_(None), InviteLink.expires_at > func.now())
+            )
+            .values(is_used=True, used_by=user_id, used_at=func.now())
+            .returning(InviteLink.full_name, InviteLink.target_role, InviteLink.created_by)
+            .cte("redeemed")
+        )
+        
+        source = select(
+            literal(user_id, BigInteger),
+            literal(username, String),
+            literal(first_name, String),
+            literal(last_name, String),
+            redeemed.c.full_name,
+            redeemed.c.target_role,
+            redeemed.c.created_by,
+            true(),
+            false()
+        )
+        
+        stmt = pg_insert(User).from_select(
+            ["id", "username", "first_name", "last_name", "full_name",
+             "role", "invited_by", "is_active", "is_blocked"],
+            source
+        )
+        stmt = (
+            stmt.on_conflict_do_update(
+                index_elements=[User.id],
+                set_={
+                    "username": stmt.excluded.username,
+                    "first_name": stmt.excluded.first_name,
+                    "last_name": stmt.excluded.last_name,
+                    "full_name": stmt.excluded.full_name,
+                    "role": stmt.excluded.role,
+                    "invited_by": stmt.excluded.invited_by,
+                    "is_active": True,
+                    "is_blocked": False,
+                    **DELIVERABLE_VALUES,
+                    "updated_at": func.now()
+                }
+            )
+            .returning(User)
+            .add_cte(redeemed)
+            .execution_options(populate_existing=True)
+        )
+        
+        async with self.session_maker() as session:
+            user = await session.scalar(stmt)
+            await session.commit()
+            return user
+    
     async def get_user_invite_links(self, user_id: int) -> List[InviteLink]:
         """Получение всех пригласительных ссылок, созданных пользователем"""
         async with self.session_maker() as session:
@@ -318,49 +1258,60 @@ class Database:
     
     # Методы для управления пользователями
     
-    async def update_user_role(self, user_id: int, role: str) -> Optional[User]:
+    async def _update_one(self, stmt) -> Optional[Row]:
+        """Выполнение UPDATE ... RETURNING для одной записи"""
+        async with self.engine.begin() as conn:
+            result = await conn.execute(stmt)
+            return result.first()
+    
+    async def _update_many(self, stmt) -> List[Row]:
+        """Выполнение UPDATE ... RETURNING для набора записей"""
+        async with self.engine.begin() as conn:
+            result = await conn.execute(stmt)
+            return result.all()
+    
+    def _update_users(self, user_ids: List[int], **values):
+        """Построение UPDATE users ... RETURNING по списку ID"""
+        return (
+            update(users_table)
+            .where(users_table.c.id.in_(user_ids))
+            .values(**values, updated_at=func.now())
+            .returning(*USER_ROW_COLUMNS)
+        )
+    
+    async def update_user_role(self, user_id: int, role: str) -> Optional[Row]:
         """Обновление роли пользователя"""
-        async with self.session_maker() as session:
-            user = await session.get(User, user_id)
-            if user:
-                user.role = role
-                user.updated_at = datetime.utcnow()
-                await session.commit()
-                await session.refresh(user)
-            return user
+        return await self._update_one(self._update_users([user_id], role=role))
+    
+    async def update_users_role(self, user_ids: List[int], role: str) -> List[Row]:
+        """Массовое обновление роли пользователей"""
+        if not user_ids:
+            return []
+        return await self._update_many(self._update_users(user_ids, role=role))
     
-    async def block_user(self, user_id: int) -> Optional[User]:
+    async def block_user(self, user_id: int) -> Optional[Row]:
         """Блокировка пользователя"""
-        async with self.session_maker() as session:
-            user = await session.get(User, user_id)
-            if user:
-                user.is_blocked = True
-                user.updated_at = datetime.utcnow()
-                await session.commit()
-                await session.refresh(user)
-            return user
+        return await self._update_one(self._update_users([user_id], is_blocked=True))
+    
+    async def block_users(self, user_ids: List[int]) -> List[Row]:
+        """Массовая блокировка пользователей"""
+        if not user_ids:
+            return []
+        return await self._update_many(self._update_users(user_ids, is_blocked=True))
     
-    async def unblock_user(self, user_id: int) -> Optional[User]:
+    async def unblock_user(self, user_id: int) -> Optional[Row]:
         """Разблокировка пользователя"""
-        async with self.session_maker() as session:
-            user = await session.get(User, user_id)
-            if user:
-                user.is_blocked = False
-                user.updated_at = datetime.utcnow()
-                await session.commit()
-                await session.refresh(user)
-            return user
+        return await self._update_one(self._update_users([user_id], is_blocked=False))
+    
+    async def unblock_users(self, user_ids: List[int]) -> List[Row]:
+        """Массовая разблокировка пользователей"""
+        if not user_ids:
+            return []
+        return await self._update_many(self._update_users(user_ids, is_blocked=False))
     
-    async def update_user_full_name(self, user_id: int, full_name: str) -> Optional[User]:
+    async def update_user_full_name(self, user_id: int, full_name: str) -> Optional[Row]:
         """Обновление ФИО пользователя"""
-        async with self.session_maker() as session:
-            user = await session.get(User, user_id)
-            if user:
-                user.full_name = full_name
-                user.updated_at = datetime.utcnow()
-                await session.commit()
-                await session.refresh(user)
-            return user
+        return await self._update_one(self._update_users([user_id], full_name=full_name))
     
     async def get_employees(self) -> List[User]:
         """Получение всех сотрудников (не админов)"""
@@ -372,6 +1323,16 @@ class Database:
             )
             return result.scalars().all()
     
+    async def get_employee_records(self) -> List[UserRecord]:
+        """Получение всех сотрудников в виде лёгких моделей чтения"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(*USER_RECORD_COLUMNS)
+                .where(users_table.c.role == "employee")
+                .order_by(users_table.c.created_at.desc())
+            )
+            return [UserRecord(*row) for row in result]
+    
     async def get_admins(self) -> List[User]:
         """Получение всех администраторов"""
         async with self.session_maker() as session:
@@ -402,39 +1363,27 @@ class Database:
         role: str = "employee",
         invited_by: Optional[int] = None
     ) -> User:
-        """Добавление пользователя через пригласительную ссылку"""
-        async with self.session_maker() as session:
-            # Проверяем, существует ли пользователь
-            existing_user = await session.get(User, user_id)
-            if existing_user:
-                # Обновляем данные существующего пользователя
-                existing_user.username = username
-                existing_user.first_name = first_name
-                existing_user.last_name = last_name
-                existing_user.full_name = full_name
-                existing_user.role = role
-                existing_user.invited_by = invited_by
-                existing_user.is_active = True
-                existing_user.is_blocked = False
-                existing_user.updated_at = datetime.utcnow()
-                await session.commit()
-                return existing_user
-            
-            # Создаем нового пользователя
-            user = User(
-                id=user_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                full_name=full_name,
-                role=role,
-                invited_by=invited_by,
-                is_active=True,
-                is_blocked=False
-            )
-            session.add(user)
+        """Добавление пользователя через пригласительную ссылку (upsert за один запрос)"""
+        stmt = self._user_upsert(
+            [{
+                "id": user_id,
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name,
+                "full_name": full_name,
+                "role": role,
+                "invited_by": invited_by,
+                "is_active": True,
+                "is_blocked": False
+            }],
+            update_columns=[
+                "username", "first_name", "last_name", "full_name",
+                "role", "invited_by", "is_active", "is_blocked"
+            ]
+        )
+        async with self.session_maker() as session:
+            user = await session.scalar(stmt)
             await session.commit()
-            await session.refresh(user)
             return user
 
 
@@ -0,0 +1,50 @@
+"""
+Миграция: Чекпоинты рассылок для продолжения после перезапуска
+
+Version: 20261019_000001
+Created: 2026-10-19
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from app.database.migrations.base import Migration
+
+
+class AddBroadcastCheckpoints(Migration):
+    """Добавление полей last_user_id, blocked_count и heartbeat_at в таблицу broadcasts"""
+    
+    def get_version(self) -> str:
+        return "20261019_000001"
+    
+    def get_description(self) -> str:
+        return "Чекпоинты рассылок: последний обработанный получатель, счётчик блокировок, heartbeat"
+    
+    async def upgrade(self, connection: AsyncConnection) -> None:
+        """Применить миграцию"""
+        
+        # ID последнего обработанного получателя (получатели обходятся по возрастанию id)
+        await connection.execute(text("""
+            ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS last_user_id BIGINT DEFAULT 0;
+        """))
+        
+        # Количество получателей, заблокировавших бота
+        await connection.execute(text("""
+            ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS blocked_count INTEGER DEFAULT 0;
+        """))
+        
+        # Время последнего чекпоинта - по нему определяются «зависшие» рассылки
+        await connection.execute(text("""
+            ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE;
+        """))
+        
+        logger.info("✅ Added checkpoint columns to broadcasts table")
+    
+    async def downgrade(self, connection: AsyncConnection) -> None:
+        """Откатить миграцию"""
+        await connection.execute(text("ALTER TABLE broadcasts DROP COLUMN IF EXISTS heartbeat_at;"))
+        await connection.execute(text("ALTER TABLE broadcasts DROP COLUMN IF EXISTS blocked_count;"))
+        await connection.execute(text("ALTER TABLE broadcasts DROP COLUMN IF EXISTS last_user_id;"))
+        
+        logger.info("✅ Rollback completed successfully")
@@ -0,0 +1,44 @@
+"""
+Миграция: Исходное сообщение рассылки для отправки через copyMessage
+
+Version: 20261019_000002
+Created: 2026-10-19
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from app.database.migrations.base import Migration
+
+
+class AddBroadcastSourceMessage(Migration):
+    """Добавление полей source_chat_id и source_message_ids в таблицу broadcasts"""
+    
+    def get_version(self) -> str:
+        return "20261019_000002"
+    
+    def get_description(self) -> str:
+        return "Ссылка на исходное сообщение (или альбом) рассылки в чате админа"
+    
+    async def upgrade(self, connection: AsyncConnection) -> None:
+        """Применить миграцию"""
+        
+        # Чат, из которого копируется сообщение рассылки
+        await connection.execute(text("""
+            ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS source_chat_id BIGINT;
+        """))
+        
+        # ID копируемых сообщений (несколько - для альбома)
+        await connection.execute(text("""
+            ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS source_message_ids BIGINT[];
+        """))
+        
+        logger.info("✅ Added source message columns to broadcasts table")
+    
+    async def downgrade(self, connection: AsyncConnection) -> None:
+        """Откатить миграцию"""
+        await connection.execute(text("ALTER TABLE broadcasts DROP COLUMN IF EXISTS source_message_ids;"))
+        await connection.execute(text("ALTER TABLE broadcasts DROP COLUMN IF EXISTS source_chat_id;"))
+        
+        logger.info("✅ Rollback completed successfully")
@@ -0,0 +1,44 @@
+"""
+Миграция: Статус доставляемости сообщений пользователям
+
+Version: 20261019_000003
+Created: 2026-10-19
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from app.database.migrations.base import Migration
+
+
+class AddUserDeliveryStatus(Migration):
+    """Добавление полей delivery_status и undeliverable_since в таблицу users"""
+    
+    def get_version(self) -> str:
+        return "20261019_000003"
+    
+    def get_description(self) -> str:
+        return "Доставляемость сообщений: пользователи, заблокировавшие бота, исключаются из рассылок"
+    
+    async def upgrade(self, connection: AsyncConnection) -> None:
+        """Применить миграцию"""
+        
+        # ok - сообщения доставляются, blocked - бот заблокирован, deactivated - аккаунт удалён
+        await connection.execute(text("""
+            ALTER TABLE users ADD COLUMN IF NOT EXISTS delivery_status VARCHAR(20) NOT NULL DEFAULT 'ok';
+        """))
+        
+        # Когда доставка перестала проходить
+        await connection.execute(text("""
+            ALTER TABLE users ADD COLUMN IF NOT EXISTS undeliverable_since TIMESTAMP WITH TIME ZONE;
+        """))
+        
+        logger.info("✅ Added delivery status columns to users table")
+    
+    async def downgrade(self, connection: AsyncConnection) -> None:
+        """Откатить миграцию"""
+        await connection.execute(text("ALTER TABLE users DROP COLUMN IF EXISTS undeliverable_since;"))
+        await connection.execute(text("ALTER TABLE users DROP COLUMN IF EXISTS delivery_status;"))
+        
+        logger.info("✅ Rollback completed successfully")
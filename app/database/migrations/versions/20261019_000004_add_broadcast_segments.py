@@ -0,0 +1,70 @@
+"""
+Миграция: Сегменты получателей рассылок
+
+Version: 20261019_000004
+Created: 2026-10-19
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from app.database.migrations.base import Migration
+
+
+# Предикат частичных индексов совпадает с базовым условием BroadcastSegment
+RECIPIENTS_PREDICATE = "is_active = true AND is_blocked = false"
+
+
+class AddBroadcastSegments(Migration):
+    """Колонка segment в broadcasts и частичные индексы для выборки получателей"""
+    
+    def get_version(self) -> str:
+        return "20261019_000004"
+    
+    def get_description(self) -> str:
+        return "Сегменты рассылок: колонка broadcasts.segment и частичные индексы users"
+    
+    async def upgrade(self, connection: AsyncConnection) -> None:
+        """Применить миграцию"""
+        
+        # Сегмент получателей рассылки
+        await connection.execute(text("""
+            ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS segment JSONB;
+        """))
+        
+        # Keyset-обход всех получателей по id
+        await connection.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS idx_users_recipients
+            ON users(id) WHERE {RECIPIENTS_PREDICATE};
+        """))
+        
+        # Сегмент по роли
+        await connection.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS idx_users_recipients_role
+            ON users(role, id) WHERE {RECIPIENTS_PREDICATE};
+        """))
+        
+        # Сегмент по пригласившему админу
+        await connection.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS idx_users_recipients_invited_by
+            ON users(invited_by, id) WHERE {RECIPIENTS_PREDICATE} AND invited_by IS NOT NULL;
+        """))
+        
+        # Сегмент по дате регистрации
+        await connection.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS idx_users_recipients_created_at
+            ON users(created_at) WHERE {RECIPIENTS_PREDICATE};
+        """))
+        
+        logger.info("✅ Added broadcast segment column and recipient indexes")
+    
+    async def downgrade(self, connection: AsyncConnection) -> None:
+        """Откатить миграцию"""
+        await connection.execute(text("DROP INDEX IF EXISTS idx_users_recipients_created_at;"))
+        await connection.execute(text("DROP INDEX IF EXISTS idx_users_recipients_invited_by;"))
+        await connection.execute(text("DROP INDEX IF EXISTS idx_users_recipients_role;"))
+        await connection.execute(text("DROP INDEX IF EXISTS idx_users_recipients;"))
+        await connection.execute(text("ALTER TABLE broadcasts DROP COLUMN IF EXISTS segment;"))
+        
+        logger.info("✅ Rollback completed successfully")
@@ -0,0 +1,63 @@
+"""
+Миграция: Задания планировщика
+
+Version: 20261019_000005
+Created: 2026-10-19
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from app.database.migrations.base import Migration
+
+
+class AddScheduledJobs(Migration):
+    """Таблица scheduled_jobs для отложенных рассылок и периодических задач"""
+    
+    def get_version(self) -> str:
+        return "20261019_000005"
+    
+    def get_description(self) -> str:
+        return "Задания планировщика: отложенные рассылки и периодические задачи"
+    
+    async def upgrade(self, connection: AsyncConnection) -> None:
+        """Применить миграцию"""
+        
+        await connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                name VARCHAR(100) UNIQUE,
+                kind VARCHAR(50) NOT NULL,
+                payload JSONB,
+                
+                -- Расписание
+                run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                interval_seconds INTEGER,
+                timezone VARCHAR(64) DEFAULT 'UTC',
+                
+                -- Выполнение
+                status VARCHAR(20) DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                last_error TEXT,
+                last_run_at TIMESTAMP WITH TIME ZONE,
+                
+                created_by BIGINT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+        """))
+        
+        # Выборка наступивших заданий на каждом тике планировщика
+        await connection.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_due
+            ON scheduled_jobs(run_at) WHERE status = 'pending';
+        """))
+        
+        logger.info("✅ Created scheduled_jobs table")
+    
+    async def downgrade(self, connection: AsyncConnection) -> None:
+        """Откатить миграцию"""
+        await connection.execute(text("DROP INDEX IF EXISTS idx_scheduled_jobs_due;"))
+        await connection.execute(text("DROP TABLE IF EXISTS scheduled_jobs;"))
+        
+        logger.info("✅ Rollback completed successfully")
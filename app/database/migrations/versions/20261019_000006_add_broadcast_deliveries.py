@@ -0,0 +1,54 @@
+"""
+Миграция: Журнал доставки рассылок по получателям
+
+Version: 20261019_000006
+Created: 2026-10-19
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from app.database.migrations.base import Migration
+
+
+class AddBroadcastDeliveries(Migration):
+    """Таблица broadcast_deliveries: статус, код ошибки и задержка отправки каждому получателю"""
+    
+    def get_version(self) -> str:
+        return "20261019_000006"
+    
+    def get_description(self) -> str:
+        return "Журнал доставки рассылок по получателям"
+    
+    async def upgrade(self, connection: AsyncConnection) -> None:
+        """Применить миграцию"""
+        
+        # Без внешних ключей: таблица заполняется через COPY пачками по тысячам строк
+        await connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+                id BIGSERIAL PRIMARY KEY,
+                broadcast_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                error_code INTEGER,
+                latency_ms INTEGER,
+                message_id BIGINT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+        """))
+        
+        # Отбор получателей повторной рассылки и статистика по рассылке
+        await connection.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_broadcast_status
+            ON broadcast_deliveries(broadcast_id, status, user_id);
+        """))
+        
+        logger.info("✅ Created broadcast_deliveries table")
+    
+    async def downgrade(self, connection: AsyncConnection) -> None:
+        """Откатить миграцию"""
+        await connection.execute(text("DROP INDEX IF EXISTS idx_broadcast_deliveries_broadcast_status;"))
+        await connection.execute(text("DROP TABLE IF EXISTS broadcast_deliveries;"))
+        
+        logger.info("✅ Rollback completed successfully")
@@ -0,0 +1,47 @@
+"""
+Миграция: Одна запись журнала доставки на получателя рассылки
+
+Version: 20261019_000007
+Created: 2026-10-19
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from loguru import logger
+
+from app.database.migrations.base import Migration
+
+
+class UniqueBroadcastDeliveries(Migration):
+    """Уникальный индекс (broadcast_id, user_id) в broadcast_deliveries"""
+    
+    def get_version(self) -> str:
+        return "20261019_000007"
+    
+    def get_description(self) -> str:
+        return "Одна запись журнала доставки на получателя рассылки"
+    
+    async def upgrade(self, connection: AsyncConnection) -> None:
+        """Применить миграцию"""
+        
+        # Повторно записанные чекпоинтом строки: оставляем первую
+        await connection.execute(text("""
+            DELETE FROM broadcast_deliveries d
+            USING broadcast_deliveries earlier
+            WHERE earlier.broadcast_id = d.broadcast_id
+              AND earlier.user_id = d.user_id
+              AND earlier.id < d.id;
+        """))
+        
+        await connection.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_broadcast_deliveries_broadcast_user
+            ON broadcast_deliveries(broadcast_id, user_id);
+        """))
+        
+        logger.info("✅ Added unique index on broadcast_deliveries(broadcast_id, user_id)")
+    
+    async def downgrade(self, connection: AsyncConnection) -> None:
+        """Откатить миграцию"""
+        await connection.execute(text("DROP INDEX IF EXISTS idx_broadcast_deliveries_broadcast_user;"))
+        
+        logger.info("✅ Rollback completed successfully")
@@ -2,8 +2,9 @@
 Модели базы данных
 """
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from sqlalchemy import BigInteger, DateTime, String, Boolean, Integer, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.sql import func
 
@@ -26,6 +27,8 @@ class User(Base):
     role: Mapped[str] = mapped_column(String(50), default="employee")  # admin или employee
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_blocked: Mapped[bool] = mapped_column(Boolean, default=False)  # Заблокирован ли доступ
+    delivery_status: Mapped[str] = mapped_column(String(20), default="ok", server_default="ok")  # ok, blocked, deactivated
+    undeliverable_since: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # Когда доставка перестала проходить
     invited_by: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # ID админа, который пригласил
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -121,4 +124,100 @@ class Creative(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     def __repr__(self) -> str:
-        return f"<Creative(id={self.id}, erid={self.erid}, form={self.form})>" 
\ No newline at end of file
+        return f"<Creative(id={self.id}, erid={self.erid}, form={self.form})>"
+
+
+class UserAction(Base):
+    """Модель журнала действий пользователей (пишется пачками через COPY)"""
+    
+    __tablename__ = "user_actions"
+    
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # ID пользователя Telegram
+    action_type: Mapped[str] = mapped_column(String(50), nullable=False)  # creative_step, media_uploaded, ...
+    action_data: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)  # Детали события
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self) -> str:
+        return f"<UserAction(user_id={self.user_id}, action_type={self.action_type})>"
+
+
+class Broadcast(Base):
+    """Модель рассылки (долговременное задание с чекпоинтами)"""
+    
+    __tablename__ = "broadcasts"
+    
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    admin_id: Mapped[int] = mapped_column(BigInteger, nullable=False)  # ID админа, запустившего рассылку
+    
+    # Содержимое рассылки
+    message_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Текст или подпись (HTML)
+    media_type: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)  # Тип контента (text, photo, ..., media_group)
+    media_file_id: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # File ID медиа в Telegram
+    source_chat_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # Чат исходного сообщения
+    source_message_ids: Mapped[Optional[List[int]]] = mapped_column(ARRAY(BigInteger), nullable=True)  # Сообщение или альбом для copyMessage
+    button_text: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    button_url: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    segment: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)  # Сегмент получателей (BroadcastSegment.to_dict)
+    
+    # Прогресс
+    target_users: Mapped[int] = mapped_column(Integer, default=0)
+    sent_count: Mapped[int] = mapped_column(Integer, default=0)
+    failed_count: Mapped[int] = mapped_column(Integer, default=0)
+    blocked_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_user_id: Mapped[int] = mapped_column(BigInteger, default=0)  # Чекпоинт: последний обработанный получатель
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # draft, scheduled, pending, running, queued, completed, failed, cancelled
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # Время последнего чекпоинта
+    
+    def __repr__(self) -> str:
+        return f"<Broadcast(id={self.id}, status={self.status})>"
+
+
+class BroadcastDelivery(Base):
+    """Модель журнала доставки рассылки по получателям (пишется пачками через COPY)"""
+    
+    __tablename__ = "broadcast_deliveries"
+    
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    broadcast_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # sent, failed, blocked
+    error_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Код ошибки Telegram (400, 403, 429, ...)
+    latency_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Длительность последней попытки отправки
+    message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # ID доставленного сообщения у получателя
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self) -> str:
+        return f"<BroadcastDelivery(broadcast_id={self.broadcast_id}, user_id={self.user_id}, status={self.status})>"
+
+
+class ScheduledJob(Base):
+    """Модель задания планировщика (разовое или периодическое)"""
+    
+    __tablename__ = "scheduled_jobs"
+    
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    name: Mapped[Optional[str]] = mapped_column(String(100), unique=True, nullable=True)  # Имя системного задания (одно задание на имя)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)  # broadcast, stats_rollup, cleanup
+    payload: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)  # Параметры задания (например, broadcast_id)
+    
+    # Расписание
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)  # Время следующего запуска
+    interval_seconds: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Период повтора, None - разовое задание
+    timezone: Mapped[str] = mapped_column(String(64), default="UTC")  # Часовой пояс, по местному времени которого идут повторы
+    
+    # Выполнение
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending, running, done, failed, cancelled
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    last_run_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    created_by: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)  # ID админа (для пользовательских заданий)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self) -> str:
+        return f"<ScheduledJob(id={self.id}, kind={self.kind}, status={self.status})>"
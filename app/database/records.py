@@ -0,0 +1,69 @@
+"""
+Лёгкие модели чтения для горячих путей
+
+В отличие от ORM-моделей не попадают в identity map сессии и не несут
+инструментирования SQLAlchemy: это обычные dataclass со __slots__,
+заполняемые напрямую из строк Core-запросов.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from .models import User, Creative, BroadcastDelivery
+
+
+users_table = User.__table__
+creatives_table = Creative.__table__
+deliveries_table = BroadcastDelivery.__table__
+
+
+@dataclass(slots=True, frozen=True)
+class UserRecord:
+    """Пользователь (только поля, нужные хендлерам и middleware)"""
+    
+    id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    full_name: Optional[str]
+    role: str
+    is_active: bool
+    is_blocked: bool
+    invited_by: Optional[int]
+    created_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
+class CreativeRecord:
+    """Креатив для списка «Мои креативы»"""
+    
+    id: int
+    form: str
+    kktu_code: str
+    erid: Optional[str]
+    status: str
+    error_message: Optional[str]
+    created_at: datetime
+
+
+# Порядок колонок совпадает с порядком полей dataclass
+USER_RECORD_COLUMNS = (
+    users_table.c.id,
+    users_table.c.username,
+    users_table.c.first_name,
+    users_table.c.full_name,
+    users_table.c.role,
+    users_table.c.is_active,
+    users_table.c.is_blocked,
+    users_table.c.invited_by,
+    users_table.c.created_at,
+)
+
+CREATIVE_RECORD_COLUMNS = (
+    creatives_table.c.id,
+    creatives_table.c.form,
+    creatives_table.c.kktu_code,
+    creatives_table.c.erid,
+    creatives_table.c.status,
+    creatives_table.c.error_message,
+    creatives_table.c.created_at,
+)
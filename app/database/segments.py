@@ -0,0 +1,77 @@
+"""
+Сегменты получателей рассылок
+
+Сегмент описывает подмножество пользователей и компилируется в условия
+одного SQL-запроса по таблице users (без выборки пользователей в Python).
+Базовое условие сегмента (is_active AND NOT is_blocked) совпадает
+с предикатом частичных индексов из миграции 20261019_000004.
+"""
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import exists, select
+
+from .records import users_table, creatives_table, deliveries_table
+
+
+@dataclass(slots=True, frozen=True)
+class BroadcastSegment:
+    """Фильтр получателей рассылки (пустой сегмент - все активные незаблокированные пользователи)"""
+    
+    role: Optional[str] = None  # admin или employee
+    is_blocked: bool = False  # True - только пользователи с заблокированным доступом
+    invited_by: Optional[int] = None  # ID админа, выдавшего приглашение
+    created_from: Optional[datetime] = None  # Зарегистрированы не раньше
+    created_to: Optional[datetime] = None  # Зарегистрированы раньше
+    has_creatives: Optional[bool] = None  # True - создавали креативы, False - ни одного
+    retry_of: Optional[int] = None  # ID рассылки, доставка которой получателю не удалась (повтор)
+    
+    def conditions(self) -> List[Any]:
+        """Условия WHERE для таблицы users"""
+        users = users_table
+        conditions = [users.c.is_active == True, users.c.is_blocked == self.is_blocked]
+        
+        if self.role is not None:
+            conditions.append(users.c.role == self.role)
+        if self.invited_by is not None:
+            conditions.append(users.c.invited_by == self.invited_by)
+        if self.created_from is not None:
+            conditions.append(users.c.created_at >= self.created_from)
+        if self.created_to is not None:
+            conditions.append(users.c.created_at < self.created_to)
+        if self.has_creatives is not None:
+            has_creatives = exists(
+                select(creatives_table.c.id).where(creatives_table.c.user_id == users.c.id)
+            )
+            conditions.append(has_creatives if self.has_creatives else ~has_creatives)
+        if self.retry_of is not None:
+            conditions.append(exists(
+                select(deliveries_table.c.id).where(
+                    deliveries_table.c.broadcast_id == self.retry_of,
+                    deliveries_table.c.status == "failed",
+                    deliveries_table.c.user_id == users.c.id
+                )
+            ))
+        
+        return conditions
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Сериализация для колонки broadcasts.segment (JSONB)"""
+        data = asdict(self)
+        for key in ("created_from", "created_to"):
+            if data[key] is not None:
+                data[key] = data[key].isoformat()
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "BroadcastSegment":
+        """Восстановление сегмента из broadcasts.segment"""
+        if not data:
+            return cls()
+        
+        values = dict(data)
+        for key in ("created_from", "created_to"):
+            if values.get(key):
+                values[key] = datetime.fromisoformat(values[key])
+        return cls(**values)
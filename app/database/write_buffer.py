@@ -0,0 +1,264 @@
+"""
+Буфер отложенной записи (write-behind) для некритичных изменений
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncEngine
+from loguru import logger
+
+
+class BufferedStatement:
+    """
+    Отложенный INSERT/UPDATE, выполняемый пачкой через executemany
+    
+    Если задан coalesce_key (функция, вычисляющая ключ по параметрам),
+    из нескольких записей с одинаковым ключом до сброса буфера доживает
+    только последняя (например, последний статус креатива).
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        statement,
+        coalesce_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None
+    ):
+        self.name = name
+        self.statement = statement
+        self.coalesce_key = coalesce_key
+    
+    async def execute(self, engine: AsyncEngine, rows: List[Dict[str, Any]]) -> None:
+        async with engine.begin() as conn:
+            await conn.execute(self.statement, rows)
+    
+    def __repr__(self) -> str:
+        return f"<BufferedStatement({self.name})>"
+
+
+class BufferedCopy:
+    """Отложенная вставка, выполняемая пачкой через COPY (asyncpg copy_records_to_table)"""
+    
+    def __init__(self, table_name: str, columns: Sequence[str]):
+        self.name = table_name
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.coalesce_key = None
+    
+    async def execute(self, engine: AsyncEngine, rows: List[Tuple[Any, ...]]) -> None:
+        async with engine.connect() as conn:
+            raw_connection = await conn.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                self.table_name,
+                records=rows,
+                columns=self.columns
+            )
+    
+    def __repr__(self) -> str:
+        return f"<BufferedCopy({self.table_name})>"
+
+
+class WriteBehindBuffer:
+    """
+    Буфер, собирающий некритичные записи и сбрасывающий их пачками
+    
+    Сброс происходит по таймеру (flush_interval) или при накоплении
+    max_batch записей. Если в буфере max_pending записей, отправитель
+    сам выполняет сброс и ждёт его завершения (back-pressure).
+    Пачка, которая не записалась, повторяется с экспоненциальной паузой,
+    чтобы кратковременная недоступность базы не теряла записи.
+    """
+    
+    # Сколько раз подряд можно вернуть в буфер пачку, которая не записалась
+    MAX_RETRIES = 6
+    
+    # Пауза перед первым повтором (секунды), дальше удваивается до MAX_RETRY_DELAY
+    RETRY_DELAY = 0.5
+    MAX_RETRY_DELAY = 30.0
+    
+    # Попытки сброса при закрытии буфера
+    CLOSE_ATTEMPTS = 3
+    
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        max_batch: int = 500,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000
+    ):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        
+        self._pending: Dict[Any, Any] = {}
+        self._count = 0
+        self._failures: Dict[Any, int] = {}
+        self._retry_at: Dict[Any, float] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+    
+    @property
+    def pending(self) -> int:
+        """Количество записей, ожидающих сброса"""
+        return self._count
+    
+    def start(self) -> None:
+        """Запуск фонового сброса"""
+        if self._task is None or self._task.done():
+            self._closed = False
+            self._task = asyncio.create_task(self._run(), name="write-behind-buffer")
+            logger.info("✅ Write-behind buffer started")
+    
+    async def submit(self, operation, params) -> None:
+        """
+        Поставить запись в буфер
+        
+        Args:
+            operation: BufferedStatement или BufferedCopy
+            params: Словарь параметров (для BufferedStatement) или кортеж значений (для BufferedCopy)
+        """
+        if self._closed:
+            raise RuntimeError("Write-behind buffer is closed")
+        
+        # Back-pressure: буфер полон - сбрасываем его сами, при ошибках базы ждём с нарастающей паузой
+        delay = self.RETRY_DELAY
+        while self._count >= self.max_pending:
+            await self.flush()
+            if self._count >= self.max_pending:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_RETRY_DELAY)
+        
+        if operation.coalesce_key:
+            rows = self._pending.setdefault(operation, {})
+            key = operation.coalesce_key(params)
+            if key not in rows:
+                self._count += 1
+            rows[key] = params
+        else:
+            self._pending.setdefault(operation, []).append(params)
+            self._count += 1
+        
+        if self._count >= self.max_batch:
+            self._wakeup.set()
+    
+    async def flush(self, force: bool = False) -> None:
+        """
+        Сбросить накопленные записи в базу
+        
+        Args:
+            force: Не ждать окончания паузы перед повтором (при закрытии буфера)
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            
+            pending, self._pending, self._count = self._pending, {}, 0
+            items = [
+                (operation, list(rows.values()) if isinstance(rows, dict) else rows)
+                for operation, rows in pending.items()
+            ]
+            now = time.monotonic()
+            index = sent = 0
+            
+            try:
+                for index, (operation, rows) in enumerate(items):
+                    sent = 0
+                    
+                    # Пачка после ошибки ждёт своей паузы в буфере
+                    if not force and self._retry_at.get(operation, 0.0) > now:
+                        self._restore(operation, rows)
+                        sent = len(rows)
+                        continue
+                    
+                    for start in range(0, len(rows), self.max_batch):
+                        batch = rows[start:start + self.max_batch]
+                        try:
+                            await operation.execute(self.engine, batch)
+                            self._failures.pop(operation, None)
+                            self._retry_at.pop(operation, None)
+                        except Exception as e:
+                            self._requeue(operation, rows[start:], e)
+                            break
+                        sent = start + len(batch)
+                    sent = len(rows)
+            except BaseException:
+                # Отмена посреди сброса: неотправленные записи возвращаются в буфер
+                if items:
+                    operation, rows = items[index]
+                    self._restore(operation, rows[sent:])
+                    for operation, rows in items[index + 1:]:
+                        self._restore(operation, rows)
+                raise
+    
+    def _requeue(self, operation, rows: list, error: Exception) -> None:
+        """Вернуть несохранённые записи в буфер с паузой перед повтором или отбросить их после MAX_RETRIES попыток"""
+        failures = self._failures.get(operation, 0) + 1
+        
+        if failures >= self.MAX_RETRIES:
+            self._failures.pop(operation, None)
+            self._retry_at.pop(operation, None)
+            logger.error(f"❌ Dropped {len(rows)} buffered writes for {operation!r} after {failures} attempts: {error}")
+            return
+        
+        delay = min(self.RETRY_DELAY * 2 ** (failures - 1), self.MAX_RETRY_DELAY)
+        self._failures[operation] = failures
+        self._retry_at[operation] = time.monotonic() + delay
+        logger.warning(f"⚠️ Failed to flush {len(rows)} writes for {operation!r}, retry in {delay:g}s: {error}")
+        self._restore(operation, rows)
+    
+    def _restore(self, operation, rows: list) -> None:
+        """Вернуть записи в буфер (более новые записи с тем же ключом не перезаписываются)"""
+        if not rows:
+            return
+        if operation.coalesce_key:
+            current = self._pending.setdefault(operation, {})
+            for row in rows:
+                key = operation.coalesce_key(row)
+                if key not in current:
+                    current[key] = row
+                    self._count += 1
+        else:
+            self._pending[operation] = rows + self._pending.get(operation, [])
+            self._count += len(rows)
+    
+    async def _run(self) -> None:
+        """Фоновый цикл сброса по таймеру или по заполнению (до close())"""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Write-behind flush failed: {e}")
+    
+    async def close(self) -> None:
+        """Остановить фоновый сброс и записать всё, что осталось в буфере"""
+        self._closed = True
+        
+        if self._task:
+            # Цикл завершается сам после текущего сброса - отмена посреди записи не нужна
+            self._wakeup.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        # Несколько попыток, чтобы пачки, вернувшиеся после ошибки, тоже ушли
+        for attempt in range(self.CLOSE_ATTEMPTS):
+            await self.flush(force=True)
+            if not self._pending:
+                break
+            if attempt + 1 < self.CLOSE_ATTEMPTS:
+                await asyncio.sleep(self.RETRY_DELAY * 2 ** attempt)
+        
+        if self._pending:
+            logger.error(f"❌ Write-behind buffer closed with {self._count} unsaved writes")
+        else:
+            logger.info("✅ Write-behind buffer flushed and closed")
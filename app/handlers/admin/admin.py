@@ -2,28 +2,131 @@
 Админские хендлеры
 """
 import re
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from typing import Callable, Dict, List, Optional, Tuple
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
 from loguru import logger
 
 from app.config import settings
-from app.database import db
+from app.database import db, BroadcastSegment
+from app.database.models import Broadcast
 from app.states import AdminStates
 from app.keyboards import AdminKeyboards
-from app.services import BroadcastService
+from app.services import BroadcastService, ProgressReporter, format_duration
+from app.services.broadcast_queue import BroadcastQueue
+from app.services.broadcast_control import BroadcastControl, CONTROL_STATES, RUNNING, PAUSED, CANCELLED
+from app.services.scheduler import next_local_time
+from app.utils import get_redis, spawn
+from app.middlewares import AlbumMiddleware
 
 router = Router()
 
+# Альбомы для рассылки приходят одним вызовом хендлера
+router.message.middleware(AlbumMiddleware())
+
 
 def is_admin(user_id: int) -> bool:
     """Проверка, является ли пользователь админом"""
     return settings.is_admin(user_id)
 
 
+def render_broadcast_progress(stats: dict) -> str:
+    """Текст сообщения с прогрессом рассылки"""
+    processed = stats["sent"] + stats["failed"] + stats["blocked"]
+    progress_percent = int(processed / max(stats["total"], 1) * 100)
+    
+    state = stats.get("state", RUNNING)
+    remaining = max(stats["total"] - processed, 0)
+    eta = format_duration(remaining / stats["rate"]) if stats["rate"] > 0 and state == RUNNING else "—"
+    
+    if state == PAUSED:
+        title = "⏸ <b>Рассылка на паузе</b>"
+    elif state == CANCELLED:
+        title = "⛔ <b>Рассылка останавливается...</b>"
+    else:
+        title = "📤 <b>Рассылка в процессе...</b>"
+    
+    return (
+        f"{title}\n\n"
+        f"📊 Прогресс: <b>{progress_percent}%</b> ({processed}/{stats['total']})\n"
+        f"✅ Отправлено: <b>{stats['sent']}</b>\n"
+        f"❌ Ошибок: <b>{stats['failed']}</b>\n"
+        f"🚫 Заблокировано: <b>{stats['blocked']}</b>\n"
+        f"⚡ Скорость: <b>{stats['rate']:.1f}</b> сообщ./сек "
+        f"(потоков: {stats['concurrency']}, ошибок: {stats['error_rate']:.1%})\n"
+        f"⏱ Осталось: <b>{eta}</b>"
+    )
+
+
+def recent_users_segment(days: int) -> BroadcastSegment:
+    """Сегмент пользователей, зарегистрированных за последние days дней (с точностью до часа - для кэша превью)"""
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return BroadcastSegment(created_from=now - timedelta(days=days))
+
+
+# Готовые сегменты получателей: ключ -> (название, построение сегмента по ID админа)
+BROADCAST_SEGMENTS: Dict[str, Tuple[str, Callable[[int], BroadcastSegment]]] = {
+    "all": ("👥 Все пользователи", lambda admin_id: BroadcastSegment()),
+    "employees": ("👷 Сотрудники", lambda admin_id: BroadcastSegment(role="employee")),
+    "admins": ("🔧 Администраторы", lambda admin_id: BroadcastSegment(role="admin")),
+    "with_creatives": ("🎨 Создавали креативы", lambda admin_id: BroadcastSegment(has_creatives=True)),
+    "without_creatives": ("💤 Ещё без креативов", lambda admin_id: BroadcastSegment(has_creatives=False)),
+    "new": ("🆕 Новые за 7 дней", lambda admin_id: recent_users_segment(7)),
+    "my_invites": ("📨 Приглашённые мной", lambda admin_id: BroadcastSegment(invited_by=admin_id)),
+}
+
+
+def parse_schedule_time(value: str, tz_name: str) -> Optional[datetime]:
+    """
+    Время отложенной рассылки в часовом поясе tz_name (результат - в UTC)
+    
+    Форматы: «ДД.ММ.ГГГГ ЧЧ:ММ», «ДД.ММ ЧЧ:ММ» и «ЧЧ:ММ» (ближайшее
+    наступление этой даты или времени).
+    """
+    value = " ".join(value.split())
+    tz = ZoneInfo(tz_name)
+    
+    for fmt in ("%d.%m.%Y %H:%M", "%H:%M"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        
+        if fmt == "%H:%M":
+            return next_local_time(parsed.time(), tz_name)
+        return parsed.replace(tzinfo=tz).astimezone(timezone.utc)
+    
+    # «ДД.ММ ЧЧ:ММ»: год подставляется до разбора (с годом по умолчанию 1900
+    # не разбирается 29.02), уже прошедшая дата переносится на следующий год
+    match = re.fullmatch(r"(\d{1,2}\.\d{1,2}) (\d{1,2}:\d{2})", value)
+    if match:
+        now = datetime.now(tz)
+        # 29.02 ближайшего високосного года - не дальше чем через 4 года
+        for year in range(now.year, now.year + 5):
+            try:
+                parsed = datetime.strptime(f"{match[1]}.{year} {match[2]}", "%d.%m.%Y %H:%M")
+            except ValueError:
+                continue
+            parsed = parsed.replace(tzinfo=tz)
+            if parsed > now:
+                return parsed.astimezone(timezone.utc)
+    
+    return None
+
+
+async def discard_broadcast_draft(state: FSMContext) -> None:
+    """Удаление черновика рассылки, ID которого хранится в FSM"""
+    data = await state.get_data()
+    broadcast_id = data.get("broadcast_id")
+    if broadcast_id:
+        await db.delete_broadcast_drafts(broadcast_id=broadcast_id)
+
+
 @router.message(Command("admin"))
 async def admin_command(message: Message, bot: Bot):
     """Обработчик команды /admin"""
@@ -74,8 +177,8 @@ async def start_broadcast(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.edit_text(
         "📤 <b>Создание рассылки</b>\n\n"
-        "Отправьте сообщение любого типа (текст, фото, видео, документ и т.д.), "
-        "которое хотите разослать всем пользователям бота.\n\n"
+        "Отправьте сообщение любого типа (текст, фото, видео, документ, альбом и т.д.), "
+        "которое хотите разослать пользователям бота. Получателей можно будет выбрать на следующем шаге.\n\n"
         "Для отмены введите /cancel"
     )
     
@@ -83,26 +186,88 @@ async def start_broadcast(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(StateFilter(AdminStates.broadcast_message))
-async def receive_broadcast_message(message: Message, state: FSMContext):
-    """Получение сообщения для рассылки"""
+async def receive_broadcast_message(message: Message, state: FSMContext, album: Optional[List[Message]] = None):
+    """Получение сообщения (или альбома) для рассылки"""
     if not is_admin(message.from_user.id):
         await state.clear()
         return
     
-    # Сохраняем сообщение в состояние
-    await state.update_data(broadcast_message=message)
-    
-    # Получаем количество пользователей для рассылки
-    users_count = await db.get_active_users_count()
+    # Повторно присланное сообщение заменяет предыдущий черновик
+    await discard_broadcast_draft(state)
+    
+    # Черновик хранит ссылку на исходное сообщение (рассылка копирует его через copyMessage),
+    # в FSM остаётся только ID черновика
+    messages = album or [message]
+    draft = await BroadcastService.create_draft(
+        admin_id=message.from_user.id,
+        source_chat_id=message.chat.id,
+        source_message_ids=[item.message_id for item in messages],
+        content_type="media_group" if album else message.content_type
+    )
+    await state.update_data(broadcast_id=draft.id)
     
+    received = f"✅ <b>Альбом получен!</b> ({len(album)} шт.)" if album else "✅ <b>Сообщение получено!</b>"
     await message.answer(
-        f"✅ <b>Сообщение получено!</b>\n\n"
-        f"👥 Количество получателей: <b>{users_count}</b>\n\n"
-        f"Хотите добавить кнопку к сообщению?",
-        reply_markup=AdminKeyboards.broadcast_add_button()
+        f"{received}\n\n"
+        f"🎯 Выберите получателей рассылки:",
+        reply_markup=AdminKeyboards.broadcast_segments(
+            [(key, title) for key, (title, _) in BROADCAST_SEGMENTS.items()]
+        )
     )
 
 
+@router.callback_query(F.data.startswith("broadcast_segment:"), StateFilter(AdminStates.broadcast_message))
+async def choose_broadcast_segment(callback: CallbackQuery, state: FSMContext):
+    """Выбор сегмента получателей рассылки"""
+    preset = BROADCAST_SEGMENTS.get(callback.data.split(":", 1)[1])
+    if not preset:
+        await callback.answer("❌ Неизвестный сегмент")
+        return
+    
+    title, build_segment = preset
+    data = await state.get_data()
+    broadcast_id = data.get("broadcast_id")
+    
+    users_count = None
+    if broadcast_id:
+        users_count = await BroadcastService.set_segment(
+            broadcast_id,
+            admin_id=callback.from_user.id,
+            segment=build_segment(callback.from_user.id)
+        )
+    
+    if users_count is None:
+        await callback.message.edit_text("❌ Ошибка: черновик рассылки не найден")
+        await state.clear()
+        await callback.answer()
+        return
+    
+    if users_count == 0:
+        await callback.answer("В этом сегменте нет получателей, выберите другой", show_alert=True)
+        return
+    
+    draft = await db.get_broadcast(broadcast_id)
+    if draft and draft.media_type == "media_group":
+        # К альбому Telegram не позволяет прикрепить inline-кнопку
+        await callback.message.edit_text(
+            f"📤 <b>Подтверждение рассылки</b>\n\n"
+            f"🎯 Сегмент: <b>{title}</b>\n"
+            f"👥 Получателей: <b>{users_count}</b>\n"
+            f"🔗 С кнопкой: <b>Нет</b> (альбомы отправляются без кнопки)\n\n"
+            f"Отправить рассылку?",
+            reply_markup=AdminKeyboards.broadcast_confirm(users_count)
+        )
+    else:
+        await callback.message.edit_text(
+            f"🎯 Сегмент: <b>{title}</b>\n"
+            f"👥 Количество получателей: <b>{users_count}</b>\n\n"
+            f"Хотите добавить кнопку к сообщению?",
+            reply_markup=AdminKeyboards.broadcast_add_button()
+        )
+    
+    await callback.answer()
+
+
 @router.callback_query(F.data == "broadcast_add_button", StateFilter(AdminStates.broadcast_message))
 async def add_button_to_broadcast(callback: CallbackQuery, state: FSMContext):
     """Добавление кнопки к рассылке"""
@@ -143,11 +308,18 @@ async def receive_broadcast_button(message: Message, state: FSMContext):
     button_text = match.group(1).strip()
     button_url = match.group(2).strip()
     
-    # Сохраняем данные кнопки
-    await state.update_data(
+    # Сохраняем кнопку в черновике
+    data = await state.get_data()
+    saved = await db.update_broadcast_draft(
+        data.get("broadcast_id"),
+        admin_id=message.from_user.id,
         button_text=button_text,
         button_url=button_url
     )
+    if not saved:
+        await message.answer("❌ Ошибка: черновик рассылки не найден")
+        await state.clear()
+        return
     
     # Создаем превью кнопки
     preview_keyboard = AdminKeyboards.create_custom_button(button_text, button_url)
@@ -161,8 +333,7 @@ async def receive_broadcast_button(message: Message, state: FSMContext):
     )
     
     # Переходим к подтверждению
-    data = await state.get_data()
-    users_count = await db.get_active_users_count()
+    users_count = await BroadcastService.count_recipients(data.get("broadcast_id"))
     
     await message.answer(
         f"📤 <b>Подтверждение рассылки</b>\n\n"
@@ -176,7 +347,8 @@ async def receive_broadcast_button(message: Message, state: FSMContext):
 @router.callback_query(F.data == "broadcast_no_button", StateFilter(AdminStates.broadcast_message))
 async def broadcast_without_button(callback: CallbackQuery, state: FSMContext):
     """Рассылка без кнопки"""
-    users_count = await db.get_active_users_count()
+    data = await state.get_data()
+    users_count = await BroadcastService.count_recipients(data.get("broadcast_id"))
     
     await callback.message.edit_text(
         f"📤 <b>Подтверждение рассылки</b>\n\n"
@@ -197,84 +369,281 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, bot: Bot
         return
     
     data = await state.get_data()
-    broadcast_message = data.get("broadcast_message")
+    broadcast_id = data.get("broadcast_id")
     
-    if not broadcast_message:
+    # Начинаем рассылку: черновик становится заданием, которое переживёт перезапуск
+    # (в режиме distributed его выполняют отдельные процессы воркеров)
+    distributed = settings.broadcast_mode == "distributed"
+    broadcast_service = BroadcastService(bot)
+    broadcast = None
+    if broadcast_id:
+        broadcast = await broadcast_service.start_draft(
+            broadcast_id,
+            admin_id=callback.from_user.id,
+            status="queued" if distributed else "running"
+        )
+    
+    if not broadcast:
         await callback.message.edit_text("❌ Ошибка: сообщение для рассылки не найдено")
         await state.clear()
         return
     
-    # Создаем кнопку если есть
-    custom_keyboard = None
-    if data.get("button_text") and data.get("button_url"):
-        custom_keyboard = AdminKeyboards.create_custom_button(
-            data["button_text"],
-            data["button_url"]
-        )
-    
-    # Начинаем рассылку
-    broadcast_service = BroadcastService(bot)
-    
-    # Сообщение о начале рассылки
+    # Сообщение о начале рассылки с кнопками паузы и отмены
     progress_message = await callback.message.edit_text(
         "📤 <b>Рассылка запущена...</b>\n\n"
         "📊 Прогресс: <b>0%</b>\n"
         "✅ Отправлено: <b>0</b>\n"
         "❌ Ошибок: <b>0</b>\n"
-        "🚫 Заблокировано: <b>0</b>"
+        "🚫 Заблокировано: <b>0</b>",
+        reply_markup=AdminKeyboards.broadcast_control(broadcast.id)
     )
     
-    # Функция для обновления прогресса
-    async def update_progress(stats: dict):
-        progress_percent = int((stats["sent"] + stats["failed"] + stats["blocked"]) / stats["total"] * 100)
-        
-        try:
-            await progress_message.edit_text(
-                f"📤 <b>Рассылка в процессе...</b>\n\n"
-                f"📊 Прогресс: <b>{progress_percent}%</b>\n"
-                f"✅ Отправлено: <b>{stats['sent']}</b>\n"
-                f"❌ Ошибок: <b>{stats['failed']}</b>\n"
-                f"🚫 Заблокировано: <b>{stats['blocked']}</b>"
-            )
-        except Exception:
-            # Игнорируем ошибки обновления прогресса
-            pass
+    # Прогресс обновляется не чаще раза в BROADCAST_PROGRESS_INTERVAL секунд
+    progress = ProgressReporter(
+        progress_message,
+        render=render_broadcast_progress,
+        min_interval=settings.broadcast_progress_interval,
+        rate_limiter=broadcast_service.rate_limiter,
+        keyboard=lambda stats: AdminKeyboards.broadcast_control(broadcast.id, stats.get("state", RUNNING))
+    )
     
-    # Запускаем рассылку
+    # Рассылка выполняется в фоне: хендлер не держит обновления админа
+    # (кнопки паузы и отмены), пока она идёт
+    await state.clear()
+    await callback.answer()
+    spawn(
+        deliver_broadcast(broadcast, broadcast_service, progress, distributed),
+        name=f"broadcast-{broadcast.id}"
+    )
+
+
+async def deliver_broadcast(
+    broadcast: Broadcast,
+    broadcast_service: BroadcastService,
+    progress: ProgressReporter,
+    distributed: bool
+) -> None:
+    """Выполнение рассылки и итоговая статистика в сообщении с прогрессом"""
     try:
-        final_stats = await broadcast_service.send_broadcast(
-            message=broadcast_message,
-            custom_keyboard=custom_keyboard,
-            progress_callback=update_progress
-        )
+        if distributed:
+            broadcast_queue = BroadcastQueue(get_redis())
+            await broadcast_queue.enqueue(broadcast)
+            final_stats = await broadcast_queue.watch(broadcast, progress_callback=progress.update)
+        else:
+            final_stats = await broadcast_service.run_broadcast(
+                broadcast,
+                progress_callback=progress.update
+            )
         
         # Финальная статистика
         success_rate = int(final_stats["sent"] / final_stats["total"] * 100) if final_stats["total"] > 0 else 0
+        if final_stats.get("state") == CANCELLED:
+            title = "⛔ <b>Рассылка отменена</b>"
+        else:
+            title = "✅ <b>Рассылка завершена!</b>"
+        
+        # Задержка доставки и повтор для неудачных - по журналу доставки
+        latency = ""
+        retry_keyboard = None
+        try:
+            deliveries = await db.get_delivery_stats(broadcast.id)
+            if deliveries["latency_p50"] is not None:
+                latency = (
+                    f"\n⏱ Задержка отправки: p50 <b>{deliveries['latency_p50']:.0f}</b> мс, "
+                    f"p95 <b>{deliveries['latency_p95']:.0f}</b> мс"
+                )
+            if deliveries["failed"]:
+                retry_count = await db.count_segment_users(BroadcastSegment(retry_of=broadcast.id), cached=False)
+                if retry_count:
+                    retry_keyboard = AdminKeyboards.broadcast_retry(broadcast.id, retry_count)
+        except Exception as e:
+            logger.warning(f"Не удалось получить журнал доставки рассылки #{broadcast.id}: {e}")
         
-        await progress_message.edit_text(
-            f"✅ <b>Рассылка завершена!</b>\n\n"
+        await progress.finish(
+            f"{title}\n\n"
             f"📊 <b>Итоговая статистика:</b>\n"
             f"👥 Всего получателей: <b>{final_stats['total']}</b>\n"
             f"✅ Успешно доставлено: <b>{final_stats['sent']}</b>\n"
             f"❌ Ошибок доставки: <b>{final_stats['failed']}</b>\n"
             f"🚫 Заблокировали бота: <b>{final_stats['blocked']}</b>\n"
-            f"📈 Успешность: <b>{success_rate}%</b>"
+            f"📈 Успешность: <b>{success_rate}%</b>\n"
+            f"⚡ Средняя скорость: <b>{final_stats['rate']:.1f}</b> сообщ./сек"
+            f"{latency}",
+            reply_markup=retry_keyboard
         )
-        
+    
     except Exception as e:
         logger.error(f"Ошибка при рассылке: {e}")
-        await progress_message.edit_text(
+        await progress.finish(
             f"❌ <b>Ошибка при рассылке!</b>\n\n"
             f"Описание: <code>{str(e)}</code>"
         )
+
+
+@router.callback_query(F.data.startswith("broadcast_retry:"))
+async def retry_failed_broadcast(callback: CallbackQuery, state: FSMContext):
+    """Повтор рассылки только для получателей, доставка которым не удалась"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ У вас нет прав администратора")
+        return
+    
+    broadcast_id = int(callback.data.split(":")[1])
+    draft = await BroadcastService.create_retry_draft(broadcast_id, admin_id=callback.from_user.id)
+    if not draft:
+        await callback.answer("❌ Исходная рассылка не найдена", show_alert=True)
+        return
+    
+    users_count = await BroadcastService.count_recipients(draft.id)
+    if users_count == 0:
+        await db.delete_broadcast_drafts(broadcast_id=draft.id)
+        await callback.answer("ℹ️ Повторять некому", show_alert=True)
+        return
+    
+    await discard_broadcast_draft(state)
+    await state.set_state(AdminStates.broadcast_confirm)
+    await state.update_data(broadcast_id=draft.id)
+    
+    await callback.message.answer(
+        f"🔁 <b>Повтор рассылки #{broadcast_id}</b>\n\n"
+        f"👥 Получателей с неудачной доставкой: <b>{users_count}</b>\n\n"
+        f"Отправить рассылку повторно?",
+        reply_markup=AdminKeyboards.broadcast_confirm(users_count)
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data == "broadcast_schedule")
+async def start_schedule_broadcast(callback: CallbackQuery, state: FSMContext):
+    """Переход к вводу времени отложенной рассылки"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ У вас нет прав администратора")
+        return
+    
+    data = await state.get_data()
+    if not data.get("broadcast_id"):
+        await callback.message.edit_text("❌ Ошибка: сообщение для рассылки не найдено")
+        await state.clear()
+        await callback.answer()
+        return
+    
+    await state.set_state(AdminStates.broadcast_schedule)
+    await callback.message.edit_text(
+        f"🕒 <b>Отложенная рассылка</b>\n\n"
+        f"Отправьте дату и время отправки в формате:\n"
+        f"<code>ДД.ММ.ГГГГ ЧЧ:ММ</code>, <code>ДД.ММ ЧЧ:ММ</code> или <code>ЧЧ:ММ</code>\n\n"
+        f"Часовой пояс: <b>{settings.scheduler_timezone}</b>\n\n"
+        f"Для отмены введите /cancel"
+    )
+    await callback.answer()
+
+
+@router.message(StateFilter(AdminStates.broadcast_schedule))
+async def receive_broadcast_schedule(message: Message, state: FSMContext):
+    """Получение времени отложенной рассылки"""
+    if not is_admin(message.from_user.id):
+        await state.clear()
+        return
+    
+    run_at = parse_schedule_time(message.text or "", settings.scheduler_timezone)
+    if run_at is None:
+        await message.answer(
+            "❌ <b>Неверный формат времени!</b>\n\n"
+            "Используйте <code>ДД.ММ.ГГГГ ЧЧ:ММ</code>, <code>ДД.ММ ЧЧ:ММ</code> или <code>ЧЧ:ММ</code>\n\n"
+            "Попробуйте еще раз или введите /cancel для отмены"
+        )
+        return
     
+    if run_at <= datetime.now(timezone.utc):
+        await message.answer("❌ Это время уже прошло. Укажите время в будущем или введите /cancel")
+        return
+    
+    # Черновик становится отложенной рассылкой (его больше не удалит очистка черновиков)
+    data = await state.get_data()
+    broadcast_id = data.get("broadcast_id")
+    if not broadcast_id or not await db.update_broadcast_draft(broadcast_id, admin_id=message.from_user.id, status="scheduled"):
+        await message.answer("❌ Ошибка: черновик рассылки не найден")
+        await state.clear()
+        return
+    
+    job = await db.create_scheduled_job(
+        kind="broadcast",
+        run_at=run_at,
+        payload={"broadcast_id": broadcast_id},
+        timezone=settings.scheduler_timezone,
+        created_by=message.from_user.id
+    )
     await state.clear()
+    
+    local_time = run_at.astimezone(ZoneInfo(settings.scheduler_timezone))
+    users_count = await BroadcastService.count_recipients(broadcast_id)
+    await message.answer(
+        f"🕒 <b>Рассылка запланирована</b>\n\n"
+        f"📅 Отправка: <b>{local_time:%d.%m.%Y %H:%M}</b> ({settings.scheduler_timezone})\n"
+        f"👥 Получателей сейчас: <b>{users_count}</b>\n\n"
+        f"О завершении рассылки придёт уведомление.",
+        reply_markup=AdminKeyboards.scheduled_broadcast(job.id)
+    )
+
+
+@router.callback_query(F.data.startswith("scheduled_cancel:"))
+async def cancel_scheduled_broadcast(callback: CallbackQuery):
+    """Отмена запланированной рассылки до её запуска"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ У вас нет прав администратора")
+        return
+    
+    job = await db.cancel_scheduled_job(int(callback.data.split(":")[1]))
+    if not job:
+        await callback.answer("ℹ️ Рассылка уже запущена или отменена", show_alert=True)
+        return
+    
+    if job.kind == "broadcast":
+        await db.finish_broadcast(job.payload["broadcast_id"], status="cancelled")
+    
+    await callback.message.edit_text("❌ Запланированная рассылка отменена")
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("broadcast_control:"))
+async def control_broadcast(callback: CallbackQuery):
+    """Пауза, продолжение или отмена выполняющейся рассылки"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ У вас нет прав администратора")
+        return
+    
+    _, broadcast_id, state = callback.data.split(":")
+    broadcast_id = int(broadcast_id)
+    if state not in CONTROL_STATES:
+        await callback.answer()
+        return
+    
+    broadcast = await db.get_broadcast(broadcast_id)
+    if not broadcast or broadcast.status not in ("pending", "running", "queued"):
+        await callback.answer("ℹ️ Рассылка уже завершена", show_alert=True)
+        return
+    
+    # Конвейер отправки увидит новое состояние в течение секунды
+    await BroadcastControl(get_redis()).set_state(broadcast_id, state)
+    
+    try:
+        await callback.message.edit_reply_markup(
+            reply_markup=AdminKeyboards.broadcast_control(broadcast_id, state)
+        )
+    except TelegramBadRequest:
+        pass
+    
+    answers = {
+        RUNNING: "▶️ Рассылка продолжена",
+        PAUSED: "⏸ Рассылка приостановлена",
+        CANCELLED: "⛔ Рассылка отменяется",
+    }
+    await callback.answer(answers[state])
+
+
 @router.callback_query(F.data == "broadcast_confirm_no")
 async def cancel_broadcast(callback: CallbackQuery, state: FSMContext):
     """Отмена рассылки"""
+    await discard_broadcast_draft(state)
     await state.clear()
     await callback.message.edit_text("❌ Рассылка отменена")
     await callback.answer()
@@ -283,6 +652,7 @@ async def cancel_broadcast(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "broadcast_cancel")
 async def cancel_broadcast_creation(callback: CallbackQuery, state: FSMContext):
     """Отмена создания рассылки"""
+    await discard_broadcast_draft(state)
     await state.clear()
     await callback.message.edit_text("❌ Создание рассылки отменено")
     await callback.answer()
@@ -296,6 +666,7 @@ async def cancel_any_state(message: Message, state: FSMContext):
     
     current_state = await state.get_state()
     if current_state:
+        await discard_broadcast_draft(state)
         await state.clear()
         await message.answer("❌ Операция отменена")
     else:
@@ -362,7 +733,7 @@ async def show_employees_list(callback: CallbackQuery):
         return
     
     # Получаем всех пользователей
-    all_users = await db.get_all_users()
+    all_users = await db.get_all_user_records()
     
     if not all_users:
         await callback.message.edit_text(
@@ -389,7 +760,7 @@ async def show_employee_card(callback: CallbackQuery):
         return
     
     user_id = int(callback.data.split(":")[1])
-    user = await db.get_user(user_id)
+    user = await db.get_user_record(user_id)
     
     if not user:
         await callback.answer("❌ Сотрудник не найден", show_alert=True)
@@ -405,7 +776,7 @@ async def show_employee_card(callback: CallbackQuery):
     # Получаем информацию о том, кто пригласил
     invited_by_text = "Не указано"
     if user.invited_by:
-        inviter = await db.get_user(user.invited_by)
+        inviter = await db.get_user_record(user.invited_by)
         if inviter:
             invited_by_text = inviter.full_name or inviter.first_name or f"ID: {inviter.id}"
     
@@ -659,7 +1030,7 @@ async def reinvite_employee(callback: CallbackQuery, bot: Bot):
         return
     
     user_id = int(callback.data.split(":")[1])
-    user = await db.get_user(user_id)
+    user = await db.get_user_record(user_id)
     
     if not user:
         await callback.answer("❌ Сотрудник не найден", show_alert=True)
@@ -699,7 +1070,7 @@ async def confirm_delete_employee(callback: CallbackQuery):
         return
     
     user_id = int(callback.data.split(":")[1])
-    user = await db.get_user(user_id)
+    user = await db.get_user_record(user_id)
     
     if not user:
         await callback.answer("❌ Сотрудник не найден", show_alert=True)
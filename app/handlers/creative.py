@@ -26,6 +26,7 @@ from app.keyboards.creative import (
     KKTU_CODES
 )
 from app.services.mediascout import mediascout_api
+from app.services.activity import activity_log, CREATIVE_CREATED, CREATIVE_FAILED
 from app.database import db
 
 router = Router()
@@ -571,6 +572,11 @@ async def confirm_creation(callback: CallbackQuery, state: FSMContext):
     if result.get('success'):
         # Успешное создание
         erid = result.get('erid')
+        activity_log.emit(
+            callback.from_user.id,
+            CREATIVE_CREATED,
+            {"form": data['form'], "kktu_code": data['kktu_code'], "erid": erid}
+        )
         
         # Сохраняем в базу данных
         try:
@@ -608,6 +614,11 @@ async def confirm_creation(callback: CallbackQuery, state: FSMContext):
     else:
         # Ошибка создания
         error_msg = result.get('error', 'Неизвестная ошибка')
+        activity_log.emit(
+            callback.from_user.id,
+            CREATIVE_FAILED,
+            {"form": data['form'], "kktu_code": data['kktu_code'], "status": result.get('status')}
+        )
         
         error_text = "❌ <b>Ошибка при создании креатива</b>\n\n"
         error_text += f"📝 <b>Детали:</b> {error_msg}\n\n"
@@ -632,7 +643,7 @@ async def show_my_creatives(callback: CallbackQuery):
     user_id = callback.from_user.id
     
     # Получаем креативы пользователя
-    creatives = await db.get_user_creatives(user_id, limit=10)
+    creatives = await db.get_user_creative_records(user_id, limit=10)
     total_count = await db.get_user_creatives_count(user_id)
     
     if not creatives:
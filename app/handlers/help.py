@@ -6,9 +6,18 @@ from aiogram.filters import Command
 from loguru import logger
 
 from app.config import settings
+from app.services.health import health
 
 router = Router(name="help")
 
+# Подписи зависимостей в /status
+PROBE_LABELS = {
+    "postgres": "🗄️ База данных",
+    "redis": "🚀 Redis",
+    "telegram": "📡 API Telegram",
+    "mediascout": "📝 Медиаскаут",
+}
+
 
 @router.message(Command("help"))
 async def help_command(message: types.Message) -> None:
@@ -40,13 +49,20 @@ async def status_command(message: types.Message) -> None:
     
     logger.info(f"📊 User {user.id} requested status")
     
+    # Те же пробы, что и у /health/ready
+    results = await health.check()
+    checks = "\n".join(
+        f"{PROBE_LABELS.get(name, name)}: "
+        + (f"✅ {result.latency_ms:.0f} мс" if result.ok else f"❌ {result.error}")
+        for name, result in results.items()
+    )
+    summary = "✅ Бот активен и работает" if health.is_ready(results) else "⚠️ Часть зависимостей недоступна"
+    
     status_text = (
         f"📊 <b>Статус бота</b>\n\n"
-        f"✅ Бот активен и работает\n"
+        f"{summary}\n"
         f"🏠 Среда: <code>{settings.env}</code>\n"
-        f"🗄️ База данных: Подключена\n"
-        f"🚀 Redis: Подключен\n"
-        f"📡 API Telegram: Доступен\n\n"
+        f"{checks}\n\n"
         f"⏰ Время проверки: {message.date.strftime('%H:%M:%S %d.%m.%Y')}"
     )
     
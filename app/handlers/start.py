@@ -1,7 +1,6 @@
 """
 Обработчик команды /start
 """
-from datetime import datetime
 from aiogram import Router, Bot
 from aiogram.types import Message
 from aiogram.filters import CommandStart, CommandObject
@@ -20,62 +19,56 @@ async def start_with_invite_link(message: Message, command: CommandObject, bot:
     user = message.from_user
     invite_code = command.args
     
-    # Проверяем пригласительную ссылку
-    invite_link = await db.get_invite_link_by_code(invite_code)
-    
-    if not invite_link:
-        await message.answer(
-            "❌ <b>Неверная пригласительная ссылка</b>\n\n"
-            "Эта ссылка не существует или была удалена."
-        )
-        return
-    
-    if invite_link.is_used:
-        await message.answer(
-            "❌ <b>Ссылка уже использована</b>\n\n"
-            "Эта пригласительная ссылка уже была использована и больше не действительна.\n"
-            "Обратитесь к администратору для получения новой ссылки."
-        )
-        return
-    
-    # Проверяем срок действия
-    if invite_link.expires_at and invite_link.expires_at < datetime.utcnow():
-        await message.answer(
-            "❌ <b>Ссылка просрочена</b>\n\n"
-            "Срок действия этой пригласительной ссылки истек.\n"
-            "Обратитесь к администратору для получения новой ссылки."
-        )
-        return
-    
-    # Используем ссылку и регистрируем пользователя
-    await db.use_invite_link(invite_code, user.id)
-    
-    # Добавляем пользователя с указанной ролью
-    await db.add_user_with_invite(
+    # Погашаем ссылку и регистрируем пользователя одним атомарным запросом
+    registered_user = await db.redeem_invite(
+        code=invite_code,
         user_id=user.id,
         username=user.username,
         first_name=user.first_name,
-        last_name=user.last_name,
-        full_name=invite_link.full_name,
-        role=invite_link.target_role,
-        invited_by=invite_link.created_by
+        last_name=user.last_name
     )
     
+    if not registered_user:
+        # Ссылка не подошла - выясняем причину для понятного сообщения
+        invite_link = await db.get_invite_link_by_code(invite_code)
+        
+        if not invite_link:
+            await message.answer(
+                "❌ <b>Неверная пригласительная ссылка</b>\n\n"
+                "Эта ссылка не существует или была удалена."
+            )
+        elif invite_link.is_used:
+            await message.answer(
+                "❌ <b>Ссылка уже использована</b>\n\n"
+                "Эта пригласительная ссылка уже была использована и больше не действительна.\n"
+                "Обратитесь к администратору для получения новой ссылки."
+            )
+        else:
+            await message.answer(
+                "❌ <b>Ссылка просрочена</b>\n\n"
+                "Срок действия этой пригласительной ссылки истек.\n"
+                "Обратитесь к администратору для получения новой ссылки."
+            )
+        return
+    
+    # Счётчики статистики пересчитаются фоном при сбросе буфера записи
+    await db.defer_bot_stats_refresh()
+    
     # Обновляем команды бота для нового пользователя
     try:
-        is_admin = invite_link.target_role == "admin"
+        is_admin = registered_user.role == "admin"
         await update_admin_commands(bot, user.id, is_admin)
     except Exception as e:
         # Не критично, если не удалось обновить команды
         pass
     
     # Приветственное сообщение
-    role_text = "администратора" if invite_link.target_role == "admin" else "сотрудника"
+    role_text = "администратора" if registered_user.role == "admin" else "сотрудника"
     
     welcome_text = f"""
 ✅ <b>Успешная регистрация!</b>
 
-👋 Привет, {invite_link.full_name or user.first_name or 'пользователь'}!
+👋 Привет, {registered_user.full_name or user.first_name or 'пользователь'}!
 
 Вы зарегистрированы в боте как <b>{role_text}</b>.
 
@@ -104,7 +97,7 @@ async def start_command(message: Message, bot: Bot):
     user = message.from_user
     
     # Проверяем, есть ли пользователь в базе
-    existing_user = await db.get_user(user.id)
+    existing_user = await db.get_user_record(user.id)
     
     # Если пользователь не зарегистрирован и не является админом из конфига
     if not existing_user and not settings.is_admin(user.id):
@@ -117,14 +110,13 @@ async def start_command(message: Message, bot: Bot):
     
     # Если пользователь админ из конфига, но не в базе - добавляем его
     if not existing_user and settings.is_admin(user.id):
-        await db.add_user_with_invite(
+        existing_user = await db.add_user_with_invite(
             user_id=user.id,
             username=user.username,
             first_name=user.first_name,
             last_name=user.last_name,
             role="admin"
         )
-        existing_user = await db.get_user(user.id)
         
         # Обновляем команды для админа
         try:
@@ -142,6 +134,11 @@ async def start_command(message: Message, bot: Bot):
         )
         return
     
+    # Пользователь был исключён из рассылок (заблокировал бота) и вернулся через /start
+    # (UserMiddleware пропускает /start без проверок, поэтому возвращаем здесь)
+    if existing_user and not existing_user.is_active:
+        await db.mark_user_deliverable(user.id)
+    
     # Приветственное сообщение
     welcome_text = f"""
 👋 Привет, {user.first_name or 'пользователь'}!
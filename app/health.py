@@ -0,0 +1,73 @@
+"""
+HTTP-сервер проверок состояния (HEALTH_PORT)
+
+GET /health/live  - процесс жив и цикл событий отвечает (всегда 200)
+GET /health/ready - зависимости доступны и процесс не останавливается
+                    (200 или 503, в теле - результаты проб с задержкой)
+"""
+from typing import Iterable, Optional
+from loguru import logger
+
+from aiohttp import web
+from aiogram import Bot
+
+from app.config import settings
+from app.lifecycle import lifecycle
+from app.services.health import health, ALL_PROBES
+
+
+async def live(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def ready(request: web.Request) -> web.Response:
+    results = await health.check()
+    is_ready = health.is_ready(results) and not lifecycle.draining
+    return web.json_response(
+        {
+            "status": "ready" if is_ready else "not_ready",
+            "draining": lifecycle.draining,
+            "checks": {name: result.as_dict() for name, result in results.items()},
+        },
+        status=200 if is_ready else 503
+    )
+
+
+class HealthServer:
+    """Фоновый aiohttp-сервер проб (не мешает polling и webhook)"""
+    
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+    
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/health/live", live)
+        app.router.add_get("/health/ready", ready)
+        
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=self.host, port=self.port).start()
+        logger.info(f"🩺 Health server listening on {self.host}:{self.port}")
+    
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def start_health_server(bot: Bot, probes: Iterable[str] = ALL_PROBES) -> Optional[HealthServer]:
+    """Настройка проб процесса и запуск сервера (если HEALTH_PORT не 0)"""
+    health.setup(bot, probes)
+    if not settings.health_port:
+        return None
+    
+    server = HealthServer(settings.health_host, settings.health_port)
+    try:
+        await server.start()
+    except OSError as e:
+        # Порт занят (например, второй процесс в том же контейнере) - бот работает без проб
+        logger.error(f"❌ Failed to start health server: {e}")
+        return None
+    return server
@@ -0,0 +1,97 @@
+"""
+Приём обновлений для распределённой обработки (UPDATES_MODE=distributed)
+
+Процесс бота не выполняет хендлеры: обновления из webhook или long polling
+сразу записываются в Redis Streams, обрабатывают их воркеры
+(python -m app.update_worker). Обновление подтверждается Telegram только
+после записи в Redis, поэтому при недоступности Redis оно не теряется.
+"""
+import asyncio
+import hmac
+import signal
+from loguru import logger
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+
+from app.config import settings
+from app.services.update_stream import UpdatePublisher
+from app.utils import get_redis
+from app.webhook import serve, set_webhook
+
+
+# Таймаут long polling (секунды)
+POLLING_TIMEOUT = 30
+
+# Пробы готовности: приёму обновлений нужны только Redis и Telegram
+INGRESS_PROBES = ("redis", "telegram")
+
+
+async def poll_updates(bot: Bot, publisher: UpdatePublisher, allowed_updates: list[str]) -> None:
+    """Long polling: offset сдвигается только после записи обновлений в поток"""
+    await bot.delete_webhook()
+    logger.info("📡 Update ingress started (polling)")
+    
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=POLLING_TIMEOUT,
+                allowed_updates=allowed_updates,
+                request_timeout=POLLING_TIMEOUT + 10
+            )
+            for update in updates:
+                await publisher.publish(update.model_dump(mode="json", by_alias=True, exclude_unset=True))
+                offset = update.update_id + 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Неподтверждённые обновления Telegram отдаст повторно
+            logger.error(f"❌ Update ingress failed: {e}")
+            await asyncio.sleep(1)
+
+
+async def serve_webhook(bot: Bot, dp: Dispatcher, publisher: UpdatePublisher) -> None:
+    """Webhook: каждое обновление записывается в поток, хендлеры не вызываются"""
+    secret = settings.webhook_secret
+    
+    async def handle(request: web.Request) -> web.Response:
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if secret and not hmac.compare_digest(token, secret):
+            return web.Response(status=401, text="Unauthorized")
+        
+        # Ошибка записи вернёт 500, и Telegram повторит доставку
+        await publisher.publish(await request.json())
+        return web.Response()
+    
+    async def on_startup(_: web.Application) -> None:
+        await set_webhook(bot, dp)
+    
+    app = web.Application()
+    app.router.add_post(settings.webhook_path, handle)
+    app.on_startup.append(on_startup)
+    
+    logger.info("📡 Update ingress started (webhook)")
+    await serve(app, settings.webapp_host, settings.webapp_port)
+
+
+async def run_ingress(bot: Bot, dp: Dispatcher) -> None:
+    """Приём обновлений в Redis Streams до SIGINT/SIGTERM (источник - BOT_MODE)"""
+    publisher = UpdatePublisher(get_redis())
+    
+    if settings.bot_mode == "webhook":
+        await serve_webhook(bot, dp, publisher)
+        return
+    
+    polling = asyncio.create_task(poll_updates(bot, publisher, dp.resolve_used_update_types()), name="update-ingress")
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, polling.cancel)
+    try:
+        await polling
+    except asyncio.CancelledError:
+        pass
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
@@ -1,6 +1,7 @@
 """
 Клавиатуры для админской части
 """
+from typing import List, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
@@ -36,6 +37,11 @@ class AdminKeyboards:
             callback_data="broadcast_confirm_yes"
         ))
         
+        builder.add(InlineKeyboardButton(
+            text="🕒 Запланировать",
+            callback_data="broadcast_schedule"
+        ))
+        
         builder.add(InlineKeyboardButton(
             text="❌ Отменить",
             callback_data="broadcast_confirm_no"
@@ -44,6 +50,76 @@ class AdminKeyboards:
         builder.adjust(1)
         return builder.as_markup()
     
+    @staticmethod
+    def broadcast_retry(broadcast_id: int, failed_count: int) -> InlineKeyboardMarkup:
+        """Повторная отправка получателям, доставка которым не удалась"""
+        builder = InlineKeyboardBuilder()
+        
+        builder.add(InlineKeyboardButton(
+            text=f"🔁 Повторить для неудачных ({failed_count})",
+            callback_data=f"broadcast_retry:{broadcast_id}"
+        ))
+        
+        return builder.as_markup()
+    
+    @staticmethod
+    def scheduled_broadcast(job_id: int) -> InlineKeyboardMarkup:
+        """Отмена запланированной рассылки"""
+        builder = InlineKeyboardBuilder()
+        
+        builder.add(InlineKeyboardButton(
+            text="❌ Отменить отправку",
+            callback_data=f"scheduled_cancel:{job_id}"
+        ))
+        
+        return builder.as_markup()
+    
+    @staticmethod
+    def broadcast_control(broadcast_id: int, state: str = "running") -> InlineKeyboardMarkup:
+        """Управление выполняющейся рассылкой (под сообщением с прогрессом)"""
+        builder = InlineKeyboardBuilder()
+        
+        if state == "cancelled":
+            return builder.as_markup()
+        
+        if state == "paused":
+            builder.add(InlineKeyboardButton(
+                text="▶️ Продолжить",
+                callback_data=f"broadcast_control:{broadcast_id}:running"
+            ))
+        else:
+            builder.add(InlineKeyboardButton(
+                text="⏸ Пауза",
+                callback_data=f"broadcast_control:{broadcast_id}:paused"
+            ))
+        
+        builder.add(InlineKeyboardButton(
+            text="⛔ Отменить",
+            callback_data=f"broadcast_control:{broadcast_id}:cancelled"
+        ))
+        
+        builder.adjust(2)
+        return builder.as_markup()
+    
+    @staticmethod
+    def broadcast_segments(segments: List[Tuple[str, str]]) -> InlineKeyboardMarkup:
+        """Выбор сегмента получателей рассылки"""
+        builder = InlineKeyboardBuilder()
+        
+        for key, title in segments:
+            builder.add(InlineKeyboardButton(
+                text=title,
+                callback_data=f"broadcast_segment:{key}"
+            ))
+        
+        builder.add(InlineKeyboardButton(
+            text="❌ Отменить",
+            callback_data="broadcast_cancel"
+        ))
+        
+        builder.adjust(1)
+        return builder.as_markup()
+    
     @staticmethod
     def broadcast_add_button() -> InlineKeyboardMarkup:
         """Меню добавления кнопки к рассылке"""
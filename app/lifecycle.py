@@ -0,0 +1,109 @@
+"""
+Корректная остановка процесса бота
+
+К моменту вызова shutdown() приём новых обновлений уже остановлен
+(polling завершён, HTTP-сервер webhook закрыт, воркер отпустил партиции).
+Дальше по порядку: дожидаемся начатых хендлеров, останавливаем фоновые
+задачи (рассылки при отмене сохраняют чекпоинт и вернутся в очередь),
+дописываем буферы в базу и только потом закрываем пулы соединений.
+Всё укладывается в SHUTDOWN_TIMEOUT, чтобы оркестратор не убил процесс
+посреди записи.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from aiogram import Bot
+from aiogram.types import TelegramObject
+from loguru import logger
+
+from app.config import settings
+from app.database import db
+from app.services.activity import activity_log
+from app.services.mediascout import mediascout_api
+from app.utils import background_tasks, close_redis
+
+
+class LifecycleManager:
+    """Учёт выполняющихся хендлеров и порядок освобождения ресурсов при остановке"""
+    
+    def __init__(self, timeout: float = 20.0):
+        self.timeout = timeout
+        self.draining = False
+        self._handlers: set[asyncio.Task] = set()
+        self._closers: List[Tuple[str, Callable[[], Awaitable[Any]]]] = []
+    
+    def register(self, name: str, close: Callable[[], Awaitable[Any]]) -> None:
+        """Дополнительный ресурс процесса (сервер, клиент), закрываемый перед пулами соединений"""
+        self._closers.append((name, close))
+    
+    async def track(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Outer middleware dp.update: запоминает задачи, в которых выполняются хендлеры"""
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self._handlers.discard(task)
+    
+    async def shutdown(self, bot: Bot) -> None:
+        """Остановка процесса: хендлеры -> фоновые задачи -> буферы -> соединения"""
+        self.draining = True
+        deadline = time.monotonic() + self.timeout
+        started = time.monotonic()
+        
+        # 1. Начатые хендлеры (создание креатива, запрос в Медиаскаут) доводим до конца
+        current = asyncio.current_task()
+        handlers = [task for task in self._handlers if task is not current]
+        if handlers:
+            logger.info(f"⏳ Waiting for {len(handlers)} handlers to finish...")
+            await self._finish(handlers, deadline, cancel_first=False)
+        
+        # 2. Фоновые задачи бесконечны - отменяем сразу, рассылки при этом пишут чекпоинт
+        tasks = list(background_tasks)
+        if tasks:
+            logger.info(f"⏳ Stopping {len(tasks)} background tasks...")
+            await self._finish(tasks, deadline, cancel_first=True)
+        
+        # 3. Отложенные записи, пока соединения с базой ещё открыты
+        await self._step("activity log", activity_log.close())
+        await self._step("write buffer", db.write_buffer.close())
+        
+        # 4. Ресурсы процесса и пулы соединений
+        for name, close in reversed(self._closers):
+            await self._step(name, close())
+        await self._step("mediascout session", mediascout_api.close())
+        await self._step("redis", close_redis())
+        await self._step("database engine", db.engine.dispose())
+        await self._step("bot session", bot.session.close())
+        
+        logger.info(f"✅ Shutdown completed in {time.monotonic() - started:.1f}s")
+    
+    async def _finish(self, tasks: list[asyncio.Task], deadline: float, cancel_first: bool) -> None:
+        """Дождаться задач до deadline (или сразу отменить), оставшиеся отменить"""
+        if cancel_first:
+            for task in tasks:
+                task.cancel()
+        
+        _, pending = await asyncio.wait(tasks, timeout=max(deadline - time.monotonic(), 0.1))
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} tasks did not finish before shutdown deadline, cancelling")
+            for task in pending:
+                task.cancel()
+            # Короткий срок на обработку отмены (чекпоинт рассылки, статус задания)
+            await asyncio.wait(pending, timeout=1.0)
+    
+    async def _step(self, name: str, action: Awaitable[Any]) -> None:
+        """Шаг остановки: ошибка одного шага не мешает освободить остальные ресурсы"""
+        try:
+            await action
+        except Exception as e:
+            logger.error(f"❌ Failed to close {name}: {e}")
+
+
+# Глобальный экземпляр процесса
+lifecycle = LifecycleManager(timeout=settings.shutdown_timeout)
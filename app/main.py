@@ -3,6 +3,7 @@
 """
 import asyncio
 import sys
+from typing import Iterable
 from loguru import logger
 
 from aiogram import Bot, Dispatcher
@@ -15,6 +16,16 @@ from app.handlers import setup_routers
 from app.middlewares import setup_middlewares
 from app.database import db
 from app.utils.bot_commands import setup_bot_commands
+from app.utils import get_redis, spawn
+from app.services.activity import activity_log
+from app.services import BroadcastService
+from app.services.scheduler import create_scheduler
+from app.webhook import run_webhook
+from app.ingress import run_ingress, INGRESS_PROBES
+from app.lifecycle import lifecycle
+from app.health import start_health_server
+from app.services.health import ALL_PROBES
+from app.startup import StartupSequence
 
 
 async def setup_bot() -> tuple[Bot, Dispatcher]:
@@ -28,7 +39,7 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     
     # Создаем хранилище состояний
     try:
-        storage = RedisStorage.from_url(settings.redis_url)
+        storage = RedisStorage(redis=get_redis())
         logger.info("✅ Redis storage connected successfully")
     except Exception as e:
         logger.error(f"❌ Failed to connect to Redis: {e}")
@@ -37,6 +48,9 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     # Создаем диспетчер
     dp = Dispatcher(storage=storage)
     
+    # Учёт выполняющихся хендлеров для корректной остановки
+    dp.update.outer_middleware(lifecycle.track)
+    
     # Настраиваем middleware
     setup_middlewares(dp)
     
@@ -46,34 +60,94 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     return bot, dp
 
 
-async def on_startup(bot: Bot) -> None:
-    """Действия при запуске бота"""
-    # Инициализируем базу данных
+def start_buffers() -> None:
+    """Фоновая запись в базу: буфер write-behind и журнал действий"""
+    db.write_buffer.start()
+    # При включённом планировщике старые события удаляет его задание cleanup
+    activity_log.start(retention=not settings.scheduler_enabled)
+
+
+async def start_health(bot: Bot, probes: Iterable[str] = ALL_PROBES) -> None:
+    """Пробы /health/live и /health/ready (и данные для /status)"""
+    health_server = await start_health_server(bot, probes)
+    if health_server:
+        lifecycle.register("health server", health_server.stop)
+
+
+async def run_startup(bot: Bot, startup: StartupSequence) -> None:
+    """Выполнение шагов запуска; ошибка критичного шага завершает процесс"""
     try:
-        await db.create_tables()
-        await db.update_bot_stats()
-        logger.info("✅ Database initialized successfully")
+        await startup.run()
     except Exception as e:
-        logger.error(f"❌ Failed to initialize database: {e}")
+        logger.error(f"❌ Failed to start bot: {e}")
         sys.exit(1)
     
-    # Настраиваем команды бота
-    try:
-        await setup_bot_commands(bot)
-        logger.info("✅ Bot commands configured successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to setup bot commands: {e}")
-        # Продолжаем работу даже если команды не удалось установить
-    
-    bot_info = await bot.get_me()
+    bot_info = await bot.me()
     logger.info(f"🚀 Bot @{bot_info.username} started successfully!")
     logger.info(f"🏠 Environment: {settings.env}")
 
 
+async def on_startup(bot: Bot, probes: Iterable[str] = ALL_PROBES) -> None:
+    """
+    Действия при запуске бота
+    
+    В распределённом режиме выполняются процессом приёма обновлений:
+    миграции, команды бота, продолжение рассылок и планировщик нужны
+    один раз, а не в каждом воркере.
+    """
+    
+    async def init_database() -> None:
+        await db.create_tables()
+        start_buffers()
+    
+    async def start_scheduler() -> None:
+        # Отложенные рассылки и периодические задачи (выполняет один процесс-лидер)
+        scheduler = await create_scheduler(bot, get_redis())
+        spawn(scheduler.run(), name="job-scheduler")
+    
+    startup = StartupSequence()
+    startup.add("database", init_database)
+    startup.add("health", lambda: start_health(bot, probes), critical=False)
+    startup.add("telegram", bot.me)
+    
+    # Не нужны для обработки обновлений - выполняются в фоне
+    startup.add("commands", lambda: setup_bot_commands(bot), critical=False, background=True)
+    startup.add("stats", db.update_bot_stats, after=("database",), critical=False, background=True)
+    # Продолжаем рассылки, прерванные перезапуском
+    startup.add(
+        "broadcast resume",
+        BroadcastService(bot).resume_unfinished,
+        after=("database",),
+        critical=False,
+        background=True
+    )
+    if settings.scheduler_enabled:
+        startup.add("scheduler", start_scheduler, after=("database",), critical=False, background=True)
+    
+    await run_startup(bot, startup)
+
+
+async def on_worker_startup(bot: Bot) -> None:
+    """Запуск воркера обновлений: пул соединений с базой, буферы записи и пробы"""
+    
+    async def init_database() -> None:
+        # Схему базы к этому моменту создаёт (или создаст) процесс приёма обновлений
+        await db.ping()
+        start_buffers()
+    
+    startup = StartupSequence()
+    startup.add("database", init_database)
+    startup.add("health", lambda: start_health(bot), critical=False)
+    startup.add("telegram", bot.me)
+    await run_startup(bot, startup)
+
+
 async def on_shutdown(bot: Bot) -> None:
     """Действия при остановке бота"""
     logger.info("🛑 Bot is shutting down...")
-    await bot.session.close()
+    
+    # Дожидаемся хендлеров, останавливаем рассылки с чекпоинтом, дописываем буферы и закрываем пулы
+    await lifecycle.shutdown(bot)
 
 
 async def main() -> None:
@@ -101,11 +175,22 @@ async def main() -> None:
     dp.shutdown.register(on_shutdown)
     
     try:
-        # Запускаем polling
-        await dp.start_polling(
-            bot,
-            allowed_updates=dp.resolve_used_update_types()
-        )
+        if settings.updates_mode == "distributed":
+            # Процесс только принимает обновления, хендлеры выполняют воркеры python -m app.update_worker
+            await on_startup(bot, probes=INGRESS_PROBES)
+            try:
+                await run_ingress(bot, dp)
+            finally:
+                await on_shutdown(bot)
+        elif settings.bot_mode == "webhook":
+            # Обновления приходят на aiohttp-сервер (можно запустить несколько реплик)
+            await run_webhook(bot, dp)
+        else:
+            # Запускаем polling
+            await dp.start_polling(
+                bot,
+                allowed_updates=dp.resolve_used_update_types()
+            )
     except KeyboardInterrupt:
         logger.info("👋 Bot stopped by user")
     except Exception as e:
@@ -2,13 +2,27 @@
 Middlewares package
 """
 from aiogram import Dispatcher
+from aiogram.fsm.middleware import FSMContextMiddleware
+
+from app.config import settings
+from app.utils import get_redis
 
 from .logging import LoggingMiddleware
 from .user import UserMiddleware
+from .activity import ActivityMiddleware
+from .album import AlbumMiddleware
+from .ordering import UserLaneMiddleware, CallbackDedupeMiddleware
 
 
 def setup_middlewares(dp: Dispatcher) -> None:
     """Настройка всех middleware"""
+    # Повторные нажатия и полосы пользователей - до FSM, чтобы состояние читалось после предыдущего шага
+    fsm = next(m for m in dp.update.outer_middleware if isinstance(m, FSMContextMiddleware))
+    dp.update.outer_middleware.unregister(fsm)
+    dp.update.outer_middleware(CallbackDedupeMiddleware(get_redis(), window=settings.callback_dedupe_window))
+    dp.update.outer_middleware(UserLaneMiddleware(max_concurrency=settings.handler_concurrency))
+    dp.update.outer_middleware(fsm)
+    
     # Middleware для логирования
     dp.message.middleware(LoggingMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
@@ -16,3 +30,7 @@ def setup_middlewares(dp: Dispatcher) -> None:
     # Middleware для пользователей
     dp.message.middleware(UserMiddleware())
     dp.callback_query.middleware(UserMiddleware())
+    
+    # Middleware журнала действий (после проверки доступа)
+    dp.message.middleware(ActivityMiddleware())
+    dp.callback_query.middleware(ActivityMiddleware())
@@ -0,0 +1,60 @@
+"""
+Middleware для журнала действий пользователей
+"""
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message, CallbackQuery
+from aiogram.fsm.context import FSMContext
+
+from app.config import settings
+from app.states import CreativeStates
+from app.services.activity import activity_log, CREATIVE_STEP, MEDIA_UPLOADED, ADMIN_ACTION
+
+
+# Префиксы callback-данных админских действий
+ADMIN_CALLBACK_PREFIXES = ("admin_", "employee", "broadcast_")
+
+# Префиксы callback-данных мастера создания креатива
+CREATIVE_CALLBACK_PREFIXES = ("create_creative", "form:", "kktu:", "nav:", "confirm:")
+
+MEDIA_CONTENT_TYPES = {"photo", "video", "audio", "document"}
+
+CREATIVE_STATE_PREFIX = f"{CreativeStates.__full_group_name__}:"
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """Middleware, пишущий события воронки и админские действия в журнал (в памяти)"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not activity_log.enabled:
+            return await handler(event, data)
+        
+        user = data.get("event_from_user")
+        raw_state = data.get("raw_state")
+        in_creative_flow = bool(raw_state and raw_state.startswith(CREATIVE_STATE_PREFIX))
+        
+        if user:
+            if isinstance(event, Message):
+                if raw_state == CreativeStates.upload_media.state and event.content_type in MEDIA_CONTENT_TYPES:
+                    activity_log.emit(user.id, MEDIA_UPLOADED, {"content_type": event.content_type})
+            elif isinstance(event, CallbackQuery) and event.data:
+                if event.data.startswith(ADMIN_CALLBACK_PREFIXES) and settings.is_admin(user.id):
+                    activity_log.emit(user.id, ADMIN_ACTION, {"callback": event.data})
+                if event.data.startswith(CREATIVE_CALLBACK_PREFIXES):
+                    in_creative_flow = True
+        
+        result = await handler(event, data)
+        
+        # Переход между шагами мастера креатива (состояние читаем только внутри воронки)
+        state: FSMContext = data.get("state")
+        if user and state and in_creative_flow:
+            new_state = await state.get_state()
+            if new_state != raw_state and new_state and new_state.startswith(CREATIVE_STATE_PREFIX):
+                activity_log.emit(user.id, CREATIVE_STEP, {"state": new_state, "from": raw_state})
+        
+        return result
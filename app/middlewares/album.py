@@ -0,0 +1,47 @@
+"""
+Middleware для сбора альбомов (media group)
+"""
+import asyncio
+from typing import Callable, Dict, Any, Awaitable, List, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message
+
+
+class AlbumMiddleware(BaseMiddleware):
+    """
+    Middleware, собирающий сообщения одного альбома в один вызов хендлера
+    
+    Telegram присылает альбом отдельными сообщениями с общим media_group_id.
+    Первое сообщение ждёт latency секунд, пока придут остальные, после чего
+    хендлер вызывается один раз со списком сообщений в data["album"].
+    """
+    
+    def __init__(self, latency: float = 0.6):
+        self.latency = latency
+        self._albums: Dict[Tuple[int, str], List[Message]] = {}
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Message) or not event.media_group_id:
+            return await handler(event, data)
+        
+        key = (event.chat.id, event.media_group_id)
+        album = self._albums.get(key)
+        if album is not None:
+            # Альбом уже собирается первым сообщением
+            album.append(event)
+            return None
+        
+        self._albums[key] = [event]
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            album = self._albums.pop(key)
+        
+        album.sort(key=lambda message: message.message_id)
+        data["album"] = album
+        return await handler(album[0], data)
@@ -0,0 +1,100 @@
+"""
+Middleware порядка обработки обновлений
+"""
+import asyncio
+import hashlib
+from typing import Callable, Dict, Any, Awaitable, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+from loguru import logger
+from redis.asyncio import Redis
+
+
+class UserLaneMiddleware(BaseMiddleware):
+    """
+    Последовательная обработка обновлений одного пользователя
+    
+    aiogram запускает хендлеры параллельно, поэтому два быстрых нажатия одной
+    кнопки могли выполниться одновременно. Обновления пользователя проходят
+    через его «полосу» (asyncio.Lock) по одному, разные пользователи
+    обрабатываются параллельно, но не более max_concurrency хендлеров сразу.
+    Регистрируется на dp.update до FSM, чтобы следующий шаг читал уже
+    сохранённое предыдущим шагом состояние.
+    """
+    
+    def __init__(self, max_concurrency: int = 100):
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._lanes: Dict[int, asyncio.Lock] = {}
+        self._waiting: Dict[int, int] = {}
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        
+        # Сообщения альбома собирает AlbumMiddleware, пока первое ждёт остальные - им полоса не нужна
+        if user is None or (isinstance(event, Update) and event.message and event.message.media_group_id):
+            async with self._slots:
+                return await handler(event, data)
+        
+        lane = self._lanes.setdefault(user.id, asyncio.Lock())
+        self._waiting[user.id] = self._waiting.get(user.id, 0) + 1
+        try:
+            async with lane:
+                async with self._slots:
+                    return await handler(event, data)
+        finally:
+            # Полоса удаляется, когда у пользователя не осталось обновлений
+            self._waiting[user.id] -= 1
+            if not self._waiting[user.id]:
+                del self._waiting[user.id]
+                del self._lanes[user.id]
+
+
+class CallbackDedupeMiddleware(BaseMiddleware):
+    """
+    Отбрасывание повторных нажатий одной кнопки
+    
+    Одинаковый callback (пользователь, сообщение, данные кнопки) в течение
+    window секунд обрабатывается один раз: метка ставится в Redis (SET NX PX),
+    поэтому повтор отсекается и на другой реплике бота. Если Redis недоступен,
+    callback обрабатывается как обычно.
+    """
+    
+    def __init__(self, redis: Redis, window: float = 1.0):
+        self.redis = redis
+        self.window_ms = int(window * 1000)
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = event.callback_query if isinstance(event, Update) else None
+        if callback is None or self.window_ms <= 0:
+            return await handler(event, data)
+        
+        message_id = callback.message.message_id if callback.message else callback.inline_message_id
+        digest = hashlib.sha1(f"{message_id}:{callback.data}".encode()).hexdigest()[:16]
+        key = f"dedupe:callback:{callback.from_user.id}:{digest}"
+        
+        try:
+            first = await self.redis.set(key, 1, nx=True, px=self.window_ms)
+        except Exception as e:
+            logger.warning(f"Callback dedupe unavailable: {e}")
+            first = True
+        
+        if not first:
+            logger.debug(f"Duplicate callback from {callback.from_user.id} dropped: {callback.data}")
+            # Убираем «часики» на кнопке, действие уже выполняется
+            try:
+                await callback.answer()
+            except Exception:
+                pass
+            return None
+        
+        return await handler(event, data)
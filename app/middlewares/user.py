@@ -29,7 +29,7 @@ class UserMiddleware(BaseMiddleware):
             
             try:
                 # Получаем пользователя из базы данных
-                db_user = await db.get_user(user.id)
+                db_user = await db.get_user_record(user.id)
                 
                 # Проверяем доступ
                 # 1. Если пользователь не в базе и не админ из конфига - блокируем
@@ -62,6 +62,10 @@ class UserMiddleware(BaseMiddleware):
                         role="admin"
                     )
                 
+                # 4. Пользователь был исключён из рассылок (заблокировал бота), но снова пишет - возвращаем
+                if db_user and not db_user.is_active:
+                    await db.mark_user_deliverable(user.id)
+                
                 # Добавляем информацию о пользователе в data для использования в хендлерах
                 if db_user:
                     data["db_user"] = db_user
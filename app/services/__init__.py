@@ -2,5 +2,6 @@
 Services package
 """
 from .broadcast import BroadcastService
+from .progress import ProgressReporter, format_duration
 
-__all__ = ["BroadcastService"] 
\ No newline at end of file
+__all__ = ["BroadcastService", "ProgressReporter", "format_duration"] 
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Журнал действий пользователей (таблица user_actions)
+
+События складываются в кольцевой буфер в памяти без обращения к базе,
+а фоновая задача периодически выгружает их пачкой через COPY.
+"""
+import asyncio
+import json
+import random
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.config import settings
+from app.database import db
+
+
+# Типы событий
+CREATIVE_STEP = "creative_step"
+MEDIA_UPLOADED = "media_uploaded"
+CREATIVE_CREATED = "creative_created"
+CREATIVE_FAILED = "creative_failed"
+ADMIN_ACTION = "admin_action"
+
+# События, которые пишутся всегда, независимо от ACTIVITY_SAMPLE_RATE
+UNSAMPLED_ACTIONS = {CREATIVE_CREATED, CREATIVE_FAILED, ADMIN_ACTION}
+
+
+class ActivityLog:
+    """Кольцевой буфер событий с фоновой пакетной выгрузкой в user_actions"""
+    
+    # Интервал запуска очистки старых событий (секунды)
+    RETENTION_INTERVAL = 3600
+    
+    def __init__(self):
+        self.enabled = settings.activity_log_enabled
+        self.sample_rate = settings.activity_sample_rate
+        self.flush_interval = settings.activity_flush_interval
+        self.retention_days = settings.activity_retention_days
+        
+        self._events: deque = deque(maxlen=settings.activity_buffer_size)
+        self._dropped = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._retention: Optional[asyncio.Task] = None
+    
+    def emit(self, user_id: Optional[int], action_type: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Зарегистрировать событие (без ожидания и без обращения к базе)
+        
+        Args:
+            user_id: ID пользователя Telegram
+            action_type: Тип события
+            data: Дополнительные данные события (сохраняются в JSONB)
+        """
+        if not self.enabled:
+            return
+        
+        if action_type not in UNSAMPLED_ACTIONS and random.random() >= self.sample_rate:
+            return
+        
+        # Буфер полон - самое старое событие вытесняется
+        if len(self._events) == self._events.maxlen:
+            self._dropped += 1
+        
+        self._events.append((
+            user_id,
+            action_type,
+            json.dumps(data, ensure_ascii=False) if data is not None else None,
+            datetime.now(timezone.utc)
+        ))
+    
+    def start(self, retention: bool = True) -> None:
+        """
+        Запуск фоновой выгрузки и очистки
+        
+        Args:
+            retention: Запускать собственную очистку (выключается, когда её выполняет планировщик)
+        """
+        if not self.enabled:
+            return
+        
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop(), name="activity-log-flusher")
+        if retention and (self._retention is None or self._retention.done()):
+            self._retention = asyncio.create_task(self._retention_loop(), name="activity-log-retention")
+        logger.info("✅ Activity log started")
+    
+    async def flush(self) -> None:
+        """Выгрузить накопленные события в базу"""
+        if not self._events:
+            return
+        
+        records = list(self._events)
+        self._events.clear()
+        
+        if self._dropped:
+            logger.warning(f"⚠️ Activity buffer overflow: {self._dropped} events dropped")
+            self._dropped = 0
+        
+        try:
+            written = await db.copy_user_actions(records)
+            logger.debug(f"📝 Activity log: {written}/{len(records)} events written")
+        except Exception as e:
+            logger.error(f"❌ Failed to write {len(records)} activity events: {e}")
+        except BaseException:
+            # Отмена посреди выгрузки (остановка) - события вернутся в буфер и уйдут в close()
+            self._events.extendleft(reversed(records))
+            raise
+    
+    async def _flush_loop(self) -> None:
+        """Периодическая выгрузка событий"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def _retention_loop(self) -> None:
+        """Периодическое удаление событий старше ACTIVITY_RETENTION_DAYS"""
+        while True:
+            try:
+                deleted = await db.delete_old_user_actions(self.retention_days)
+                if deleted:
+                    logger.info(f"🧹 Activity log retention: deleted {deleted} events")
+            except Exception as e:
+                logger.error(f"❌ Activity log retention failed: {e}")
+            await asyncio.sleep(self.RETENTION_INTERVAL)
+    
+    async def close(self) -> None:
+        """Остановить фоновые задачи и выгрузить остаток буфера"""
+        for task in (self._flusher, self._retention):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._flusher = None
+        self._retention = None
+        
+        await self.flush()
+
+
+# Создаем глобальный экземпляр
+activity_log = ActivityLog()
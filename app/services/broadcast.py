@@ -2,192 +2,780 @@
 Сервис рассылки сообщений
 """
 import asyncio
-from typing import List, Optional, Dict, Any
+import time
+from datetime import timedelta
+from collections import deque
+from typing import Any, Optional, Dict, Callable, Awaitable, List
 from aiogram import Bot
-from aiogram.types import Message, InlineKeyboardMarkup
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
 from loguru import logger
 
-from app.database import db
+from app.config import settings
+from app.database import db, BroadcastSegment
+from app.database.models import Broadcast
+from app.utils import get_redis
+from .rate_limiter import TokenBucket, AdaptiveConcurrency
+from .broadcast_control import BroadcastControl, BroadcastCancelled, ControlGate, RUNNING, CANCELLED
+
+
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Коды ошибок Telegram для журнала доставки (подклассы проверяются раньше базовых)
+ERROR_CODES = (
+    (TelegramRetryAfter, 429),
+    (TelegramForbiddenError, 403),
+    (TelegramNotFound, 404),
+    (TelegramBadRequest, 400),
+    (TelegramServerError, 500),
+)
+
+# Общий для всех рассылок процесса лимит отправки (глобальный лимит Telegram ~30 сообщений/сек)
+broadcast_rate_limiter = TokenBucket(settings.broadcast_rate_limit)
 
 
 class BroadcastService:
-    """Сервис для рассылки сообщений"""
+    """
+    Сервис для рассылки сообщений
+    
+    Рассылка хранится в таблице broadcasts как задание: получатели обходятся
+    по возрастанию id, после каждой пачки в базу пишется чекпоинт
+    (last_user_id и счётчики). После перезапуска бота незавершённые задания
+    продолжаются с чекпоинта, не отправляя сообщение повторно.
+    
+    Сообщение не пересобирается по типам, а копируется из чата админа
+    (copyMessage / copyMessages для альбомов).
+    
+    Частота отправки ограничивается общим token bucket (BROADCAST_RATE_LIMIT),
+    ответ RetryAfter приостанавливает отправку на указанное Telegram время.
+    Число одновременных запросов подбирается по AIMD в пределах
+    BROADCAST_MIN_CONCURRENCY..BROADCAST_MAX_CONCURRENCY.
+    
+    Получатели, заблокировавшие бота, исключаются из следующих рассылок
+    (users.is_active = false, users.delivery_status) и возвращаются,
+    когда снова пишут боту.
+    
+    Админ может приостановить, продолжить или отменить рассылку
+    (BroadcastControl): состояние опрашивается раз в control_interval секунд.
+    """
+    
+    # Размер страницы получателей, читаемой из базы
+    batch_size = 100
     
-    def __init__(self, bot: Bot):
+    # Интервал чекпоинтов и отчётов о прогрессе (секунды)
+    progress_interval = 2
+    
+    # Через сколько секунд без чекпоинтов рассылка считается зависшей
+    stale_after = 60
+    
+    # Интервал проверки незавершённых рассылок
+    resume_interval = 30
+    
+    # Сколько хранится незапущенный черновик рассылки
+    draft_ttl = timedelta(days=1)
+    
+    # Интервал опроса состояния рассылки (пауза/отмена), секунды
+    control_interval = 1.0
+    
+    # Сколько ждать начатых отправок при остановке или отмене рассылки (секунды)
+    drain_timeout = 5.0
+    
+    def __init__(
+        self,
+        bot: Bot,
+        rate_limiter: Optional[TokenBucket] = None,
+        control: Optional[BroadcastControl] = None
+    ):
         self.bot = bot
+        self.rate_limiter = rate_limiter or broadcast_rate_limiter
+        self.control = control or BroadcastControl(get_redis())
+        self.max_retries = settings.broadcast_max_retries
+    
+    @staticmethod
+    async def create_draft(
+        admin_id: int,
+        source_chat_id: int,
+        source_message_ids: List[int],
+        content_type: str
+    ) -> Broadcast:
+        """
+        Создание черновика рассылки из сообщения админа
+        
+        В FSM хранится только ID черновика, остальные шаги мастера
+        (кнопка, подтверждение) меняют строку в broadcasts.
+        
+        Args:
+            admin_id: ID админа
+            source_chat_id: Чат с исходным сообщением
+            source_message_ids: ID исходного сообщения (или всех сообщений альбома)
+            content_type: Тип контента (или media_group для альбома)
+        """
+        return await db.create_broadcast(
+            admin_id=admin_id,
+            media_type=content_type,
+            source_chat_id=source_chat_id,
+            source_message_ids=source_message_ids,
+            status="draft"
+        )
+    
+    @staticmethod
+    async def create_retry_draft(broadcast_id: int, admin_id: int) -> Optional[Broadcast]:
+        """
+        Черновик повторной отправки тем получателям рассылки, доставка которым не удалась
+        
+        Получатели выбираются по журналу доставки (broadcast_deliveries,
+        статус failed); заблокировавшие бота в повтор не попадают.
+        """
+        original = await db.get_broadcast(broadcast_id)
+        if not original or not original.source_message_ids:
+            return None
+        
+        return await db.create_broadcast(
+            admin_id=admin_id,
+            media_type=original.media_type,
+            source_chat_id=original.source_chat_id,
+            source_message_ids=original.source_message_ids,
+            button_text=original.button_text,
+            button_url=original.button_url,
+            segment=BroadcastSegment(retry_of=broadcast_id).to_dict(),
+            status="draft"
+        )
+    
+    @staticmethod
+    async def start_draft(broadcast_id: int, admin_id: int, status: str = "running") -> Optional[Broadcast]:
+        """
+        Запуск черновика
+        
+        Запустить можно черновик или рассылку, отложенную планировщиком.
+        Со статусом running рассылка сразу захвачена текущим процессом,
+        со статусом queued - передаётся воркерам рассылок (BROADCAST_MODE=distributed).
+        
+        Returns:
+            Запущенная рассылка или None, если черновик не найден или уже запущен
+        """
+        draft = await db.get_broadcast(broadcast_id)
+        if not draft or draft.status not in ("draft", "scheduled"):
+            return None
+        
+        # Точное (не кэшированное) число получателей сегмента
+        target_users = await db.count_segment_users(BroadcastSegment.from_dict(draft.segment), cached=False)
+        return await db.start_broadcast_draft(broadcast_id, admin_id=admin_id, target_users=target_users, status=status)
+    
+    @staticmethod
+    async def set_segment(broadcast_id: int, admin_id: int, segment: BroadcastSegment) -> Optional[int]:
+        """
+        Выбор сегмента получателей для черновика
+        
+        Returns:
+            Количество получателей (из кэша превью) или None, если черновик не найден
+        """
+        if not await db.update_broadcast_draft(broadcast_id, admin_id=admin_id, segment=segment.to_dict()):
+            return None
+        return await db.count_segment_users(segment)
     
-    async def send_broadcast(
+    @staticmethod
+    async def count_recipients(broadcast_id: int) -> int:
+        """Количество получателей черновика для превью (кэшируется)"""
+        draft = await db.get_broadcast(broadcast_id)
+        segment = BroadcastSegment.from_dict(draft.segment if draft else None)
+        return await db.count_segment_users(segment)
+    
+    async def claim_and_run(
+        self,
+        broadcast_id: int,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Захват и выполнение ожидающей или зависшей рассылки
+        
+        Returns:
+            Словарь со статистикой или None, если рассылку уже выполняет другой процесс
+        """
+        broadcast = await db.claim_broadcast(broadcast_id, self.stale_after)
+        if not broadcast:
+            logger.info(f"Рассылка #{broadcast_id} уже выполняется или завершена")
+            return None
+        return await self.run_broadcast(broadcast, progress_callback)
+    
+    async def run_broadcast(
         self,
-        message: Message,
-        custom_keyboard: Optional[InlineKeyboardMarkup] = None,
-        progress_callback: Optional[callable] = None
-    ) -> Dict[str, int]:
+        broadcast: Broadcast,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
         """
-        Отправка рассылки всем пользователям
+        Выполнение (или продолжение с чекпоинта) захваченной рассылки
+        
+        Получатели читаются страницами в очередь, из которой их забирает пул
+        воркеров. Число одновременных отправок подстраивается по AIMD, поэтому
+        один медленный запрос не задерживает остальные. Раз в progress_interval
+        секунд в базу пишется чекпоинт по полностью обработанным страницам,
+        а в progress_callback передаётся текущая статистика.
         
         Args:
-            message: Сообщение для рассылки
-            custom_keyboard: Кастомная клавиатура
+            broadcast: Рассылка в статусе running, захваченная текущим процессом
             progress_callback: Функция для отслеживания прогресса
-            
+        
         Returns:
             Словарь со статистикой отправки
         """
-        users = await db.get_active_users()
+        broadcast_id = broadcast.id
+        run = BroadcastRun.from_broadcast(broadcast)
         
-        stats = {
-            "total": len(users),
-            "sent": 0,
-            "failed": 0,
-            "blocked": 0
-        }
+        if run.last_user_id:
+            logger.info(f"Продолжаем рассылку #{broadcast_id} после пользователя {run.last_user_id}")
+        else:
+            logger.info(f"Начинаем рассылку #{broadcast_id} для {run.total} пользователей")
+        
+        try:
+            stats = await self._execute(broadcast, run, progress_callback)
+        except BroadcastCancelled:
+            # Отмена админом: оставшиеся получатели сообщение не получат
+            await db.finish_broadcast(broadcast_id, status="cancelled")
+            logger.info(f"Рассылка #{broadcast_id} отменена на пользователе {run.last_user_id}")
+            return run.snapshot(0)
+        except asyncio.CancelledError:
+            # Остановка бота: возвращаем задание в очередь с последнего чекпоинта
+            await db.finish_broadcast(broadcast_id, status="pending")
+            logger.info(f"Рассылка #{broadcast_id} прервана на пользователе {run.last_user_id}, будет продолжена")
+            raise
+        except Exception:
+            await db.finish_broadcast(broadcast_id, status="failed")
+            raise
+        
+        await db.finish_broadcast(broadcast_id, status="completed")
+        
+        logger.info(
+            f"Рассылка #{broadcast_id} завершена. Отправлено: {stats['sent']}, "
+            f"Ошибок: {stats['failed']}, Заблокировано: {stats['blocked']}, "
+            f"Скорость: {stats['rate']:.1f} сообщ./сек"
+        )
+        return stats
+    
+    async def _execute(
+        self,
+        broadcast: Broadcast,
+        run: "BroadcastRun",
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Отправка получателям диапазона run через пул воркеров
+        
+        При ошибке или отмене (в том числе BroadcastCancelled от админа)
+        дожидается начатых отправок, сохраняет чекпоинт и журнал доставки
+        всех обработанных получателей и пробрасывает исключение дальше.
+        """
+        concurrency = AdaptiveConcurrency(
+            initial=settings.broadcast_min_concurrency,
+            min_limit=settings.broadcast_min_concurrency,
+            max_limit=settings.broadcast_max_concurrency,
+            target_latency=settings.broadcast_target_latency
+        )
+        custom_keyboard = self._build_keyboard(broadcast)
+        # Места хватает на сигнал завершения каждому воркеру при остановке
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(self.batch_size * 2, settings.broadcast_max_concurrency))
+        
+        # Рассылка могла быть поставлена на паузу или отменена до (пере)запуска
+        run.gate = self.control.gate(run.broadcast_id, self.control_interval)
+        if await run.gate.refresh() == CANCELLED:
+            raise BroadcastCancelled(f"Broadcast #{run.broadcast_id} cancelled")
+        
+        workers = [
+            asyncio.create_task(self._worker(queue, run, concurrency, broadcast, custom_keyboard))
+            for _ in range(settings.broadcast_max_concurrency)
+        ]
+        producer = asyncio.create_task(self._produce(queue, run, len(workers)))
+        stop_reporter = asyncio.Event()
+        reporter = asyncio.create_task(self._report(run, concurrency, progress_callback, stop_reporter))
+        poller = asyncio.create_task(run.gate.poll())
+        
+        try:
+            # wait, а не gather: отмена задачи рассылки не должна прерывать начатые отправки
+            done, _ = await asyncio.wait((producer, *workers), return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        except (asyncio.CancelledError, Exception):
+            await self._drain(queue, producer, workers)
+            # Репортёр останавливается между чекпоинтами, а не посреди записи журнала
+            stop_reporter.set()
+            poller.cancel()
+            await asyncio.gather(reporter, poller, return_exceptions=True)
+            # Получатели незавершённых страниц, уже получившие сообщение, при продолжении пропускаются
+            run.settle()
+            try:
+                await self._checkpoint(run)
+            except Exception as checkpoint_error:
+                logger.warning(f"Не удалось сохранить чекпоинт рассылки #{run.broadcast_id}: {checkpoint_error}")
+            raise
+        
+        stop_reporter.set()
+        poller.cancel()
+        await asyncio.gather(reporter, poller, return_exceptions=True)
+        await self._checkpoint(run)
         
-        logger.info(f"Начинаем рассылку для {len(users)} пользователей")
+        return run.snapshot(concurrency.limit)
+    
+    async def _drain(self, queue: asyncio.Queue, producer: asyncio.Task, workers: List[asyncio.Task]) -> None:
+        """Остановка пула: новые получатели не выдаются, начатые отправки завершаются (не дольше drain_timeout)"""
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
         
-        # Отправляем сообщения пачками по 30 штук
-        batch_size = 30
-        delay_between_batches = 1  # секунда между пачками
+        while not queue.empty():
+            queue.get_nowait()
+        for _ in workers:
+            queue.put_nowait(None)
         
-        for i in range(0, len(users), batch_size):
-            batch = users[i:i + batch_size]
-            tasks = []
+        _, pending = await asyncio.wait(workers, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _produce(self, queue: asyncio.Queue, run: "BroadcastRun", workers: int) -> None:
+        """
+        Чтение получателей страницами (keyset по id) в очередь воркеров
+        
+        Получатели с записью в журнале доставки этой рассылки пропускаются:
+        при остановке они были обработаны после последнего чекпоинта.
+        """
+        after_user_id = run.last_user_id
+        while True:
+            user_ids = await db.get_broadcast_recipient_ids(
+                after_user_id,
+                self.batch_size,
+                run.segment,
+                upto_user_id=run.upto_user_id,
+                exclude_delivered=run.broadcast_id
+            )
+            if not user_ids:
+                break
             
-            for user in batch:
-                task = self._send_single_message(
-                    user_id=user.id,
-                    message=message,
-                    custom_keyboard=custom_keyboard
-                )
-                tasks.append(task)
+            page = run.open_page(user_ids)
+            for user_id in user_ids:
+                await queue.put((user_id, page))
+            after_user_id = user_ids[-1]
+        
+        # Сигнал завершения для каждого воркера
+        for _ in range(workers):
+            await queue.put(None)
+    
+    async def _worker(
+        self,
+        queue: asyncio.Queue,
+        run: "BroadcastRun",
+        concurrency: AdaptiveConcurrency,
+        broadcast: Broadcast,
+        custom_keyboard: Optional[InlineKeyboardMarkup]
+    ) -> None:
+        """Воркер пула: отправка сообщений получателям из очереди"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
             
-            # Выполняем пачку параллельно
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            user_id, page = item
+            result = "failed"
             
-            # Обрабатываем результаты
-            for result in results:
-                if isinstance(result, Exception):
-                    if isinstance(result, TelegramForbiddenError):
-                        stats["blocked"] += 1
-                    else:
-                        stats["failed"] += 1
-                elif result:
-                    stats["sent"] += 1
-                else:
-                    stats["failed"] += 1
+            for attempt in range(self.max_retries + 1):
+                # Пауза ждёт здесь, отмена прерывает рассылку (получатель останется за чекпоинтом)
+                await run.gate.wait()
+                await concurrency.acquire()
+                await self.rate_limiter.acquire()
+                started = time.monotonic()
+                throttled = False
+                message_id = error_code = None
+                try:
+                    message_id = await self._send_single_message(
+                        user_id=user_id,
+                        broadcast=broadcast,
+                        custom_keyboard=custom_keyboard
+                    )
+                    result = "sent" if message_id else "failed"
+                except TelegramRetryAfter as e:
+                    throttled = True
+                    await self.rate_limiter.pause(e.retry_after)
+                    result = "failed"
+                    error_code = 429
+                except TelegramForbiddenError as e:
+                    result = "blocked"
+                    error_code = 403
+                    delivery_status = "deactivated" if "deactivated" in str(e).lower() else "blocked"
+                    page.undeliverable.setdefault(delivery_status, []).append(user_id)
+                except Exception as e:
+                    result = "failed"
+                    error_code = next((code for error, code in ERROR_CODES if isinstance(e, error)), None)
+                finally:
+                    latency = time.monotonic() - started
+                    await concurrency.release(latency, throttled)
+                
+                if not throttled:
+                    break
             
-            # Вызываем callback для обновления прогресса
-            if progress_callback:
-                await progress_callback(stats)
+            page.deliveries.append((
+                run.broadcast_id, user_id, result, error_code, int(latency * 1000), message_id
+            ))
+            run.complete(page, result)
+    
+    async def _report(
+        self,
+        run: "BroadcastRun",
+        concurrency: AdaptiveConcurrency,
+        progress_callback: Optional[ProgressCallback],
+        stop: asyncio.Event
+    ) -> None:
+        """
+        Периодический чекпоинт и отчёт о прогрессе (до установки stop)
+        
+        Отчёт выполняется в отдельной задаче: долгое или неудачное
+        редактирование сообщения с прогрессом не задерживает чекпоинты.
+        """
+        notify: Optional[asyncio.Task] = None
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.progress_interval)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+                run.concurrency = concurrency.limit
+                try:
+                    await self._checkpoint(run)
+                except Exception as e:
+                    logger.warning(f"Не удалось сохранить чекпоинт рассылки #{run.broadcast_id}: {e}")
+                
+                # Предыдущий отчёт ещё выполняется - этот пропускаем
+                if progress_callback and (notify is None or notify.done()):
+                    notify = asyncio.create_task(
+                        self._notify_progress(run, progress_callback, run.snapshot(concurrency.limit))
+                    )
+        finally:
+            if notify:
+                notify.cancel()
+    
+    @staticmethod
+    async def _notify_progress(run: "BroadcastRun", progress_callback: ProgressCallback, stats: Dict[str, Any]) -> None:
+        """Отчёт о прогрессе (ошибка отчёта не останавливает рассылку)"""
+        try:
+            await progress_callback(stats)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс рассылки #{run.broadcast_id}: {e}")
+    
+    async def _checkpoint(self, run: "BroadcastRun") -> None:
+        """
+        Сохранение чекпоинта по полностью обработанным страницам
+        
+        Перед чекпоинтом журнал доставки этих страниц записывается через COPY,
+        а пользователи, заблокировавшие бота, одним UPDATE на причину
+        исключаются из следующих рассылок. Чекпоинт пишется и без прогресса
+        (пауза, долгий RetryAfter, медленный получатель): heartbeat_at
+        показывает, что рассылка выполняется и её нельзя захватить повторно.
+        """
+        run.advance()
+        await self._write_deliveries(run)
+        await self._prune_undeliverable(run)
+        
+        await db.checkpoint_broadcast(
+            run.broadcast_id,
+            last_user_id=run.last_user_id,
+            sent_count=run.committed["sent"],
+            failed_count=run.committed["failed"],
+            blocked_count=run.committed["blocked"]
+        )
+    
+    @staticmethod
+    async def _write_deliveries(run: "BroadcastRun") -> None:
+        """Запись журнала доставки обработанных страниц (при ошибке строки остаются до следующего чекпоинта)"""
+        if not run.deliveries:
+            return
+        
+        # Строки забираются до записи: новые страницы, завершённые во время COPY, не теряются
+        deliveries, run.deliveries = run.deliveries, []
+        try:
+            await db.copy_broadcast_deliveries(deliveries)
+        except BaseException:
+            run.deliveries = deliveries + run.deliveries
+            raise
+    
+    @staticmethod
+    async def _prune_undeliverable(run: "BroadcastRun") -> None:
+        """Исключение из рассылок получателей, заблокировавших бота (один UPDATE на причину)"""
+        for delivery_status, user_ids in list(run.undeliverable.items()):
+            pruned = await db.mark_users_undeliverable(user_ids, delivery_status)
+            del run.undeliverable[delivery_status]
+            if pruned:
+                logger.info(f"Рассылка #{run.broadcast_id}: {pruned} получателей исключены ({delivery_status})")
+                await db.defer_bot_stats_refresh()
+    
+    async def resume_unfinished(self) -> None:
+        """Фоновый воркер: продолжает рассылки, прерванные перезапуском или падением процесса"""
+        while True:
+            try:
+                # Брошенные черновики (мастер рассылки не был завершён)
+                await db.delete_broadcast_drafts(older_than=self.draft_ttl)
+                
+                for broadcast_id in await db.get_resumable_broadcast_ids(self.stale_after):
+                    stats = await self.claim_and_run(broadcast_id)
+                    if stats:
+                        await self._notify_admin(broadcast_id, stats)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при продолжении рассылок: {e}")
             
-            # Пауза между пачками
-            if i + batch_size < len(users):
-                await asyncio.sleep(delay_between_batches)
+            await asyncio.sleep(self.resume_interval)
+    
+    async def _notify_admin(
+        self,
+        broadcast_id: int,
+        stats: Dict[str, Any],
+        note: str = "продолжена после перезапуска"
+    ) -> None:
+        """Уведомление админа о завершении рассылки, выполненной без его участия"""
+        broadcast = await db.get_broadcast(broadcast_id)
+        if not broadcast:
+            return
         
-        logger.info(f"Рассылка завершена. Отправлено: {stats['sent']}, Ошибок: {stats['failed']}, Заблокировано: {stats['blocked']}")
-        return stats
+        if stats.get("state") == CANCELLED:
+            title = f"⛔ <b>Рассылка #{broadcast_id} отменена</b>"
+        else:
+            title = f"✅ <b>Рассылка #{broadcast_id} завершена</b>"
+        
+        try:
+            await self.bot.send_message(
+                broadcast.admin_id,
+                f"{title} ({note})\n\n"
+                f"👥 Всего получателей: <b>{stats['total']}</b>\n"
+                f"✅ Успешно доставлено: <b>{stats['sent']}</b>\n"
+                f"❌ Ошибок доставки: <b>{stats['failed']}</b>\n"
+                f"🚫 Заблокировали бота: <b>{stats['blocked']}</b>"
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось уведомить админа о рассылке #{broadcast_id}: {e}")
+    
+    @staticmethod
+    def _build_keyboard(broadcast: Broadcast) -> Optional[InlineKeyboardMarkup]:
+        """Клавиатура с кастомной кнопкой рассылки"""
+        if not (broadcast.button_text and broadcast.button_url):
+            return None
+        return InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text=broadcast.button_text, url=broadcast.button_url)
+        ]])
     
     async def _send_single_message(
         self,
         user_id: int,
-        message: Message,
+        broadcast: Broadcast,
         custom_keyboard: Optional[InlineKeyboardMarkup] = None
-    ) -> bool:
+    ) -> Optional[int]:
         """
         Отправка одного сообщения пользователю
         
+        Сообщение копируется из чата админа через copyMessage (альбом - одним
+        copyMessages), поэтому любой тип контента отправляется одним запросом
+        с исходным форматированием. Ошибки отправки логируются и пробрасываются
+        воркеру, который пишет их код в журнал доставки.
+        
         Args:
             user_id: ID пользователя
-            message: Сообщение для отправки
+            broadcast: Рассылка
             custom_keyboard: Кастомная клавиатура
-            
+        
         Returns:
-            True если сообщение отправлено успешно
+            ID доставленного сообщения (первого сообщения альбома) или None, если отправлять нечего
         """
+        message_ids = broadcast.source_message_ids
+        if not message_ids:
+            logger.warning(f"У рассылки #{broadcast.id} нет исходного сообщения")
+            return None
+        
         try:
-            # Определяем тип сообщения и отправляем соответствующим методом
-            if message.text:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=message.text,
-                    reply_markup=custom_keyboard,
-                    parse_mode=message.html_text and "HTML" or None
-                )
-            elif message.photo:
-                await self.bot.send_photo(
-                    chat_id=user_id,
-                    photo=message.photo[-1].file_id,
-                    caption=message.caption,
-                    reply_markup=custom_keyboard,
-                    parse_mode=message.html_text and "HTML" or None
-                )
-            elif message.video:
-                await self.bot.send_video(
-                    chat_id=user_id,
-                    video=message.video.file_id,
-                    caption=message.caption,
-                    reply_markup=custom_keyboard,
-                    parse_mode=message.html_text and "HTML" or None
-                )
-            elif message.document:
-                await self.bot.send_document(
-                    chat_id=user_id,
-                    document=message.document.file_id,
-                    caption=message.caption,
-                    reply_markup=custom_keyboard,
-                    parse_mode=message.html_text and "HTML" or None
-                )
-            elif message.audio:
-                await self.bot.send_audio(
-                    chat_id=user_id,
-                    audio=message.audio.file_id,
-                    caption=message.caption,
-                    reply_markup=custom_keyboard,
-                    parse_mode=message.html_text and "HTML" or None
-                )
-            elif message.voice:
-                await self.bot.send_voice(
+            if len(message_ids) == 1:
+                sent = await self.bot.copy_message(
                     chat_id=user_id,
-                    voice=message.voice.file_id,
-                    caption=message.caption,
-                    reply_markup=custom_keyboard,
-                    parse_mode=message.html_text and "HTML" or None
-                )
-            elif message.video_note:
-                await self.bot.send_video_note(
-                    chat_id=user_id,
-                    video_note=message.video_note.file_id,
-                    reply_markup=custom_keyboard
-                )
-            elif message.animation:
-                await self.bot.send_animation(
-                    chat_id=user_id,
-                    animation=message.animation.file_id,
-                    caption=message.caption,
-                    reply_markup=custom_keyboard,
-                    parse_mode=message.html_text and "HTML" or None
-                )
-            elif message.sticker:
-                await self.bot.send_sticker(
-                    chat_id=user_id,
-                    sticker=message.sticker.file_id,
+                    from_chat_id=broadcast.source_chat_id,
+                    message_id=message_ids[0],
                     reply_markup=custom_keyboard
                 )
-            else:
-                # Если тип сообщения не поддерживается
-                return False
-            
-            return True
+                return sent.message_id
             
+            sent = await self.bot.copy_messages(
+                chat_id=user_id,
+                from_chat_id=broadcast.source_chat_id,
+                message_ids=message_ids
+            )
+            return sent[0].message_id
+        
         except TelegramForbiddenError:
             # Пользователь заблокировал бота
             logger.debug(f"Пользователь {user_id} заблокировал бота")
             raise
-        except TelegramBadRequest as e:
+        except TelegramRetryAfter as e:
+            # Превышен лимит Telegram - получатель будет отправлен повторно после паузы
+            logger.warning(f"RetryAfter {e.retry_after}s при отправке пользователю {user_id}")
+            raise
+        except TelegramAPIError as e:
             # Другие ошибки Telegram API
             logger.warning(f"Ошибка отправки пользователю {user_id}: {e}")
-            return False
+            raise
         except Exception as e:
             # Неожиданные ошибки
             logger.error(f"Неожиданная ошибка при отправке пользователю {user_id}: {e}")
-            return False 
\ No newline at end of file
+            raise
+
+
+class BroadcastPage:
+    """Страница получателей и её результаты до записи в чекпоинт"""
+    
+    __slots__ = ("last_user_id", "remaining", "sent", "failed", "blocked", "undeliverable", "deliveries")
+    
+    def __init__(self, user_ids: List[int]):
+        self.last_user_id = user_ids[-1]
+        self.remaining = len(user_ids)
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.undeliverable: Dict[str, List[int]] = {}
+        self.deliveries: List[tuple] = []
+
+
+class BroadcastRun:
+    """
+    Состояние выполняющейся рассылки
+    
+    Отправки завершаются не по порядку, поэтому чекпоинт сдвигается только
+    по префиксу полностью обработанных страниц: всё до last_user_id
+    включительно гарантированно обработано, а committed содержит счётчики
+    ровно для этого префикса (после settle() - и для обработанных
+    получателей незавершённых страниц).
+    """
+    
+    # Окно (секунды), по которому считается текущая скорость отправки
+    RATE_WINDOW = 10.0
+    
+    def __init__(
+        self,
+        broadcast_id: int,
+        segment: BroadcastSegment,
+        total: int,
+        last_user_id: int = 0,
+        committed: Optional[Dict[str, int]] = None,
+        upto_user_id: Optional[int] = None
+    ):
+        self.broadcast_id = broadcast_id
+        self.segment = segment
+        self.total = total
+        self.last_user_id = last_user_id
+        self.upto_user_id = upto_user_id  # Верхняя граница диапазона id (для шарда), None - до конца
+        self.committed = dict(committed or {"sent": 0, "failed": 0, "blocked": 0})
+        self.live = dict(self.committed)
+        
+        # Недоставляемые получатели обработанных страниц, ещё не исключённые в базе
+        self.undeliverable: Dict[str, List[int]] = {}
+        
+        # Журнал доставки обработанных страниц, ещё не записанный в broadcast_deliveries
+        self.deliveries: List[tuple] = []
+        
+        # Состояние паузы/отмены, назначается при запуске отправки
+        self.gate: Optional[ControlGate] = None
+        
+        # Лимит одновременных отправок на последнем чекпоинте
+        self.concurrency = 0
+        
+        self._pages: deque = deque()
+        self._completions: deque = deque()
+        self._started = time.monotonic()
+        self._processed = 0
+        self._errors = 0
+    
+    @classmethod
+    def from_broadcast(cls, broadcast: Broadcast) -> "BroadcastRun":
+        """Состояние всей рассылки с её чекпоинта"""
+        return cls(
+            broadcast_id=broadcast.id,
+            segment=BroadcastSegment.from_dict(broadcast.segment),
+            total=broadcast.target_users,
+            last_user_id=broadcast.last_user_id or 0,
+            committed={
+                "sent": broadcast.sent_count,
+                "failed": broadcast.failed_count,
+                "blocked": broadcast.blocked_count
+            }
+        )
+    
+    @property
+    def state(self) -> str:
+        return self.gate.state if self.gate else RUNNING
+    
+    @property
+    def paused(self) -> bool:
+        return bool(self.gate and self.gate.paused)
+    
+    def open_page(self, user_ids: List[int]) -> BroadcastPage:
+        page = BroadcastPage(user_ids)
+        self._pages.append(page)
+        return page
+    
+    def complete(self, page: BroadcastPage, result: str) -> None:
+        """Учёт результата отправки (sent / failed / blocked)"""
+        setattr(page, result, getattr(page, result) + 1)
+        page.remaining -= 1
+        self.live[result] += 1
+        self._processed += 1
+        if result == "failed":
+            self._errors += 1
+        self._completions.append(time.monotonic())
+    
+    def advance(self) -> bool:
+        """Сдвинуть чекпоинт по обработанным страницам; True, если он изменился"""
+        advanced = False
+        while self._pages and self._pages[0].remaining == 0:
+            page = self._pages.popleft()
+            self.last_user_id = page.last_user_id
+            self.committed["sent"] += page.sent
+            self.committed["failed"] += page.failed
+            self.committed["blocked"] += page.blocked
+            for delivery_status, user_ids in page.undeliverable.items():
+                self.undeliverable.setdefault(delivery_status, []).extend(user_ids)
+            self.deliveries.extend(page.deliveries)
+            advanced = True
+        return advanced
+    
+    def settle(self) -> None:
+        """
+        Учесть результаты незавершённых страниц при остановке рассылки
+        
+        Чекпоинт остаётся на последней полностью обработанной странице,
+        счётчики и журнал доставки включают всех обработанных получателей.
+        """
+        self.advance()
+        for page in self._pages:
+            self.committed["sent"] += page.sent
+            self.committed["failed"] += page.failed
+            self.committed["blocked"] += page.blocked
+            for delivery_status, user_ids in page.undeliverable.items():
+                self.undeliverable.setdefault(delivery_status, []).extend(user_ids)
+            self.deliveries.extend(page.deliveries)
+        self._pages.clear()
+    
+    def snapshot(self, concurrency: int) -> Dict[str, Any]:
+        """Статистика для progress_callback"""
+        now = time.monotonic()
+        while self._completions and now - self._completions[0] > self.RATE_WINDOW:
+            self._completions.popleft()
+        
+        window = min(self.RATE_WINDOW, now - self._started) or 1.0
+        return {
+            "total": self.total,
+            "sent": self.live["sent"],
+            "failed": self.live["failed"],
+            "blocked": self.live["blocked"],
+            "rate": len(self._completions) / window,
+            "error_rate": self._errors / self._processed if self._processed else 0.0,
+            "concurrency": concurrency,
+            "state": self.state
+        }
@@ -0,0 +1,120 @@
+"""
+Управление выполняющимися рассылками: пауза, продолжение и отмена
+
+Состояние рассылки (running / paused / cancelled) хранится в Redis, поэтому
+его видят и процесс бота, и воркеры распределённой рассылки. Конвейер
+отправки опрашивает состояние раз в секунду и проверяет локальную копию
+перед каждой отправкой.
+"""
+import asyncio
+from typing import Optional
+from loguru import logger
+from redis.asyncio import Redis
+
+
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+
+CONTROL_STATES = (RUNNING, PAUSED, CANCELLED)
+
+# Сколько хранится состояние рассылки в Redis (секунды)
+CONTROL_TTL = 7 * 24 * 3600
+
+
+def control_key(broadcast_id: int) -> str:
+    """Ключ состояния рассылки"""
+    return f"broadcast:{broadcast_id}:control"
+
+
+class BroadcastCancelled(Exception):
+    """Рассылка отменена админом"""
+
+
+class BroadcastControl:
+    """Чтение и изменение состояния рассылок в Redis"""
+    
+    def __init__(self, redis: Redis):
+        self.redis = redis
+    
+    async def get_state(self, broadcast_id: int) -> str:
+        """Текущее состояние рассылки (running, если не задано)"""
+        return await self.redis.get(control_key(broadcast_id)) or RUNNING
+    
+    async def set_state(self, broadcast_id: int, state: str) -> None:
+        """Пауза (paused), продолжение (running) или отмена (cancelled) рассылки"""
+        if state not in CONTROL_STATES:
+            raise ValueError(f"Unknown broadcast state: {state}")
+        await self.redis.set(control_key(broadcast_id), state, ex=CONTROL_TTL)
+        logger.info(f"Рассылка #{broadcast_id}: состояние {state}")
+    
+    def gate(self, broadcast_id: int, poll_interval: float = 1.0) -> "ControlGate":
+        """Локальная копия состояния для конвейера отправки"""
+        return ControlGate(self, broadcast_id, poll_interval)
+
+
+class ControlGate:
+    """
+    Состояние одной рассылки в процессе, обновляемое фоновым опросом Redis
+    
+    Воркеры вызывают wait() перед каждой отправкой: на паузе он ждёт
+    продолжения, после отмены - выбрасывает BroadcastCancelled. Если Redis
+    недоступен, рассылка продолжается с последним известным состоянием.
+    """
+    
+    def __init__(self, control: BroadcastControl, broadcast_id: int, poll_interval: float = 1.0):
+        self.control = control
+        self.broadcast_id = broadcast_id
+        self.poll_interval = poll_interval
+        self.state = RUNNING
+        
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._failing = False
+    
+    @property
+    def paused(self) -> bool:
+        return self.state == PAUSED
+    
+    @property
+    def cancelled(self) -> bool:
+        return self.state == CANCELLED
+    
+    async def refresh(self) -> str:
+        """Перечитать состояние из Redis"""
+        try:
+            state = await self.control.get_state(self.broadcast_id)
+        except Exception as e:
+            if not self._failing:
+                logger.warning(f"Не удалось прочитать состояние рассылки #{self.broadcast_id}: {e}")
+            self._failing = True
+            return self.state
+        
+        self._failing = False
+        self._apply(state)
+        return state
+    
+    async def poll(self) -> None:
+        """Фоновый опрос состояния раз в poll_interval секунд"""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.poll_interval)
+    
+    async def wait(self) -> None:
+        """Пропустить отправку, дождаться продолжения после паузы или прервать рассылку при отмене"""
+        while True:
+            if self.state == CANCELLED:
+                raise BroadcastCancelled(f"Broadcast #{self.broadcast_id} cancelled")
+            if self.state != PAUSED:
+                return
+            await self._resumed.wait()
+    
+    def _apply(self, state: Optional[str]) -> None:
+        if state == self.state:
+            return
+        
+        self.state = state if state in CONTROL_STATES else RUNNING
+        if self.state == PAUSED:
+            self._resumed.clear()
+        else:
+            self._resumed.set()
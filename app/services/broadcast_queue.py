@@ -0,0 +1,408 @@
+"""
+Распределённая рассылка: шарды получателей в Redis Stream
+
+Процесс бота (BROADCAST_MODE=distributed) только делит получателей рассылки
+на шарды по диапазонам id и кладёт их в поток broadcast:shards. Отдельные
+процессы воркеров (python -m app.broadcast_worker) забирают шарды через
+consumer group, отправляют сообщения и подтверждают (XACK) шард после
+обработки. Лимит отправки общий для всех воркеров и хранится в Redis.
+"""
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from aiogram import Bot
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.config import settings
+from app.database import db, BroadcastSegment
+from app.database.models import Broadcast
+from .broadcast import BroadcastService, BroadcastRun, ProgressCallback
+from .broadcast_control import BroadcastControl, BroadcastCancelled, RUNNING, CANCELLED
+
+
+SHARDS_STREAM = "broadcast:shards"
+WORKERS_GROUP = "broadcast-workers"
+
+# Приблизительная максимальная длина потока (старые подтверждённые шарды вытесняются)
+STREAM_MAXLEN = 100000
+
+# Сколько хранятся счётчики рассылки в Redis после постановки в очередь (секунды)
+STATS_TTL = 7 * 24 * 3600
+
+# Через сколько секунд без чекпоинта шард не считается в работе (воркер упал)
+SENDERS_FRESHNESS = 10
+
+
+# Токен из окна текущей секунды; во время паузы по RetryAfter окно не расходуется.
+# Возвращает -оставшуюся паузу (мс) или число занятых в окне токенов
+ACQUIRE_SCRIPT = """
+local paused = redis.call('pttl', KEYS[1])
+if paused > 0 then
+    return -paused
+end
+local used = redis.call('incr', KEYS[2])
+if used == 1 then
+    redis.call('expire', KEYS[2], 2)
+end
+return used
+"""
+
+
+def stats_key(broadcast_id: int) -> str:
+    """Хэш счётчиков рассылки: shards, sent, failed, blocked"""
+    return f"broadcast:{broadcast_id}:stats"
+
+
+def done_key(broadcast_id: int) -> str:
+    """Множество номеров обработанных шардов"""
+    return f"broadcast:{broadcast_id}:done"
+
+
+def progress_key(broadcast_id: int) -> str:
+    """Хэш чекпоинтов шардов: номер шарда -> последний обработанный получатель"""
+    return f"broadcast:{broadcast_id}:progress"
+
+
+def senders_key(broadcast_id: int) -> str:
+    """Хэш шардов в работе: номер шарда -> «одновременных отправок:время чекпоинта»"""
+    return f"broadcast:{broadcast_id}:senders"
+
+
+async def ensure_group(redis: Redis) -> None:
+    """Создание consumer group (с начала потока, чтобы не потерять уже добавленные шарды)"""
+    try:
+        await redis.xgroup_create(SHARDS_STREAM, WORKERS_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def finish_cancelled(broadcast_id: int, redis: Redis) -> None:
+    """Перевод отменённой рассылки в статус cancelled со счётчиками, накопленными шардами"""
+    stats = await redis.hgetall(stats_key(broadcast_id))
+    counts = {key: int(stats.get(key, 0)) for key in ("sent", "failed", "blocked")}
+    await db.finish_broadcast(broadcast_id, status="cancelled", counts=counts)
+
+
+class RedisRateLimiter:
+    """
+    Общий для всех процессов лимит отправки
+    
+    Токены считаются в окне в одну секунду (INCR ключа с номером секунды).
+    Пауза по RetryAfter хранится в Redis и действует на все воркеры;
+    проверка паузы и списание токена выполняются одним Lua-скриптом.
+    """
+    
+    def __init__(self, redis: Redis, rate: float, key: str = "broadcast:rate"):
+        self.redis = redis
+        self.rate = max(int(rate), 1)
+        self.key = key
+        self.pause_key = f"{key}:pause"
+        self._acquire = redis.register_script(ACQUIRE_SCRIPT)
+    
+    async def acquire(self) -> None:
+        """Дождаться и забрать один токен из общего бюджета"""
+        while True:
+            now = time.time()
+            window = int(now)
+            window_key = f"{self.key}:{window}"
+            
+            used = int(await self._acquire(keys=[self.pause_key, window_key]))
+            if used < 0:
+                await asyncio.sleep(-used / 1000)
+                continue
+            if used <= self.rate:
+                return
+            
+            # Бюджет текущей секунды исчерпан - ждём следующую
+            await asyncio.sleep(window + 1 - now)
+    
+    async def pause(self, seconds: float) -> None:
+        """Приостановить отправку во всех воркерах (RetryAfter от Telegram)"""
+        await self.redis.set(self.pause_key, "1", px=max(int(seconds * 1000), 1))
+        logger.warning(f"⏸ Shared rate limiter paused for {seconds}s")
+
+
+class BroadcastQueue:
+    """Постановка рассылки в очередь шардов и наблюдение за её прогрессом"""
+    
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.control = BroadcastControl(redis)
+    
+    async def enqueue(self, broadcast: Broadcast) -> int:
+        """
+        Разбиение получателей рассылки на шарды и добавление их в поток
+        
+        Returns:
+            Количество шардов
+        """
+        try:
+            shards = await self._publish(broadcast)
+        except Exception:
+            # Без шардов рассылку никто не выполнит
+            await db.finish_broadcast(broadcast.id, status="failed")
+            raise
+        
+        logger.info(f"Рассылка #{broadcast.id} поставлена в очередь: {len(shards)} шардов")
+        return len(shards)
+    
+    async def _publish(self, broadcast: Broadcast) -> List[Tuple[int, Optional[int]]]:
+        """Запись счётчиков и шардов рассылки в Redis одной транзакцией"""
+        segment = BroadcastSegment.from_dict(broadcast.segment)
+        bounds = await db.get_broadcast_shard_bounds(settings.broadcast_shard_size, segment)
+        
+        # Шард i - получатели с id в (edges[i], bounds[i]], последний шард без верхней границы
+        edges = [broadcast.last_user_id or 0] + bounds
+        shards = [
+            (edges[i], bounds[i] if i < len(bounds) else None)
+            for i in range(len(edges))
+        ]
+        
+        await ensure_group(self.redis)
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(stats_key(broadcast.id), mapping={"shards": len(shards), "sent": 0, "failed": 0, "blocked": 0})
+            pipe.expire(stats_key(broadcast.id), STATS_TTL)
+            for number, (after_user_id, upto_user_id) in enumerate(shards):
+                pipe.xadd(
+                    SHARDS_STREAM,
+                    {
+                        "broadcast_id": broadcast.id,
+                        "shard": number,
+                        "after": after_user_id,
+                        "upto": "" if upto_user_id is None else upto_user_id
+                    },
+                    maxlen=STREAM_MAXLEN,
+                    approximate=True
+                )
+            await pipe.execute()
+        
+        return shards
+    
+    async def get_progress(self, broadcast_id: int) -> Tuple[Dict[str, int], int, int]:
+        """Счётчики рассылки, количество обработанных шардов и одновременных отправок воркеров"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(stats_key(broadcast_id))
+            pipe.scard(done_key(broadcast_id))
+            pipe.hvals(senders_key(broadcast_id))
+            stats, done, senders = await pipe.execute()
+        
+        counts = {key: int(stats.get(key, 0)) for key in ("shards", "sent", "failed", "blocked")}
+        
+        # Шарды этой рассылки, по которым недавно был чекпоинт
+        now = time.time()
+        in_flight = 0
+        for value in senders:
+            limit, checkpoint_at = value.split(":")
+            if now - float(checkpoint_at) < SENDERS_FRESHNESS:
+                in_flight += int(limit)
+        
+        return counts, done, in_flight
+    
+    async def watch(
+        self,
+        broadcast: Broadcast,
+        progress_callback: Optional[ProgressCallback] = None,
+        interval: float = 2.0
+    ) -> Dict[str, Any]:
+        """Ожидание завершения (или отмены) рассылки воркерами с отчётом о прогрессе"""
+        started = time.monotonic()
+        
+        while True:
+            counts, done, in_flight = await self.get_progress(broadcast.id)
+            processed = counts["sent"] + counts["failed"] + counts["blocked"]
+            state = await self.control.get_state(broadcast.id)
+            
+            stats = {
+                "total": broadcast.target_users,
+                "sent": counts["sent"],
+                "failed": counts["failed"],
+                "blocked": counts["blocked"],
+                "rate": processed / max(time.monotonic() - started, 1.0),
+                "error_rate": counts["failed"] / processed if processed else 0.0,
+                "concurrency": in_flight,  # одновременных отправок у всех воркеров
+                "state": state
+            }
+            
+            if counts["shards"] and done >= counts["shards"]:
+                return stats
+            
+            if state == CANCELLED:
+                # Не дожидаемся воркеров: оставшиеся шарды они подтвердят без отправки
+                await finish_cancelled(broadcast.id, self.redis)
+                return stats
+            
+            current = await db.get_broadcast(broadcast.id)
+            if not current or current.status != "queued":
+                stats["state"] = CANCELLED if current and current.status == "cancelled" else RUNNING
+                return stats
+            
+            if progress_callback:
+                await progress_callback(stats)
+            await asyncio.sleep(interval)
+
+
+class ShardRun(BroadcastRun):
+    """Состояние обработки одного шарда (счётчики пишутся в Redis приращениями)"""
+    
+    def __init__(self, entry_id: str, shard: int, **kwargs):
+        super().__init__(**kwargs)
+        self.entry_id = entry_id
+        self.shard = shard
+        self.flushed = dict(self.committed)
+
+
+class BroadcastShardWorker(BroadcastService):
+    """
+    Воркер рассылок: забирает шарды из потока и отправляет сообщения
+    
+    Отправка использует тот же конвейер, что и BroadcastService (пул с AIMD),
+    но чекпоинты шарда и счётчики хранятся в Redis. Шард, не подтверждённый
+    упавшим воркером дольше BROADCAST_SHARD_CLAIM_TIMEOUT секунд, забирает
+    другой воркер (XAUTOCLAIM) и продолжает с чекпоинта шарда.
+    """
+    
+    # Сколько ждать новых шардов в одном XREADGROUP (миллисекунды)
+    read_block_ms = 5000
+    
+    def __init__(self, bot: Bot, redis: Redis):
+        super().__init__(
+            bot,
+            rate_limiter=RedisRateLimiter(redis, settings.broadcast_rate_limit),
+            control=BroadcastControl(redis)
+        )
+        self.redis = redis
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_timeout_ms = int(settings.broadcast_shard_claim_timeout * 1000)
+    
+    async def run(self) -> None:
+        """Основной цикл воркера"""
+        await ensure_group(self.redis)
+        logger.info(f"🚚 Broadcast worker {self.consumer} started")
+        
+        while True:
+            try:
+                entry = await self._next_shard()
+                if entry:
+                    await self._process_shard(*entry)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка обработки шарда рассылки: {e}")
+                await asyncio.sleep(1)
+    
+    async def _next_shard(self) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Следующий шард: сначала брошенные другими воркерами, затем новые"""
+        claimed = await self.redis.xautoclaim(
+            SHARDS_STREAM,
+            WORKERS_GROUP,
+            self.consumer,
+            min_idle_time=self.claim_timeout_ms,
+            start_id="0-0",
+            count=1
+        )
+        # [следующий id, записи, (Redis 7+) удалённые из потока id]
+        for entry_id, fields in claimed[1]:
+            if fields:
+                logger.info(f"Шард {entry_id} забран у упавшего воркера")
+                return entry_id, fields
+            await self.redis.xack(SHARDS_STREAM, WORKERS_GROUP, entry_id)
+        
+        response = await self.redis.xreadgroup(
+            WORKERS_GROUP,
+            self.consumer,
+            {SHARDS_STREAM: ">"},
+            count=1,
+            block=self.read_block_ms
+        )
+        if not response:
+            return None
+        
+        _, entries = response[0]
+        return entries[0]
+    
+    async def _process_shard(self, entry_id: str, fields: Dict[str, str]) -> None:
+        """Обработка шарда с его чекпоинта"""
+        broadcast_id = int(fields["broadcast_id"])
+        shard = int(fields["shard"])
+        
+        broadcast = await db.get_broadcast(broadcast_id)
+        if not broadcast or broadcast.status != "queued":
+            # Рассылка удалена, отменена или уже завершена
+            await self.redis.xack(SHARDS_STREAM, WORKERS_GROUP, entry_id)
+            return
+        
+        checkpoint = await self.redis.hget(progress_key(broadcast_id), shard)
+        run = ShardRun(
+            entry_id=entry_id,
+            shard=shard,
+            broadcast_id=broadcast_id,
+            segment=BroadcastSegment.from_dict(broadcast.segment),
+            total=broadcast.target_users,
+            last_user_id=int(checkpoint or fields["after"]),
+            upto_user_id=int(fields["upto"]) if fields["upto"] else None
+        )
+        
+        logger.info(f"Рассылка #{broadcast_id}: шард {shard} с пользователя {run.last_user_id}")
+        try:
+            await self._execute(broadcast, run)
+        except BroadcastCancelled:
+            # Чекпоинт шарда уже сохранён, остаток шарда не отправляется
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.xack(SHARDS_STREAM, WORKERS_GROUP, entry_id)
+                pipe.hdel(senders_key(broadcast_id), shard)
+                await pipe.execute()
+            await finish_cancelled(broadcast_id, self.redis)
+            logger.info(f"Рассылка #{broadcast_id} отменена: шард {shard} остановлен на пользователе {run.last_user_id}")
+            return
+        await self._complete_shard(broadcast, run)
+    
+    async def _checkpoint(self, run: ShardRun) -> None:
+        """Чекпоинт шарда и приращения счётчиков рассылки - одной транзакцией в Redis"""
+        advanced = run.advance()
+        await self._write_deliveries(run)
+        await self._prune_undeliverable(run)
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            # Продлеваем владение шардом, чтобы его не забрал другой воркер
+            pipe.xclaim(SHARDS_STREAM, WORKERS_GROUP, self.consumer, 0, [run.entry_id], justid=True)
+            pipe.hset(senders_key(run.broadcast_id), run.shard, f"{run.concurrency}:{time.time():.0f}")
+            pipe.expire(senders_key(run.broadcast_id), STATS_TTL)
+            
+            if advanced:
+                pipe.hset(progress_key(run.broadcast_id), run.shard, run.last_user_id)
+                pipe.expire(progress_key(run.broadcast_id), STATS_TTL)
+            # Счётчики меняются и без сдвига чекпоинта (settle при остановке)
+            for key, value in run.committed.items():
+                delta = value - run.flushed[key]
+                if delta:
+                    pipe.hincrby(stats_key(run.broadcast_id), key, delta)
+            await pipe.execute()
+        
+        run.flushed = dict(run.committed)
+    
+    async def _complete_shard(self, broadcast: Broadcast, run: ShardRun) -> None:
+        """Подтверждение шарда; воркер, завершивший последний шард, закрывает рассылку"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(done_key(broadcast.id), run.shard)
+            pipe.expire(done_key(broadcast.id), STATS_TTL)
+            pipe.xack(SHARDS_STREAM, WORKERS_GROUP, run.entry_id)
+            pipe.hdel(senders_key(broadcast.id), run.shard)
+            pipe.scard(done_key(broadcast.id))
+            pipe.hgetall(stats_key(broadcast.id))
+            _, _, _, _, done, stats = await pipe.execute()
+        
+        if done < int(stats.get("shards", 0)):
+            return
+        
+        counts = {key: int(stats.get(key, 0)) for key in ("sent", "failed", "blocked")}
+        await db.finish_broadcast(broadcast.id, status="completed", counts=counts)
+        logger.info(
+            f"Рассылка #{broadcast.id} завершена воркерами. Отправлено: {counts['sent']}, "
+            f"Ошибок: {counts['failed']}, Заблокировано: {counts['blocked']}"
+        )
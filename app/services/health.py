@@ -0,0 +1,128 @@
+"""
+Пробы доступности зависимостей: PostgreSQL, Redis, Telegram, Медиаскаут
+
+Пробы выполняются параллельно, каждая со своим таймаутом. Результат
+кэшируется на HEALTH_CACHE_TTL секунд (get_me и Медиаскаут - дольше),
+одновременные проверки одной зависимости объединяются в один запрос,
+поэтому частые запросы /health/ready и /status не нагружают зависимости.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from aiogram import Bot
+
+from app.config import settings
+from app.database import db
+from app.utils import get_redis
+from .mediascout import mediascout_api
+
+
+@dataclass
+class ProbeResult:
+    """Результат проверки одной зависимости"""
+    name: str
+    ok: bool
+    latency_ms: float
+    error: Optional[str] = None
+    checked_at: float = 0.0
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "latency_ms": round(self.latency_ms, 1),
+            "error": self.error,
+        }
+
+
+@dataclass
+class Probe:
+    """Проба зависимости: critical - без неё процесс не готов принимать обновления"""
+    check: Callable[[], Awaitable[Any]]
+    critical: bool = True
+    # Своё время кэширования (None - HEALTH_CACHE_TTL)
+    cache_ttl: Optional[float] = None
+
+
+# Все пробы процесса бота
+ALL_PROBES = ("postgres", "redis", "telegram", "mediascout")
+
+
+class HealthChecker:
+    """Выполнение и кэширование проб зависимостей"""
+    
+    def __init__(self, timeout: Optional[float] = None, cache_ttl: Optional[float] = None):
+        self.timeout = timeout or settings.health_probe_timeout
+        self.cache_ttl = cache_ttl if cache_ttl is not None else settings.health_cache_ttl
+        self.probes: Dict[str, Probe] = {}
+        
+        self._results: Dict[str, ProbeResult] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+    
+    def setup(self, bot: Bot, probes: Iterable[str] = ALL_PROBES) -> None:
+        """Набор проб процесса (воркерам и приёму обновлений нужны не все зависимости)"""
+        available = {
+            "postgres": Probe(db.ping),
+            "redis": Probe(lambda: get_redis().ping()),
+            # get_me - запрос к Bot API, проверяем не чаще раза в минуту
+            "telegram": Probe(bot.get_me, cache_ttl=60.0),
+            # Без Медиаскаута бот работает, не создаются только креативы
+            "mediascout": Probe(self._mediascout, critical=False, cache_ttl=30.0),
+        }
+        self.probes = {name: available[name] for name in probes}
+        self._results.clear()
+    
+    async def check(self) -> Dict[str, ProbeResult]:
+        """Результаты всех проб (из кэша или новые)"""
+        names = list(self.probes)
+        results = await asyncio.gather(*(self._result(name) for name in names))
+        return dict(zip(names, results))
+    
+    def is_ready(self, results: Dict[str, ProbeResult]) -> bool:
+        """Все критичные зависимости доступны"""
+        return all(result.ok for name, result in results.items() if self.probes[name].critical)
+    
+    async def _result(self, name: str) -> ProbeResult:
+        probe = self.probes[name]
+        ttl = probe.cache_ttl if probe.cache_ttl is not None else self.cache_ttl
+        
+        cached = self._results.get(name)
+        if cached and time.monotonic() - cached.checked_at < ttl:
+            return cached
+        
+        # Одна проверка на все одновременные запросы
+        task = self._running.get(name)
+        if task is None:
+            task = asyncio.create_task(self._run(name, probe))
+            self._running[name] = task
+            task.add_done_callback(lambda _: self._running.pop(name, None))
+        return await asyncio.shield(task)
+    
+    async def _run(self, name: str, probe: Probe) -> ProbeResult:
+        started = time.perf_counter()
+        error = None
+        try:
+            if await asyncio.wait_for(probe.check(), timeout=self.timeout) is False:
+                error = "unavailable"
+        except asyncio.TimeoutError:
+            error = f"timeout {self.timeout:g}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        
+        result = ProbeResult(
+            name=name,
+            ok=error is None,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            error=error,
+            checked_at=time.monotonic()
+        )
+        self._results[name] = result
+        return result
+    
+    @staticmethod
+    async def _mediascout() -> bool:
+        return await mediascout_api.ping() and await mediascout_api.ping_auth()
+
+
+# Глобальный экземпляр процесса
+health = HealthChecker()
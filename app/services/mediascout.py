@@ -16,7 +16,22 @@ class MediascoutAPI:
         self.base_url = settings.mediascout_api_url
         self.login = settings.mediascout_login
         self.password = settings.mediascout_password
-        
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия с пулом соединений (создаётся при первом запросе)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=settings.mediascout_timeout)
+            )
+        return self._session
+    
+    async def close(self) -> None:
+        """Закрытие сессии при остановке бота"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     def _get_auth_header(self) -> Dict[str, str]:
         """Получить заголовок авторизации Basic Auth"""
         credentials = f"{self.login}:{self.password}"
@@ -29,9 +44,9 @@ class MediascoutAPI:
     async def ping(self) -> bool:
         """Проверка связи с API"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/ping") as response:
-                    return response.status == 200
+            session = self._get_session()
+            async with session.get(f"{self.base_url}/ping") as response:
+                return response.status == 200
         except Exception as e:
             logger.error(f"Ошибка при проверке связи с API: {e}")
             return False
@@ -39,12 +54,12 @@ class MediascoutAPI:
     async def ping_auth(self) -> bool:
         """Проверка авторизации в API"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/pingauth",
-                    headers=self._get_auth_header()
-                ) as response:
-                    return response.status == 200
+            session = self._get_session()
+            async with session.get(
+                f"{self.base_url}/pingauth",
+                headers=self._get_auth_header()
+            ) as response:
+                return response.status == 200
         except Exception as e:
             logger.error(f"Ошибка при проверке авторизации: {e}")
             return False
@@ -52,16 +67,16 @@ class MediascoutAPI:
     async def get_kktu_codes(self) -> Optional[List[Dict[str, Any]]]:
         """Получить список кодов ККТУ из API"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/v3/dictionaries/kktu",
-                    headers=self._get_auth_header()
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        logger.error(f"Ошибка при получении ККТУ: {response.status}")
-                        return None
+            session = self._get_session()
+            async with session.get(
+                f"{self.base_url}/v3/dictionaries/kktu",
+                headers=self._get_auth_header()
+            ) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    logger.error(f"Ошибка при получении ККТУ: {response.status}")
+                    return None
         except Exception as e:
             logger.error(f"Ошибка при получении кодов ККТУ: {e}")
             return None
@@ -87,7 +102,7 @@ class MediascoutAPI:
             text_data: Текстовые данные (опционально)
             description: Описание креатива (опционально, обязательно для 30.15.1)
             advertiser_urls: Целевые ссылки (опционально)
-            
+        
         Returns:
             Dict с результатом (erid, id, и т.д.) или ошибкой
         """
@@ -143,69 +158,69 @@ class MediascoutAPI:
         logger.info(f"   Auth: {self.login}:***")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/v3/creatives",
-                    headers=self._get_auth_header(),
-                    json=payload
-                ) as response:
-                    # Получаем текст ответа для детального логирования
-                    response_text = await response.text()
+            session = self._get_session()
+            async with session.post(
+                f"{self.base_url}/v3/creatives",
+                headers=self._get_auth_header(),
+                json=payload
+            ) as response:
+                # Получаем текст ответа для детального логирования
+                response_text = await response.text()
+                
+                logger.info(f"📥 Ответ от API:")
+                logger.info(f"   Status: {response.status}")
+                logger.info(f"   Headers: {dict(response.headers)}")
+                logger.info(f"   Body: {response_text}")
+                
+                # Пытаемся распарсить JSON
+                try:
+                    # Сначала пытаемся прочитать как JSON из text
+                    import json
+                    response_data = json.loads(response_text) if response_text else {}
+                except json.JSONDecodeError as json_error:
+                    logger.error(f"❌ Ошибка парсинга JSON ответа: {json_error}")
+                    logger.error(f"   Raw response: {response_text}")
+                    return {
+                        "success": False,
+                        "error": f"Ошибка парсинга ответа API: {response_text[:200]}"
+                    }
+                except Exception as json_error:
+                    logger.error(f"❌ Неожиданная ошибка парсинга: {json_error}")
+                    logger.error(f"   Raw response: {response_text}")
+                    return {
+                        "success": False,
+                        "error": f"Ошибка парсинга ответа API: {str(json_error)}"
+                    }
+                
+                if response.status == 201:
+                    logger.info(f"✅ Креатив успешно создан: {response_data.get('erid')}")
+                    return {
+                        "success": True,
+                        "erid": response_data.get("erid"),
+                        "id": response_data.get("id"),
+                        "creative_group_id": response_data.get("creativeGroupId"),
+                        "creative_group_name": response_data.get("creativeGroupName"),
+                        "data": response_data
+                    }
+                else:
+                    error_detail = response_data.get("detail", "Неизвестная ошибка")
+                    error_title = response_data.get("title", "")
+                    errors = response_data.get("errors", {})
                     
-                    logger.info(f"📥 Ответ от API:")
-                    logger.info(f"   Status: {response.status}")
-                    logger.info(f"   Headers: {dict(response.headers)}")
-                    logger.info(f"   Body: {response_text}")
+                    error_msg = f"{error_title}: {error_detail}"
+                    if errors:
+                        error_msg += f"\nДетали: {errors}"
                     
-                    # Пытаемся распарсить JSON
-                    try:
-                        # Сначала пытаемся прочитать как JSON из text
-                        import json
-                        response_data = json.loads(response_text) if response_text else {}
-                    except json.JSONDecodeError as json_error:
-                        logger.error(f"❌ Ошибка парсинга JSON ответа: {json_error}")
-                        logger.error(f"   Raw response: {response_text}")
-                        return {
-                            "success": False,
-                            "error": f"Ошибка парсинга ответа API: {response_text[:200]}"
-                        }
-                    except Exception as json_error:
-                        logger.error(f"❌ Неожиданная ошибка парсинга: {json_error}")
-                        logger.error(f"   Raw response: {response_text}")
-                        return {
-                            "success": False,
-                            "error": f"Ошибка парсинга ответа API: {str(json_error)}"
-                        }
+                    logger.error(f"❌ Ошибка создания креатива (HTTP {response.status}): {error_msg}")
+                    logger.error(f"   Полный ответ: {response_data}")
                     
-                    if response.status == 201:
-                        logger.info(f"✅ Креатив успешно создан: {response_data.get('erid')}")
-                        return {
-                            "success": True,
-                            "erid": response_data.get("erid"),
-                            "id": response_data.get("id"),
-                            "creative_group_id": response_data.get("creativeGroupId"),
-                            "creative_group_name": response_data.get("creativeGroupName"),
-                            "data": response_data
-                        }
-                    else:
-                        error_detail = response_data.get("detail", "Неизвестная ошибка")
-                        error_title = response_data.get("title", "")
-                        errors = response_data.get("errors", {})
-                        
-                        error_msg = f"{error_title}: {error_detail}"
-                        if errors:
-                            error_msg += f"\nДетали: {errors}"
-                        
-                        logger.error(f"❌ Ошибка создания креатива (HTTP {response.status}): {error_msg}")
-                        logger.error(f"   Полный ответ: {response_data}")
-                        
-                        return {
-                            "success": False,
-                            "error": error_msg,
-                            "status": response.status,
-                            "full_response": response_data
-                        }
-                        
+                    return {
+                        "success": False,
+                        "error": error_msg,
+                        "status": response.status,
+                        "full_response": response_data
+                    }
+        
         except aiohttp.ClientError as e:
             logger.error(f"❌ Ошибка соединения с API: {e}")
             logger.exception(e)
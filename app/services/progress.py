@@ -0,0 +1,88 @@
+"""
+Отчёт о прогрессе длительных операций редактированием одного сообщения
+"""
+import time
+from typing import Any, Callable, Dict, Optional
+from aiogram.types import InlineKeyboardMarkup, Message
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from loguru import logger
+
+from .rate_limiter import TokenBucket
+
+
+class ProgressReporter:
+    """
+    Обновление сообщения с прогрессом не чаще одного раза в min_interval секунд
+    
+    Промежуточные состояния схлопываются: из всех вызовов update() между
+    редактированиями на экран попадает только последнее. Если отрисованный
+    текст не изменился, запрос к Telegram не отправляется. finish() всегда
+    показывает итоговое состояние и убирает кнопки, построенные keyboard.
+    Ошибки редактирования только логируются: отчёт о прогрессе не должен
+    прерывать саму операцию.
+    """
+    
+    def __init__(
+        self,
+        message: Message,
+        render: Callable[[Dict[str, Any]], str],
+        min_interval: float = 5.0,
+        rate_limiter: Optional[TokenBucket] = None,
+        keyboard: Optional[Callable[[Dict[str, Any]], Optional[InlineKeyboardMarkup]]] = None
+    ):
+        self.message = message
+        self.render = render
+        self.keyboard = keyboard
+        self.min_interval = min_interval
+        self.rate_limiter = rate_limiter
+        
+        self._last_text: Optional[str] = message.html_text if message.text else None
+        self._next_edit_at = 0.0
+    
+    async def update(self, stats: Dict[str, Any]) -> None:
+        """Промежуточное состояние (пропускается, если с прошлого редактирования прошло мало времени)"""
+        if time.monotonic() < self._next_edit_at:
+            return
+        reply_markup = self.keyboard(stats) if self.keyboard else None
+        await self._edit(self.render(stats), reply_markup)
+    
+    async def finish(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """Итоговое состояние - показывается всегда"""
+        await self._edit(text, reply_markup, final=True)
+    
+    async def _edit(
+        self,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        final: bool = False
+    ) -> None:
+        if text == self._last_text:
+            return
+        
+        # Редактирование расходует тот же лимит запросов, что и рассылка
+        if self.rate_limiter and not final:
+            await self.rate_limiter.acquire()
+        
+        self._next_edit_at = time.monotonic() + self.min_interval
+        try:
+            await self.message.edit_text(text, reply_markup=reply_markup)
+            self._last_text = text
+        except TelegramRetryAfter as e:
+            # Следующее промежуточное обновление - не раньше, чем разрешит Telegram
+            self._next_edit_at = time.monotonic() + max(self.min_interval, e.retry_after)
+            logger.debug(f"Progress edit postponed by RetryAfter {e.retry_after}s")
+        except TelegramBadRequest as e:
+            logger.debug(f"Progress edit skipped: {e}")
+        except Exception as e:
+            # Сетевые ошибки и 5xx Telegram - текст обновится при следующем вызове
+            logger.warning(f"Progress edit failed: {e}")
+
+
+def format_duration(seconds: float) -> str:
+    """Длительность в виде ч:мм:сс или м:сс"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
@@ -0,0 +1,156 @@
+"""
+Ограничители частоты и параллельности запросов к Telegram Bot API
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+from loguru import logger
+
+
+class TokenBucket:
+    """
+    Token bucket: не больше rate операций в секунду с всплеском до capacity
+    
+    Кроме обычного ограничения поддерживает глобальную паузу - её ставит
+    отправитель, получивший от Telegram RetryAfter, и до её окончания
+    acquire() не выдаёт токены никому.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else 1.0
+        
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float) -> None:
+        """Пополнение токенов за прошедшее время"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self) -> None:
+        """Дождаться и забрать один токен"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    async def pause(self, seconds: float) -> None:
+        """Приостановить выдачу токенов (например, по RetryAfter от Telegram)"""
+        paused_until = time.monotonic() + seconds
+        if paused_until > self._paused_until:
+            self._paused_until = paused_until
+            self._tokens = 0
+            self._updated = paused_until
+            logger.warning(f"⏸ Rate limiter paused for {seconds}s")
+    
+    @property
+    def paused(self) -> bool:
+        """Стоит ли сейчас пауза"""
+        return time.monotonic() < self._paused_until
+
+
+class AdaptiveConcurrency:
+    """
+    Ограничение числа одновременных запросов с подстройкой по AIMD
+    
+    Пока запросы укладываются в target_latency, лимит растёт аддитивно
+    (примерно на единицу за «окно» из limit ответов). На RetryAfter или
+    ответ медленнее target_latency лимит уменьшается мультипликативно,
+    не чаще одного раза за decrease_interval секунд.
+    
+    Слоты выдаются ожидающим строго по очереди, поэтому получатель, взятый
+    из очереди раньше, не обгоняется более поздними (иначе чекпоинт по
+    префиксу страниц надолго застревает).
+    """
+    
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 30,
+        target_latency: float = 1.0,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 1.0
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters: deque = deque()
+    
+    @property
+    def limit(self) -> int:
+        """Текущий лимит одновременных запросов"""
+        return int(self._limit)
+    
+    @property
+    def in_flight(self) -> int:
+        """Число выполняющихся запросов"""
+        return self._in_flight
+    
+    async def acquire(self) -> None:
+        """Дождаться свободного слота"""
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            return
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # Слот передаётся ожидающему в _wake_waiters
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._in_flight -= 1
+                self._wake_waiters()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+    
+    async def release(self, latency: float, throttled: bool = False) -> None:
+        """
+        Освободить слот и скорректировать лимит
+        
+        Args:
+            latency: Длительность запроса в секундах
+            throttled: Telegram ответил RetryAfter
+        """
+        self._in_flight -= 1
+        
+        if throttled or latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_interval:
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self._last_decrease = now
+                logger.debug(f"📉 Concurrency limit decreased to {self.limit}")
+        else:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        
+        self._wake_waiters()
+    
+    def _wake_waiters(self) -> None:
+        """Передать освободившиеся слоты ожидающим в порядке очереди"""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
@@ -0,0 +1,299 @@
+"""
+Планировщик заданий: отложенные рассылки и периодические задачи
+
+Задания хранятся в таблице scheduled_jobs. Проверять и запускать их может
+любой процесс бота, но в каждый момент это делает только лидер - процесс,
+держащий лок scheduler:leader в Redis. Время запуска хранится в UTC,
+повторы периодических заданий считаются по местному времени их часового
+пояса (ежедневная задача в 04:00 остаётся в 04:00 и после перехода на
+летнее время).
+"""
+import asyncio
+import math
+import uuid
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+from zoneinfo import ZoneInfo
+from aiogram import Bot
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.config import settings
+from app.database import db
+from app.database.models import ScheduledJob
+from .broadcast import BroadcastService
+from .broadcast_queue import BroadcastQueue
+
+
+JobHandler = Callable[[ScheduledJob], Awaitable[None]]
+
+# Продление лока только его владельцем (значение - токен процесса)
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def next_run_at(job: ScheduledJob, now: datetime) -> datetime:
+    """
+    Следующий запуск периодического задания позже now
+    
+    Шаг прибавляется к местному времени в часовом поясе задания, поэтому
+    суточные задания не сдвигаются при переходе на летнее/зимнее время.
+    Пропущенные (пока бот был выключен) запуски не догоняются.
+    """
+    tz = ZoneInfo(job.timezone)
+    step = timedelta(seconds=job.interval_seconds)
+    local = job.run_at.astimezone(tz).replace(tzinfo=None)
+    
+    if now > job.run_at:
+        local += step * max(math.floor((now - job.run_at) / step), 0)
+    
+    while True:
+        local += step
+        candidate = local.replace(tzinfo=tz)
+        if candidate > now:
+            return candidate.astimezone(timezone.utc)
+
+
+def next_local_time(at: dt_time, tz_name: str, now: Optional[datetime] = None) -> datetime:
+    """Ближайший момент, когда в часовом поясе tz_name наступит время at"""
+    tz = ZoneInfo(tz_name)
+    now = now or datetime.now(timezone.utc)
+    
+    candidate = datetime.combine(now.astimezone(tz).date(), at, tzinfo=tz)
+    if candidate <= now:
+        candidate = datetime.combine(candidate.date() + timedelta(days=1), at, tzinfo=tz)
+    return candidate.astimezone(timezone.utc)
+
+
+class LeaderLock:
+    """Лок лидера в Redis (SET NX PX с токеном процесса, продление и снятие - только владельцем)"""
+    
+    def __init__(self, redis: Redis, key: str, ttl: float):
+        self.redis = redis
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = uuid.uuid4().hex
+        self.held = False
+        
+        self._renew = redis.register_script(RENEW_SCRIPT)
+        self._release = redis.register_script(RELEASE_SCRIPT)
+    
+    async def acquire(self) -> bool:
+        """Захватить или продлить лок; True, если процесс - лидер"""
+        if self.held:
+            self.held = bool(await self._renew(keys=[self.key], args=[self.token, self.ttl_ms]))
+        if not self.held:
+            self.held = bool(await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        return self.held
+    
+    async def release(self) -> None:
+        """Отдать лидерство (при остановке процесса)"""
+        if self.held:
+            await self._release(keys=[self.key], args=[self.token])
+            self.held = False
+
+
+class JobScheduler:
+    """
+    Планировщик заданий из таблицы scheduled_jobs
+    
+    Раз в tick_interval секунд лидер захватывает наступившие задания
+    (UPDATE ... FOR UPDATE SKIP LOCKED) и выполняет их в фоновых задачах,
+    не более max_jobs одновременно. Обработчик выбирается по kind задания.
+    """
+    
+    def __init__(
+        self,
+        redis: Redis,
+        tick_interval: Optional[float] = None,
+        lock_ttl: Optional[float] = None,
+        max_jobs: Optional[int] = None
+    ):
+        self.tick_interval = tick_interval or settings.scheduler_tick_interval
+        self.max_jobs = max_jobs or settings.scheduler_max_jobs
+        self.lock = LeaderLock(redis, "scheduler:leader", lock_ttl or settings.scheduler_lock_ttl)
+        
+        self.handlers: Dict[str, JobHandler] = {}
+        self._running: Dict[int, asyncio.Task] = {}
+    
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Обработчик заданий вида kind"""
+        self.handlers[kind] = handler
+    
+    async def run(self) -> None:
+        """Основной цикл планировщика (фоновая задача процесса бота)"""
+        logger.info("🕒 Job scheduler started")
+        try:
+            while True:
+                try:
+                    await self.tick()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Scheduler tick failed: {e}")
+                await asyncio.sleep(self.tick_interval)
+        finally:
+            await self._shutdown()
+    
+    async def tick(self) -> None:
+        """Одна проверка: продление лидерства и запуск наступивших заданий"""
+        was_leader = self.lock.held
+        if not await self.lock.acquire():
+            if was_leader:
+                logger.warning("⚠️ Scheduler leadership lost")
+            return
+        
+        if not was_leader:
+            # Задания, которые выполнял упавший лидер, запускаются заново
+            requeued = await db.requeue_running_jobs(exclude_ids=list(self._running))
+            logger.info(f"👑 Scheduler leadership acquired (requeued jobs: {requeued})")
+        
+        free = self.max_jobs - len(self._running)
+        if free <= 0:
+            return
+        
+        for job in await db.claim_due_jobs(free):
+            task = asyncio.create_task(self._execute(job), name=f"scheduled-job-{job.id}")
+            self._running[job.id] = task
+            task.add_done_callback(lambda _, job_id=job.id: self._running.pop(job_id, None))
+    
+    async def _execute(self, job: ScheduledJob) -> None:
+        """Выполнение задания и перенос периодического задания на следующий запуск"""
+        handler = self.handlers.get(job.kind)
+        error = None
+        
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for job kind '{job.kind}'")
+            logger.info(f"▶️ Scheduled job #{job.id} ({job.kind}) started")
+            await handler(job)
+        except asyncio.CancelledError:
+            # Остановка процесса: задание выполнит следующий лидер
+            await db.finish_scheduled_job(job.id, status="pending")
+            raise
+        except Exception as e:
+            error = str(e)
+            logger.error(f"❌ Scheduled job #{job.id} ({job.kind}) failed: {e}")
+        
+        if job.interval_seconds:
+            await db.finish_scheduled_job(
+                job.id,
+                status="pending",
+                next_run_at=next_run_at(job, datetime.now(timezone.utc)),
+                error=error
+            )
+        else:
+            await db.finish_scheduled_job(job.id, status="failed" if error else "done", error=error)
+    
+    async def _shutdown(self) -> None:
+        """Остановка выполняющихся заданий и освобождение лидерства"""
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        try:
+            await self.lock.release()
+        except Exception as e:
+            logger.warning(f"Failed to release scheduler lock: {e}")
+        logger.info("🛑 Job scheduler stopped")
+
+
+class BotJobs:
+    """Встроенные задания бота: отложенные рассылки, пересчёт статистики и очистка"""
+    
+    # Сколько хранятся завершённые разовые задания
+    finished_jobs_ttl = timedelta(days=30)
+    
+    def __init__(self, bot: Bot, redis: Redis):
+        self.bot = bot
+        self.redis = redis
+    
+    def register(self, scheduler: JobScheduler) -> None:
+        scheduler.register("broadcast", self.broadcast)
+        scheduler.register("stats_rollup", self.stats_rollup)
+        scheduler.register("cleanup", self.cleanup)
+    
+    async def ensure_periodic(self) -> None:
+        """Создание системных периодических заданий (если их ещё нет)"""
+        tz_name = settings.scheduler_timezone
+        
+        await db.create_scheduled_job(
+            name="stats_rollup",
+            kind="stats_rollup",
+            run_at=datetime.now(timezone.utc),
+            interval_seconds=settings.scheduler_stats_interval,
+            timezone=tz_name
+        )
+        
+        # Очистка - в часы минимальной нагрузки
+        cleanup_at = dt_time.fromisoformat(settings.scheduler_cleanup_time)
+        await db.create_scheduled_job(
+            name="cleanup",
+            kind="cleanup",
+            run_at=next_local_time(cleanup_at, tz_name),
+            interval_seconds=24 * 3600,
+            timezone=tz_name
+        )
+    
+    async def broadcast(self, job: ScheduledJob) -> None:
+        """Запуск отложенной рассылки"""
+        broadcast_id = job.payload["broadcast_id"]
+        broadcast = await db.get_broadcast(broadcast_id)
+        if not broadcast:
+            logger.warning(f"Отложенная рассылка #{broadcast_id} не найдена")
+            return
+        
+        distributed = settings.broadcast_mode == "distributed"
+        service = BroadcastService(self.bot)
+        broadcast = await service.start_draft(
+            broadcast_id,
+            admin_id=broadcast.admin_id,
+            status="queued" if distributed else "running"
+        )
+        if not broadcast:
+            # Уже запущена (повтор задания) или отменена
+            logger.info(f"Отложенная рассылка #{broadcast_id} уже запущена или отменена")
+            return
+        
+        if distributed:
+            await BroadcastQueue(self.redis).enqueue(broadcast)
+            return
+        
+        stats = await service.run_broadcast(broadcast)
+        await service._notify_admin(broadcast_id, stats, note="запланированная")
+    
+    async def stats_rollup(self, job: ScheduledJob) -> None:
+        """Пересчёт статистики бота"""
+        await db.update_bot_stats()
+    
+    async def cleanup(self, job: ScheduledJob) -> None:
+        """Удаление устаревших данных: журналы действий и доставки, брошенные черновики, старые задания"""
+        actions = await db.delete_old_user_actions(settings.activity_retention_days)
+        deliveries = await db.delete_old_broadcast_deliveries(settings.broadcast_delivery_retention_days)
+        drafts = await db.delete_broadcast_drafts(older_than=BroadcastService.draft_ttl)
+        jobs = await db.delete_finished_jobs(self.finished_jobs_ttl)
+        logger.info(
+            f"🧹 Cleanup: {actions} activity events, {deliveries} deliveries, "
+            f"{drafts} broadcast drafts, {jobs} finished jobs deleted"
+        )
+
+
+async def create_scheduler(bot: Bot, redis: Redis) -> JobScheduler:
+    """Планировщик со встроенными заданиями бота"""
+    scheduler = JobScheduler(redis)
+    jobs = BotJobs(bot, redis)
+    jobs.register(scheduler)
+    await jobs.ensure_periodic()
+    return scheduler
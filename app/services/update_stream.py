@@ -0,0 +1,328 @@
+"""
+Распределённая обработка обновлений: Redis Streams с партициями по пользователю
+
+Процесс бота (UPDATES_MODE=distributed) только принимает обновления
+(webhook или long polling) и кладёт их в потоки updates:<n>, где n -
+партиция отправителя (user id % UPDATE_PARTITIONS). Воркеры
+(python -m app.update_worker) делят партиции между собой через аренду
+в Redis: каждую партицию читает ровно один воркер, поэтому шаги FSM
+одного пользователя обрабатываются по порядку. Внутри партиции
+обновления разных пользователей выполняются параллельно, одного
+пользователя - строго друг за другом.
+"""
+import asyncio
+import json
+import math
+import os
+import socket
+import time
+from typing import Any, Dict, Hashable, Optional
+from aiogram import Bot, Dispatcher
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.config import settings
+from .scheduler import LeaderLock
+
+
+UPDATES_GROUP = "update-workers"
+
+# Живые воркеры: sorted set consumer -> время последнего heartbeat
+WORKERS_KEY = "updates:workers"
+
+
+def stream_key(partition: int) -> str:
+    """Поток обновлений партиции"""
+    return f"updates:{partition}"
+
+
+def lease_key(partition: int) -> str:
+    """Аренда партиции воркером"""
+    return f"updates:{partition}:lease"
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """Отправитель обновления (или чат, если отправителя нет); None для обновлений без пользователя"""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return None
+
+
+def partition_of(update: Dict[str, Any], partitions: int) -> int:
+    """Партиция обновления: все обновления одного пользователя попадают в одну партицию"""
+    user_id = update_user_id(update)
+    return (user_id if user_id is not None else update["update_id"]) % partitions
+
+
+async def ensure_group(redis: Redis, partition: int) -> None:
+    """Создание consumer group партиции (с начала потока, чтобы не потерять принятые обновления)"""
+    try:
+        await redis.xgroup_create(stream_key(partition), UPDATES_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+class UpdatePublisher:
+    """Запись входящих обновлений в потоки партиций"""
+    
+    def __init__(self, redis: Redis, partitions: Optional[int] = None, maxlen: Optional[int] = None):
+        self.redis = redis
+        self.partitions = partitions or settings.update_partitions
+        self.maxlen = maxlen or settings.update_stream_maxlen
+    
+    async def publish(self, update: Dict[str, Any]) -> str:
+        """Добавить обновление (словарь в формате Bot API) в поток его партиции"""
+        return await self.redis.xadd(
+            stream_key(partition_of(update, self.partitions)),
+            {"update": json.dumps(update, ensure_ascii=False)},
+            maxlen=self.maxlen,
+            approximate=True
+        )
+
+
+class UpdateConsumer:
+    """
+    Воркер обработки обновлений
+    
+    Раз в треть UPDATE_LEASE_TTL воркер отмечается в updates:workers,
+    продлевает аренду своих партиций и забирает свободные - до равной доли
+    (партиций / живых воркеров). Лишние партиции отдаются только после
+    завершения их обновлений. Партиция упавшего воркера переходит к другому
+    по истечении аренды вместе с неподтверждёнными обновлениями.
+    """
+    
+    # Сколько ждать завершения начатых обновлений при остановке (секунды)
+    drain_timeout = 10.0
+    
+    # Сколько обновлений читается из потока за раз
+    batch_size = 50
+    
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        redis: Redis,
+        partitions: Optional[int] = None,
+        lease_ttl: Optional[float] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.bot = bot
+        self.dp = dp
+        self.redis = redis
+        self.partitions = partitions or settings.update_partitions
+        self.lease_ttl = lease_ttl or settings.update_lease_ttl
+        # Обновление прежнего владельца забирается, только когда он точно перестал его обрабатывать:
+        # после потери аренды он дорабатывает начатое до drain_timeout
+        self.claim_idle = max(self.lease_ttl, self.drain_timeout) + self.lease_ttl / 3
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        
+        self._slots = asyncio.Semaphore(concurrency or settings.update_worker_concurrency)
+        self._leases: Dict[int, LeaderLock] = {}
+        self._readers: Dict[int, asyncio.Task] = {}
+        # Обрабатываемые обновления партиции по id записи потока
+        self._inflight: Dict[int, Dict[str, asyncio.Task]] = {}
+        # Последнее обновление каждого пользователя: следующее ждёт его завершения
+        self._chains: Dict[Hashable, asyncio.Task] = {}
+    
+    async def run(self) -> None:
+        """Основной цикл воркера"""
+        logger.info(f"📥 Update consumer {self.consumer} started ({self.partitions} partitions)")
+        
+        try:
+            while True:
+                try:
+                    await self.rebalance()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Update partitions rebalance failed: {e}")
+                await asyncio.sleep(self.lease_ttl / 3)
+        finally:
+            await self._shutdown()
+    
+    async def rebalance(self) -> None:
+        """Heartbeat, продление аренды и выравнивание числа партиций между воркерами"""
+        now = time.time()
+        await self.redis.zadd(WORKERS_KEY, {self.consumer: now})
+        await self.redis.zremrangebyscore(WORKERS_KEY, 0, now - self.lease_ttl)
+        workers = max(await self.redis.zcard(WORKERS_KEY), 1)
+        share = math.ceil(self.partitions / workers)
+        
+        for partition, lease in list(self._leases.items()):
+            if not await lease.acquire():
+                logger.warning(f"⚠️ Update partition {partition} lease lost")
+                await self._stop_partition(partition, release=False)
+        
+        # Лишние партиции достанутся воркерам, которые запустились позже
+        surplus = sorted(self._leases)[share:]
+        await asyncio.gather(*(self._stop_partition(partition) for partition in surplus))
+        
+        # Начинаем с разных партиций, чтобы воркеры не соревновались за одни и те же
+        offset = hash(self.consumer) % self.partitions
+        for step in range(self.partitions):
+            if len(self._leases) >= share:
+                break
+            partition = (offset + step) % self.partitions
+            if partition in self._leases:
+                continue
+            
+            lease = LeaderLock(self.redis, lease_key(partition), self.lease_ttl)
+            if await lease.acquire():
+                self._leases[partition] = lease
+                self._inflight[partition] = {}
+                self._readers[partition] = asyncio.create_task(
+                    self._read(partition),
+                    name=f"update-partition-{partition}"
+                )
+        
+        # Партиции, чтение которых упало, снова станут свободными
+        for partition, reader in list(self._readers.items()):
+            if reader.done():
+                await self._stop_partition(partition)
+    
+    async def _read(self, partition: int) -> None:
+        """Чтение потока партиции: сначала неподтверждённые обновления, затем новые"""
+        stream = stream_key(partition)
+        await ensure_group(self.redis, partition)
+        
+        await self._claim(stream)
+        claimed_at = time.monotonic()
+        
+        cursor = "0"
+        while True:
+            # Обновления, которые прежний владелец ещё мог обрабатывать при захвате партиции,
+            # забираются повторно, когда простоят claim_idle
+            if cursor == ">" and time.monotonic() - claimed_at >= self.lease_ttl / 3:
+                claimed_at = time.monotonic()
+                if await self._claim(stream):
+                    cursor = "0"
+            
+            response = await self.redis.xreadgroup(
+                UPDATES_GROUP,
+                self.consumer,
+                {stream: cursor},
+                count=self.batch_size,
+                block=None if cursor != ">" else 1000
+            )
+            entries = response[0][1] if response else []
+            if cursor != ">":
+                if not entries:
+                    cursor = ">"
+                    continue
+                cursor = entries[-1][0]
+            
+            for entry_id, fields in entries:
+                await self._dispatch(partition, entry_id, json.loads(fields["update"]))
+    
+    async def _claim(self, stream: str) -> int:
+        """Перенос к себе обновлений, которые другие воркеры не подтвердили за claim_idle (XAUTOCLAIM)"""
+        claimed = 0
+        start_id = "0-0"
+        while True:
+            result = await self.redis.xautoclaim(
+                stream, UPDATES_GROUP, self.consumer,
+                min_idle_time=int(self.claim_idle * 1000), start_id=start_id,
+                count=self.batch_size, justid=True
+            )
+            start_id = result[0]
+            claimed += len(result[1])
+            if start_id == "0-0":
+                return claimed
+    
+    async def _dispatch(self, partition: int, entry_id: str, update: Dict[str, Any]) -> None:
+        """Запуск обработки обновления после предыдущего обновления того же пользователя"""
+        inflight = self._inflight[partition]
+        # Повторное чтение своих неподтверждённых записей после XAUTOCLAIM: начатые не запускаем второй раз
+        if entry_id in inflight:
+            return
+        
+        await self._slots.acquire()
+        
+        user_id = update_user_id(update)
+        previous = self._chains.get(user_id) if user_id is not None else None
+        task = asyncio.create_task(self._handle(partition, entry_id, update, previous))
+        
+        inflight[entry_id] = task
+        task.add_done_callback(lambda _: inflight.pop(entry_id, None))
+        task.add_done_callback(lambda _: self._slots.release())
+        
+        if user_id is not None:
+            self._chains[user_id] = task
+            task.add_done_callback(
+                lambda t: self._chains.pop(user_id, None) if self._chains.get(user_id) is t else None
+            )
+    
+    async def _handle(
+        self,
+        partition: int,
+        entry_id: str,
+        update: Dict[str, Any],
+        previous: Optional[asyncio.Task]
+    ) -> None:
+        """Обработка обновления диспетчером и подтверждение (XACK)"""
+        if previous is not None:
+            await asyncio.wait([previous])
+        
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except asyncio.CancelledError:
+            # Не подтверждаем: обновление обработает следующий владелец партиции
+            raise
+        except Exception as e:
+            # Ошибочное обновление не обрабатывается повторно, иначе оно заблокирует пользователя
+            logger.error(f"❌ Update {update.get('update_id')} failed: {e}")
+        
+        try:
+            await self.redis.xack(stream_key(partition), UPDATES_GROUP, entry_id)
+        except Exception as e:
+            # Обновление останется неподтверждённым и через claim_idle будет обработано повторно
+            logger.error(f"❌ Failed to ack update {update.get('update_id')}: {e}")
+    
+    async def _stop_partition(self, partition: int, release: bool = True) -> None:
+        """Остановка чтения партиции, ожидание начатых обновлений и освобождение аренды"""
+        reader = self._readers.pop(partition, None)
+        if reader is not None:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+            if not reader.cancelled() and reader.exception():
+                logger.error(f"❌ Update partition {partition} reader failed: {reader.exception()}")
+        
+        # Аренда ещё наша: пока обновления дорабатываются, партицию никто не заберёт
+        inflight = self._inflight.pop(partition, {})
+        if inflight:
+            await asyncio.wait(inflight.values(), timeout=self.lease_ttl / 3)
+        
+        lease = self._leases.pop(partition, None)
+        if lease is not None and release:
+            await lease.release()
+    
+    async def _shutdown(self) -> None:
+        """Остановка воркера: начатые обновления дорабатываются, остальные ждут нового владельца"""
+        for partition in list(self._readers):
+            reader = self._readers[partition]
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+        
+        inflight = [task for tasks in self._inflight.values() for task in tasks.values()]
+        if inflight:
+            _, pending = await asyncio.wait(inflight, timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        try:
+            for partition in list(self._leases):
+                await self._stop_partition(partition)
+            await self.redis.zrem(WORKERS_KEY, self.consumer)
+        except Exception as e:
+            logger.warning(f"Failed to release update partitions: {e}")
+        logger.info(f"🛑 Update consumer {self.consumer} stopped")
@@ -0,0 +1,102 @@
+"""
+Запуск процесса бота: независимые шаги параллельно, некритичные - в фоне
+
+Шаг ждёт только те шаги, от которых зависит (after). Приём обновлений
+начинается, как только завершены все шаги переднего плана; фоновые шаги
+(команды бота, статистика, продолжение рассылок) доделываются уже во время
+работы и отменяются при остановке вместе с остальными фоновыми задачами.
+В лог пишется время каждого шага.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from loguru import logger
+
+from app.utils import spawn
+
+
+@dataclass
+class StartupStep:
+    """Шаг запуска"""
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    # Шаги, которые должны завершиться раньше
+    after: Tuple[str, ...] = ()
+    # Ошибка критичного шага прерывает запуск
+    critical: bool = True
+    # Фоновый шаг не задерживает начало приёма обновлений
+    background: bool = False
+
+
+class StartupSequence:
+    """Выполнение шагов запуска с учётом зависимостей"""
+    
+    def __init__(self):
+        self.steps: Dict[str, StartupStep] = {}
+        self.timings: Dict[str, float] = {}
+    
+    def add(
+        self,
+        name: str,
+        run: Callable[[], Awaitable[Any]],
+        after: Tuple[str, ...] = (),
+        critical: bool = True,
+        background: bool = False
+    ) -> None:
+        for dependency in after:
+            if dependency not in self.steps:
+                raise ValueError(f"Startup step '{name}' depends on unknown step '{dependency}'")
+        self.steps[name] = StartupStep(name, run, after, critical, background)
+    
+    async def run(self) -> None:
+        """Выполнить шаги; возвращает управление, когда готовы шаги переднего плана"""
+        started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+        
+        # Задачи создаются все сразу, зависимости шаг ждёт сам
+        for step in self.steps.values():
+            coro = self._run_step(step, tasks)
+            if step.background:
+                tasks[step.name] = spawn(coro, name=f"startup-{step.name}")
+            else:
+                tasks[step.name] = asyncio.create_task(coro, name=f"startup-{step.name}")
+        
+        foreground = [tasks[step.name] for step in self.steps.values() if not step.background]
+        try:
+            await asyncio.gather(*foreground)
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        
+        breakdown = ", ".join(
+            f"{name} {self.timings[name] * 1000:.0f} ms"
+            for name, step in self.steps.items()
+            if not step.background and name in self.timings
+        )
+        logger.info(f"⏱ Startup finished in {(time.perf_counter() - started) * 1000:.0f} ms ({breakdown})")
+    
+    async def _run_step(self, step: StartupStep, tasks: Dict[str, asyncio.Task]) -> None:
+        if step.after:
+            # wait, а не gather: отмена зависимого шага не должна отменять общую зависимость
+            dependencies = [tasks[name] for name in step.after]
+            await asyncio.wait(dependencies)
+            if any(task.cancelled() or task.exception() for task in dependencies):
+                logger.warning(f"⚠️ Startup step '{step.name}' skipped: dependency failed")
+                return
+        
+        started = time.perf_counter()
+        try:
+            await step.run()
+        except Exception as e:
+            if step.critical:
+                logger.error(f"❌ Startup step '{step.name}' failed: {e}")
+                raise
+            logger.error(f"❌ Startup step '{step.name}' failed (non-critical): {e}")
+            return
+        finally:
+            self.timings[step.name] = time.perf_counter() - started
+        
+        if step.background:
+            logger.info(f"✅ Background startup step '{step.name}' done in {self.timings[step.name] * 1000:.0f} ms")
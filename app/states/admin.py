@@ -11,6 +11,7 @@ class AdminStates(StatesGroup):
     broadcast_message = State()  # Ожидание сообщения для рассылки
     broadcast_button = State()   # Ожидание кнопки для рассылки
     broadcast_confirm = State()  # Подтверждение рассылки
+    broadcast_schedule = State()  # Ожидание даты и времени отложенной рассылки
     
     # Состояния для управления сотрудниками
     add_employee_name = State()  # Ожидание ФИО сотрудника
@@ -0,0 +1,62 @@
+"""
+Воркер обработки обновлений (UPDATES_MODE=distributed)
+
+Запуск: python -m app.update_worker
+Можно запускать несколько процессов: партиции потоков обновлений делятся
+между ними поровну, обновления одного пользователя обрабатывает один воркер.
+Миграции, команды бота, продолжение рассылок и планировщик выполняет
+процесс приёма обновлений (python -m app.main), воркер их не запускает.
+"""
+import asyncio
+import signal
+import sys
+from loguru import logger
+
+from app.config import settings
+from app.main import setup_bot, on_worker_startup, on_shutdown
+from app.services.update_stream import UpdateConsumer
+from app.utils import get_redis
+
+
+async def main() -> None:
+    """Главная функция воркера"""
+    
+    # Настройка логирования
+    logger.remove()
+    logger.add(
+        sys.stdout,
+        level=settings.log_level,
+        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+               "<level>{level: <8}</level> | "
+               "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+               "<level>{message}</level>",
+        colorize=True
+    )
+    
+    logger.info("📥 Starting update worker...")
+    
+    # Тот же диспетчер, что и в процессе бота: middleware, роутеры и FSM в Redis
+    bot, dp = await setup_bot()
+    await on_worker_startup(bot)
+    
+    # SIGTERM (остановка контейнера) завершает воркер так же, как Ctrl+C
+    consumer = asyncio.create_task(UpdateConsumer(bot, dp, get_redis()).run(), name="update-consumer")
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, consumer.cancel)
+    
+    try:
+        await consumer
+    except asyncio.CancelledError:
+        pass
+    finally:
+        # Неподтверждённые обновления заберёт воркер, к которому перейдёт партиция
+        await on_shutdown(bot)
+        logger.info("🛑 Update worker stopped")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("👋 Update worker terminated by user")
@@ -1,10 +1,16 @@
 """
 Utils package
 """
+from .redis_client import get_redis, close_redis
+from .tasks import background_tasks, spawn
 from .bot_commands import setup_bot_commands, update_admin_commands, remove_user_commands
 
 __all__ = [
     'setup_bot_commands',
     'update_admin_commands', 
     'remove_user_commands',
+    'get_redis',
+    'close_redis',
+    'background_tasks',
+    'spawn',
 ]
@@ -1,11 +1,28 @@
 """
 Управление командами бота
+
+Последний отправленный в Telegram набор команд каждой области видимости
+запоминается в Redis (хэш bot:<id>:commands, область -> хэш набора), поэтому
+неизменившиеся команды не отправляются повторно ни при перезапуске, ни
+при повторной регистрации пользователя. Оставшиеся вызовы set_my_commands
+выполняются параллельно, но не чаще BOT_COMMANDS_RATE в секунду.
 """
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, List
 from aiogram import Bot
-from aiogram.types import BotCommand, BotCommandScopeDefault, BotCommandScopeChat
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import BotCommand, BotCommandScope, BotCommandScopeDefault, BotCommandScopeChat
 from loguru import logger
 
 from app.config import settings
+from app.services.rate_limiter import TokenBucket
+from .redis_client import get_redis
+
+
+# Общий для процесса лимит запросов set_my_commands / delete_my_commands
+commands_rate = TokenBucket(rate=settings.bot_commands_rate, capacity=settings.bot_commands_rate)
 
 
 # Команды для обычных пользователей
@@ -28,6 +45,63 @@ ADMIN_COMMANDS = [
 ]
 
 
+def commands_digest(commands: List[BotCommand]) -> str:
+    """Хэш набора команд (порядок команд учитывается - он виден пользователю)"""
+    payload = json.dumps([[c.command, c.description] for c in commands], ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def commands_cache_key(bot: Bot) -> str:
+    """Кэш команд отдельный для каждого бота (токен может смениться при том же Redis)"""
+    return f"bot:{bot.id}:commands"
+
+
+def scope_key(scope: BotCommandScope) -> str:
+    """Поле кэша для области видимости"""
+    kind = getattr(scope.type, "value", scope.type)
+    chat_id = getattr(scope, "chat_id", None)
+    return f"{kind}:{chat_id}" if chat_id is not None else kind
+
+
+async def _call_limited(method: Callable[[], Awaitable[Any]]) -> None:
+    """Запрос к Bot API под общим лимитом, с одним повтором после RetryAfter"""
+    await commands_rate.acquire()
+    try:
+        await method()
+    except TelegramRetryAfter as e:
+        await commands_rate.pause(e.retry_after)
+        await commands_rate.acquire()
+        await method()
+
+
+async def set_commands(bot: Bot, commands: List[BotCommand], scope: BotCommandScope) -> bool:
+    """
+    Установить команды области, если они отличаются от последних установленных
+    
+    Returns:
+        True - команды отправлены в Telegram, False - уже актуальны
+    """
+    field = scope_key(scope)
+    digest = commands_digest(commands)
+    
+    try:
+        cached = await get_redis().hget(commands_cache_key(bot), field)
+    except Exception as e:
+        # Без кэша просто отправляем команды
+        logger.warning(f"Bot commands cache unavailable: {e}")
+        cached = None
+    if cached == digest:
+        return False
+    
+    await _call_limited(lambda: bot.set_my_commands(commands=commands, scope=scope))
+    
+    try:
+        await get_redis().hset(commands_cache_key(bot), field, digest)
+    except Exception as e:
+        logger.warning(f"Failed to cache bot commands for {field}: {e}")
+    return True
+
+
 async def setup_bot_commands(bot: Bot) -> None:
     """
     Настройка команд бота с разными областями видимости
@@ -37,25 +111,24 @@ async def setup_bot_commands(bot: Bot) -> None:
     """
     try:
         # Устанавливаем команды по умолчанию для всех пользователей
-        await bot.set_my_commands(
-            commands=USER_COMMANDS,
-            scope=BotCommandScopeDefault()
-        )
-        logger.info("✅ User commands set successfully")
+        if await set_commands(bot, USER_COMMANDS, BotCommandScopeDefault()):
+            logger.info("✅ User commands set successfully")
         
-        # Устанавливаем команды для админов
-        for admin_id in settings.admin_user_ids:
+        # Устанавливаем команды для админов (параллельно, админов может быть много)
+        async def set_admin_commands(admin_id: int) -> bool:
             try:
-                await bot.set_my_commands(
-                    commands=ADMIN_COMMANDS,
-                    scope=BotCommandScopeChat(chat_id=admin_id)
-                )
-                logger.info(f"✅ Admin commands set for user {admin_id}")
+                return await set_commands(bot, ADMIN_COMMANDS, BotCommandScopeChat(chat_id=admin_id))
             except Exception as e:
                 logger.warning(f"⚠️ Failed to set admin commands for user {admin_id}: {e}")
+                return False
         
-        logger.info("✅ All bot commands configured successfully")
+        results = await asyncio.gather(*(set_admin_commands(admin_id) for admin_id in settings.admin_user_ids))
         
+        logger.info(
+            f"✅ All bot commands configured successfully "
+            f"(admin scopes updated: {sum(results)}, unchanged or failed: {len(results) - sum(results)})"
+        )
+    
     except Exception as e:
         logger.error(f"❌ Failed to setup bot commands: {e}")
         raise
@@ -72,11 +145,8 @@ async def update_admin_commands(bot: Bot, admin_id: int, is_admin: bool = True)
     """
     try:
         commands = ADMIN_COMMANDS if is_admin else USER_COMMANDS
-        await bot.set_my_commands(
-            commands=commands,
-            scope=BotCommandScopeChat(chat_id=admin_id)
-        )
-        logger.info(f"✅ Commands updated for user {admin_id} (admin={is_admin})")
+        if await set_commands(bot, commands, BotCommandScopeChat(chat_id=admin_id)):
+            logger.info(f"✅ Commands updated for user {admin_id} (admin={is_admin})")
     except Exception as e:
         logger.error(f"❌ Failed to update commands for user {admin_id}: {e}")
         raise
@@ -91,9 +161,9 @@ async def remove_user_commands(bot: Bot, user_id: int) -> None:
         user_id: ID пользователя
     """
     try:
-        await bot.delete_my_commands(
-            scope=BotCommandScopeChat(chat_id=user_id)
-        )
+        scope = BotCommandScopeChat(chat_id=user_id)
+        await _call_limited(lambda: bot.delete_my_commands(scope=scope))
+        await get_redis().hdel(commands_cache_key(bot), scope_key(scope))
         logger.info(f"✅ User commands removed for user {user_id}")
     except Exception as e:
         logger.error(f"❌ Failed to remove commands for user {user_id}: {e}")
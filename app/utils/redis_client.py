@@ -0,0 +1,26 @@
+"""
+Общий клиент Redis процесса
+"""
+from typing import Optional
+from redis.asyncio import Redis
+
+from app.config import settings
+
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """Клиент Redis (один пул соединений на процесс: FSM, рассылки, блокировки)"""
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.redis_url, decode_responses=True)
+    return _redis
+
+
+async def close_redis() -> None:
+    """Закрытие пула соединений Redis"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
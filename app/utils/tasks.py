@@ -0,0 +1,17 @@
+"""
+Фоновые задачи процесса
+"""
+import asyncio
+from typing import Coroutine
+
+
+# Храним ссылки, чтобы задачи не собрал GC; при остановке процесса они отменяются
+background_tasks: set[asyncio.Task] = set()
+
+
+def spawn(coro: Coroutine, name: str) -> asyncio.Task:
+    """Запуск фоновой задачи, которая будет отменена при остановке бота"""
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
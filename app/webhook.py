@@ -0,0 +1,73 @@
+"""
+Режим webhook (BOT_MODE=webhook)
+
+Telegram присылает обновления POST-запросами на WEBHOOK_URL + WEBHOOK_PATH,
+их принимает aiohttp-приложение с SimpleRequestHandler aiogram. Запрос
+без правильного X-Telegram-Bot-Api-Secret-Token отклоняется. Несколько
+реплик бота за балансировщиком обрабатывают обновления параллельно.
+"""
+import asyncio
+import signal
+from loguru import logger
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from app.config import settings
+
+
+def webhook_url() -> str:
+    """Полный адрес webhook, который регистрируется в Telegram"""
+    return settings.webhook_url.rstrip("/") + settings.webhook_path
+
+
+async def set_webhook(bot: Bot, dispatcher: Dispatcher) -> None:
+    """Регистрация webhook в Telegram (при старте каждой реплики, повторный вызов безопасен)"""
+    await bot.set_webhook(
+        url=webhook_url(),
+        secret_token=settings.webhook_secret or None,
+        max_connections=settings.webhook_max_connections,
+        drop_pending_updates=settings.webhook_drop_pending_updates,
+        allowed_updates=dispatcher.resolve_used_update_types()
+    )
+    logger.info(f"✅ Webhook set: {webhook_url()} (max_connections={settings.webhook_max_connections})")
+
+
+async def serve(app: web.Application, host: str, port: int) -> None:
+    """Запуск aiohttp-приложения до SIGINT/SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=host, port=port).start()
+        logger.info(f"🌐 HTTP server listening on {host}:{port}")
+        await stop.wait()
+    finally:
+        # Вызывает on_shutdown приложения (и shutdown-обработчики диспетчера)
+        await runner.cleanup()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """Приём обновлений через webhook вместо long polling"""
+    app = web.Application()
+    
+    # Обновление подтверждается Telegram сразу, хендлеры выполняются в фоне
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=settings.webhook_secret or None
+    ).register(app, path=settings.webhook_path)
+    
+    # Startup/shutdown диспетчера привязываются к жизненному циклу приложения
+    dp.startup.register(set_webhook)
+    setup_application(app, dp, bot=bot)
+    
+    await serve(app, settings.webapp_host, settings.webapp_port)
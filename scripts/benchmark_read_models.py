@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк горячих чтений: ORM-сущности против лёгких моделей чтения
+
+Сравнивает get_user / get_user_record и get_user_creatives /
+get_user_creative_records на реальной базе из .env: процессорное время
+на вызов (без ожидания сети) и объём выделенной памяти.
+
+Использование:
+    python scripts/benchmark_read_models.py [user_id] [iterations]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.database import db  # noqa: E402
+
+
+async def measure(name: str, call, iterations: int) -> None:
+    """Замер CPU-времени и аллокаций для одной функции"""
+    # Прогрев: пул соединений, кэш скомпилированных запросов
+    for _ in range(20):
+        await call()
+
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    for _ in range(iterations):
+        await call()
+
+    cpu_total = time.process_time() - cpu_start
+    wall_total = time.perf_counter() - wall_start
+    snapshot_after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    allocated = sum(
+        stat.size_diff for stat in snapshot_after.compare_to(snapshot_before, "filename")
+        if stat.size_diff > 0
+    )
+
+    print(
+        f"{name:<32} "
+        f"cpu {cpu_total / iterations * 1e6:8.1f} µs/call | "
+        f"wall {wall_total / iterations * 1e6:8.1f} µs/call | "
+        f"retained {allocated / iterations:8.1f} B/call | "
+        f"peak {peak / 1024:8.1f} KiB"
+    )
+
+
+async def main() -> None:
+    user_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    if user_id is None:
+        users = await db.get_all_user_records()
+        if not users:
+            print("❌ В базе нет пользователей для бенчмарка")
+            return
+        user_id = users[0].id
+
+    print(f"📊 user_id={user_id}, iterations={iterations}\n")
+
+    await measure("get_user (ORM)", lambda: db.get_user(user_id), iterations)
+    await measure("get_user_record (Core)", lambda: db.get_user_record(user_id), iterations)
+    await measure(
+        "get_user_creatives (ORM)",
+        lambda: db.get_user_creatives(user_id, limit=10),
+        iterations
+    )
+    await measure(
+        "get_user_creative_records (Core)",
+        lambda: db.get_user_creative_records(user_id, limit=10),
+        iterations
+    )
+    await measure("get_employees (ORM)", db.get_employees, iterations)
+    await measure("get_employee_records (Core)", db.get_employee_records, iterations)
+
+    await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())